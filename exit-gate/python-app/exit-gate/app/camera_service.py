@@ -8,14 +8,19 @@ Compatible with Python 2.7 and 3.x
 from __future__ import absolute_import, print_function, unicode_literals
 
 import logging
-import base64
 import time
+from concurrent.futures import ThreadPoolExecutor, wait  # futures backport on Python 2.7
 from typing import Optional, Dict  # For IDE support
 
 import requests
 from requests.auth import HTTPBasicAuth
 
 from config import config
+from http_pool import http_pool
+from image_blob import ImageBlob
+from metrics import metrics
+from frame_grabber import (FrameGrabber, MJPEGSource, SnapshotPollSource,
+                           OpenCVSource, PiCameraSource, FakeSource)
 
 logger = logging.getLogger(__name__)
 
@@ -66,17 +71,27 @@ except ImportError:
 class CameraCapture(object):
     """Camera capture result"""
     
-    def __init__(self, success=False, image_data=None, error_message=None):
+    def __init__(self, success=False, image=None, error_message=None, results=None, image_data=None):
         self.success = success
-        self.image_data = image_data  # base64 encoded
+        self.image = image or ImageBlob.coerce(image_data)  # ImageBlob (raw bytes)
         self.error_message = error_message
+        self.results = results or {}  # per-camera CameraCapture for multi-camera captures
+        self.capture_time_ms = None
         self.timestamp = time.time()
     
+    @property
+    def image_data(self):
+        """Base64 image for JSON/HTTP boundaries (encoded on access)"""
+        return self.image.to_base64() if self.image else None
+    
     def to_dict(self):
         return {
             'success': self.success,
             'image_data': self.image_data,
             'error_message': self.error_message,
+            'capture_time_ms': self.capture_time_ms,
+            'cameras': dict((name, {'success': result.success, 'error_message': result.error_message})
+                            for name, result in self.results.items()),
             'timestamp': self.timestamp
         }
 
@@ -150,6 +165,15 @@ class CameraService(object):
     def __init__(self):
         self.cameras = {}
         self._initialize_cameras()
+        
+        # Worker pool so exit capture costs max() instead of sum() of camera latencies
+        self.capture_executor = ThreadPoolExecutor(max_workers=max(2, len(self.cameras)))
+        
+        # Continuous frame grabbers (ring buffer per camera)
+        self.grabbers = {}
+        self.grabber_max_age = config.getfloat('camera', 'grabber_max_age', 1.0)
+        if config.getboolean('camera', 'grabber_enabled', False):
+            self._start_grabbers()
     
     def log(self, message):
         """Log message"""
@@ -229,6 +253,101 @@ class CameraService(object):
         except Exception as e:
             logger.warning("Error during Raspberry Pi auto-configuration: {}".format(str(e)))
     
+    # ============== FRAME GRABBERS ==============
+    
+    def _create_frame_source(self, camera_name, camera):
+        """Pick frame source: fake, Raspberry Pi, RTSP/MJPEG stream or snapshot polling"""
+        if config.getboolean('camera', 'grabber_fake', False):
+            return FakeSource(fps=config.getfloat('camera', 'grabber_fake_fps', 10))
+        
+        if getattr(camera, 'camera_type', None) == "raspberry_pi":
+            library = getattr(camera, 'library', 'picamera2')
+            camera_id = getattr(camera, 'camera_id', 0)
+            if library == 'opencv':
+                return OpenCVSource(camera_id)
+            return PiCameraSource(camera_id, use_picamera2=(library == 'picamera2'))
+        
+        auth = HTTPBasicAuth(camera.username, camera.password)
+        stream_url = config.get('camera', '{}_camera_stream_url'.format(camera_name), '')
+        if stream_url:
+            if stream_url.lower().startswith('rtsp://'):
+                return OpenCVSource(stream_url)
+            return MJPEGSource(stream_url, auth=auth, timeout=camera.timeout,
+                               max_frame_bytes=self.grabber_max_frame_bytes)
+        
+        # No stream configured - poll the snapshot URL over a keep-alive session
+        snapshot_url = camera.get_snapshot_url()
+        return SnapshotPollSource(snapshot_url,
+                                  auth=None if '@' in snapshot_url else auth,
+                                  timeout=camera.timeout,
+                                  interval=config.getfloat('camera', 'grabber_snapshot_interval', 0.5))
+    
+    def _start_grabbers(self):
+        """Start one long-lived grabber per enabled camera"""
+        buffer_size = config.getint('camera', 'grabber_buffer_size', 8)
+        self.grabber_max_frame_bytes = config.getint('camera', 'grabber_max_frame_kb', 2048) * 1024
+        
+        for camera_name, camera in self.cameras.items():
+            if not camera.enabled:
+                continue
+            try:
+                source = self._create_frame_source(camera_name, camera)
+                grabber = FrameGrabber(camera_name, source, buffer_size=buffer_size,
+                                       max_frame_bytes=self.grabber_max_frame_bytes)
+                grabber.start()
+                self.grabbers[camera_name] = grabber
+            except Exception as e:
+                logger.error("Cannot start frame grabber for camera '{}': {}".format(camera_name, str(e)))
+    
+    def _capture_from_grabber(self, camera_name, around=None, window=0.5):
+        """
+        Capture from the camera's ring buffer without touching the camera
+        
+        Args:
+            camera_name (str): Camera name
+            around (float, optional): Trigger timestamp - pick the sharpest frame
+                                      within +/- window seconds instead of the latest
+            window (float): Seconds around the trigger to consider
+            
+        Returns:
+            CameraCapture or None if no fresh frame is buffered
+        """
+        grabber = self.grabbers.get(camera_name)
+        if grabber is None:
+            return None
+        
+        frame = None
+        if around is not None:
+            frame = grabber.sharpest(around=around, window=window)
+        if frame is None:
+            frame = grabber.latest(max_age=self.grabber_max_age)
+        if frame is None:
+            return None
+        
+        capture = CameraCapture(success=True, image=ImageBlob(frame.data, camera=camera_name,
+                                                              timestamp=frame.timestamp))
+        capture.timestamp = frame.timestamp
+        return capture
+    
+    def capture_sharpest(self, camera_name="exit", around=None, window=0.5):
+        """Sharpest buffered frame around a trigger time, falls back to a normal capture"""
+        capture = self._capture_from_grabber(camera_name, around=around or time.time(), window=window)
+        return capture or self.capture_image(camera_name)
+    
+    def stop_grabbers(self):
+        """Stop all frame grabbers"""
+        for grabber in self.grabbers.values():
+            grabber.stop()
+        self.grabbers = {}
+    
+    def cleanup(self):
+        """Stop grabbers and the capture worker pool"""
+        self.stop_grabbers()
+        self.capture_executor.shutdown(wait=False)
+        logger.info("Camera service cleanup completed")
+    
+    # ============== END FRAME GRABBERS ==============
+    
     def capture_image(self, camera_name="exit"):
         """Capture image from specified camera (enhanced with Raspberry Pi support)"""
         if camera_name not in self.cameras:
@@ -245,6 +364,11 @@ class CameraService(object):
                 error_message="Camera '{}' is disabled".format(camera_name)
             )
         
+        # Freshest buffered frame if a grabber is running
+        buffered = self._capture_from_grabber(camera_name)
+        if buffered is not None:
+            return buffered
+        
         # Check if this is a Raspberry Pi camera
         if hasattr(camera, 'camera_type') and camera.camera_type == "raspberry_pi":
             camera_id = getattr(camera, 'camera_id', 0)
@@ -261,8 +385,8 @@ class CameraService(object):
                 # URL already contains embedded authentication
                 self.log("Attempting capture from: {}".format(snapshot_url.replace(camera.password, '***')))
                 
-                # Make HTTP request without additional auth
-                response = requests.get(
+                # Make HTTP request without additional auth (pooled keep-alive session)
+                response = http_pool.get(
                     snapshot_url,
                     timeout=camera.timeout,
                     stream=True
@@ -271,9 +395,9 @@ class CameraService(object):
                 # Use separate authentication
                 self.log("Attempting capture from: {}".format(snapshot_url))
                 
-                # Make HTTP request with auth
+                # Make HTTP request with auth (pooled keep-alive session)
                 auth = HTTPBasicAuth(camera.username, camera.password)
-                response = requests.get(
+                response = http_pool.get(
                     snapshot_url,
                     auth=auth,
                     timeout=camera.timeout,
@@ -281,13 +405,10 @@ class CameraService(object):
                 )
             
             if response.status_code == 200:
-                # Convert image to base64
-                image_data = base64.b64encode(response.content).decode('utf-8')
-                
                 logger.info("Successfully captured image from camera '{}'".format(camera_name))
                 return CameraCapture(
                     success=True,
-                    image_data=image_data
+                    image=ImageBlob(response.content, camera=camera_name)
                 )
             else:
                 error_msg = "HTTP {} from camera '{}'".format(response.status_code, camera_name)
@@ -321,30 +442,83 @@ class CameraService(object):
                 error_message=error_msg
             )
     
-    def capture_exit_images(self):
-        """Capture images from available cameras for exit processing"""
+    def _timed_capture(self, camera_name, around=None):
+        """capture_image (capture_sharpest with a trigger time) wrapped in a per-camera latency span"""
+        with metrics.span('camera.capture.{}'.format(camera_name)):
+            if around is not None:
+                return self.capture_sharpest(camera_name, around=around)
+            return self.capture_image(camera_name)
+    
+    def capture_images(self, camera_names, deadline=None, around=None):
+        """
+        Capture from several cameras concurrently under one overall deadline
+        
+        Args:
+            camera_names (list): Camera names to capture
+            deadline (float, optional): Overall deadline in seconds (default: capture_timeout)
+            around (float, optional): Trigger timestamp - sharpest buffered frame around it
+            
+        Returns:
+            dict: camera name -> CameraCapture (timed-out cameras get a failed capture)
+        """
+        if deadline is None:
+            deadline = config.getfloat('camera', 'exit_capture_deadline',
+                                       config.getint('camera', 'capture_timeout', 10))
+        
+        futures = dict((self.capture_executor.submit(self._timed_capture, name, around), name)
+                       for name in camera_names)
+        done, not_done = wait(list(futures), timeout=deadline)
+        
         results = {}
+        for future in done:
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                results[name] = CameraCapture(
+                    success=False,
+                    error_message="Error capturing from camera '{}': {}".format(name, str(e))
+                )
         
-        # Capture exit camera (primary)
-        exit_result = self.capture_image('exit')
-        results['exit'] = exit_result
+        for future in not_done:
+            name = futures[future]
+            future.cancel()
+            logger.warning("Camera '{}' missed the {}s capture deadline".format(name, deadline))
+            results[name] = CameraCapture(
+                success=False,
+                error_message="Camera '{}' exceeded {}s deadline".format(name, deadline)
+            )
         
-        # Capture driver camera if available
+        return results
+    
+    @metrics.span('camera.capture_exit')
+    def capture_exit_images(self, around=None):
+        """
+        Capture images from available cameras for exit processing (all cameras in parallel)
+        
+        Args:
+            around (float, optional): Trigger (scan) timestamp - sharpest buffered frame around it
+        """
+        start_time = time.time()
+        
+        # Capture exit (primary) and driver camera concurrently
+        camera_names = ['exit']
         if 'driver' in self.cameras:
-            driver_result = self.capture_image('driver')
-            results['driver'] = driver_result
-        else:
+            camera_names.append('driver')
+        results = self.capture_images(camera_names, around=around)
+        
+        exit_result = results['exit']
+        if 'driver' not in results:
             # Create dummy result for driver camera
-            driver_result = CameraCapture(success=False, error_message="Driver camera not configured")
-            results['driver'] = driver_result
+            results['driver'] = CameraCapture(success=False, error_message="Driver camera not configured")
         
         # Return combined result - prioritize exit camera
         success = exit_result.success  # Main success based on exit camera
-        image_data = None
+        image = None
         
         if exit_result.success:
             # Use exit camera image as primary
-            image_data = exit_result.image_data
+            image = exit_result.image
             
             # If driver camera also available, could combine images here
             if 'driver' in self.cameras and results['driver'].success:
@@ -352,7 +526,7 @@ class CameraService(object):
                 pass
         elif 'driver' in self.cameras and results['driver'].success:
             # Fallback to driver camera if exit camera fails
-            image_data = results['driver'].image_data
+            image = results['driver'].image
             success = True
         
         # Collect error messages
@@ -362,11 +536,16 @@ class CameraService(object):
         if 'driver' in self.cameras and not results['driver'].success:
             error_messages.append("Driver camera: {}".format(results['driver'].error_message))
         
-        return CameraCapture(
+        combined = CameraCapture(
             success=success,
-            image_data=image_data,
-            error_message="; ".join(error_messages) if error_messages and not success else None
+            image=image,
+            error_message="; ".join(error_messages) if error_messages and not success else None,
+            results=results
         )
+        combined.capture_time_ms = (time.time() - start_time) * 1000
+        logger.info("Exit images captured from {} camera(s) in {:.2f}ms".format(
+            len(camera_names), combined.capture_time_ms))
+        return combined
     
     def test_camera(self, camera_name="plate"):
         """Test camera connectivity"""
@@ -440,7 +619,8 @@ class CameraService(object):
             status[camera_name] = {
                 'enabled': camera.enabled,
                 'ip': camera.ip,
-                'last_test': None  # Would be enhanced to track last test time
+                'last_test': None,  # Would be enhanced to track last test time
+                'grabber': self.grabbers[camera_name].get_stats() if camera_name in self.grabbers else None
             }
         return status
     
@@ -485,12 +665,8 @@ class CameraService(object):
             # Stop camera
             picam2.stop()
             
-            # Encode to base64
-            stream.seek(0)
-            image_data = base64.b64encode(stream.getvalue()).decode('utf-8')
-            
             logger.info("Successfully captured image from Raspberry Pi camera (picamera2)")
-            return CameraCapture(success=True, image_data=image_data)
+            return CameraCapture(success=True, image=ImageBlob(stream.getvalue(), camera='rpi'))
             
         except Exception as e:
             error_msg = "picamera2 capture error: {}".format(str(e))
@@ -514,12 +690,8 @@ class CameraService(object):
                 stream = io.BytesIO()
                 camera.capture(stream, format='jpeg')
                 
-                # Encode to base64
-                stream.seek(0)
-                image_data = base64.b64encode(stream.getvalue()).decode('utf-8')
-                
                 logger.info("Successfully captured image from Raspberry Pi camera (legacy picamera)")
-                return CameraCapture(success=True, image_data=image_data)
+                return CameraCapture(success=True, image=ImageBlob(stream.getvalue(), camera='rpi'))
                 
         except Exception as e:
             error_msg = "Legacy picamera capture error: {}".format(str(e))
@@ -547,12 +719,11 @@ class CameraService(object):
                     error_message="Could not capture frame from camera {}".format(camera_id)
                 )
             
-            # Convert to JPEG and base64
+            # Convert to JPEG
             _, buffer = cv2.imencode('.jpg', frame)
-            image_data = base64.b64encode(buffer).decode('utf-8')
             
             logger.info("Successfully captured image from camera {} (OpenCV)".format(camera_id))
-            return CameraCapture(success=True, image_data=image_data)
+            return CameraCapture(success=True, image=ImageBlob(buffer.tobytes(), camera='opencv'))
             
         except Exception as e:
             error_msg = "OpenCV capture error: {}".format(str(e))
@@ -670,29 +841,27 @@ class CameraService(object):
     # ============== END RASPBERRY PI METHODS ==============
     
     def create_combined_exit_image(self, plate_image=None, driver_image=None):
-        """Create combined exit image from plate and driver cameras"""
-        try:
-            images = []
-            
-            if plate_image:
-                # Decode base64 image
-                plate_data = base64.b64decode(plate_image)
-                plate_img = Image.open(io.BytesIO(plate_data))
-                images.append(plate_img)
+        """
+        Create combined exit image from plate and driver cameras
+        
+        Args:
+            plate_image: ImageBlob, raw bytes or base64 string
+            driver_image: ImageBlob, raw bytes or base64 string
             
-            if driver_image:
-                driver_data = base64.b64decode(driver_image)
-                driver_img = Image.open(io.BytesIO(driver_data))
-                images.append(driver_img)
+        Returns:
+            ImageBlob or None
+        """
+        try:
+            sources = [blob for blob in (ImageBlob.coerce(plate_image), ImageBlob.coerce(driver_image)) if blob]
             
-            if not images:
+            if not sources:
                 return None
             
-            if len(images) == 1:
-                # Only one image, return as-is
-                output = io.BytesIO()
-                images[0].save(output, format='JPEG', quality=85)
-                return base64.b64encode(output.getvalue()).decode('utf-8')
+            if len(sources) == 1:
+                # Only one image, return as-is (no decode/re-encode)
+                return sources[0]
+            
+            images = [Image.open(blob.stream()) for blob in sources]
             
             # Combine images side by side
             total_width = sum(img.width for img in images)
@@ -705,10 +874,9 @@ class CameraService(object):
                 combined.paste(img, (x_offset, 0))
                 x_offset += img.width
             
-            # Convert to base64
             output = io.BytesIO()
             combined.save(output, format='JPEG', quality=85)
-            return base64.b64encode(output.getvalue()).decode('utf-8')
+            return ImageBlob(output.getvalue(), content_type='image/jpeg', camera='combined')
             
         except Exception as e:
             logger.error("Error creating combined image: {}".format(str(e)))
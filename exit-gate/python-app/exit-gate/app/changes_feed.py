@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+CouchDB _changes Feed Follower untuk Exit Gate System
+Catch-up paged dari _changes lalu follow secara longpoll di background thread
+Compatible with Python 2.7 and 3.x
+"""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import os
+import json
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+class ChangesFollower(object):
+    """Follow CouchDB _changes feed dan dispatch setiap change ke listeners"""
+
+    def __init__(self, db, batch_size=500, poll_timeout=30, retry_delay=5, seq_file=None):
+        """
+        Initialize changes follower
+
+        Args:
+            db: couchdb.Database instance
+            batch_size (int): Number of changes fetched per page (default: 500)
+            poll_timeout (int): Longpoll timeout in seconds (default: 30)
+            retry_delay (int): Max delay in seconds between retries after an error (default: 5)
+            seq_file (str, optional): File where the last processed seq is persisted
+        """
+        self.db = db
+        self.batch_size = batch_size
+        self.poll_timeout = poll_timeout
+        self.retry_delay = retry_delay
+        self.seq_file = seq_file
+
+        self.last_seq = 0
+        self.listeners = []
+        self.lock = threading.RLock()
+
+        # Follow thread
+        self.follow_thread = None
+        self.stop_thread = False
+        self.healthy = False
+
+        self.stats = {
+            'changes_processed': 0,
+            'batches': 0,
+            'errors': 0,
+            'last_error': None,
+            'last_change_time': None
+        }
+
+    def add_listener(self, callback):
+        """Add change listener, dipanggil dengan (doc_id, doc, deleted)"""
+        self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        """Remove change listener"""
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def resume(self):
+        """
+        Position the follower at the persisted seq, or at the current end of the
+        feed when nothing was persisted yet (callers preload state themselves)
+
+        Returns:
+            The seq the follower will continue from
+        """
+        seq = self._load_seq()
+        if seq is None:
+            seq = self.db.info().get('update_seq', 0)
+            logger.info("No persisted changes seq, following from current update_seq")
+
+        with self.lock:
+            self.last_seq = seq
+        return seq
+
+    def catch_up(self):
+        """
+        Read the feed from last_seq to the current end in pages of batch_size
+
+        Returns:
+            int: Number of changes dispatched
+        """
+        total = 0
+
+        while True:
+            result = self.db.changes(since=self.last_seq, limit=self.batch_size,
+                                     include_docs=True)
+            rows = result.get('results', [])
+            self._dispatch(rows, result.get('last_seq', self.last_seq))
+            total += len(rows)
+
+            if len(rows) < self.batch_size:
+                break
+
+        self.healthy = True
+        logger.info("Changes feed caught up: {} changes (seq: {})".format(total, self._short_seq()))
+        return total
+
+    def start(self):
+        """Start background longpoll follow thread"""
+        if self.follow_thread and self.follow_thread.is_alive():
+            return
+
+        self.stop_thread = False
+        self.follow_thread = threading.Thread(target=self._follow_loop)
+        self.follow_thread.daemon = True
+        self.follow_thread.start()
+
+        logger.info("Changes feed follower started (since: {})".format(self._short_seq()))
+
+    def stop(self):
+        """Stop background follow thread"""
+        self.stop_thread = True
+        self.healthy = False
+        if self.follow_thread and self.follow_thread.is_alive():
+            self.follow_thread.join(timeout=1)
+
+        logger.info("Changes feed follower stopped")
+
+    def is_healthy(self):
+        """True jika follower sedang up-to-date dengan database"""
+        return self.healthy and not self.stop_thread
+
+    def get_stats(self):
+        """
+        Get follower statistics
+
+        Returns:
+            dict: Feed statistics
+        """
+        with self.lock:
+            stats = dict(self.stats)
+        stats['last_seq'] = self._short_seq()
+        stats['healthy'] = self.is_healthy()
+        stats['running'] = bool(self.follow_thread and self.follow_thread.is_alive())
+        return stats
+
+    def _follow_loop(self):
+        """Longpoll loop - one request open at a time, returns as soon as a change arrives"""
+        delay = 1
+
+        while not self.stop_thread:
+            try:
+                result = self.db.changes(feed='longpoll', since=self.last_seq,
+                                         limit=self.batch_size, include_docs=True,
+                                         timeout=self.poll_timeout * 1000)
+                self._dispatch(result.get('results', []), result.get('last_seq', self.last_seq))
+                self.healthy = True
+                delay = 1
+
+            except Exception as e:
+                self.healthy = False
+                with self.lock:
+                    self.stats['errors'] += 1
+                    self.stats['last_error'] = str(e)
+                logger.warning("Changes feed error (retry in {}s): {}".format(delay, str(e)))
+                time.sleep(delay)
+                delay = min(delay * 2, self.retry_delay)
+
+    def _dispatch(self, rows, last_seq):
+        """Dispatch change rows ke semua listeners lalu advance last_seq"""
+        for row in rows:
+            doc_id = row.get('id')
+            if not doc_id or doc_id.startswith('_design'):
+                continue
+
+            deleted = row.get('deleted', False)
+            doc = row.get('doc')
+
+            for listener in self.listeners:
+                try:
+                    listener(doc_id, doc, deleted)
+                except Exception as e:
+                    logger.error("Changes listener error for {}: {}".format(doc_id, str(e)))
+
+        with self.lock:
+            self.last_seq = last_seq
+            if rows:
+                self.stats['changes_processed'] += len(rows)
+                self.stats['batches'] += 1
+                self.stats['last_change_time'] = time.time()
+
+        if rows:
+            self._save_seq(last_seq)
+
+    def _load_seq(self):
+        """Load persisted seq, None if missing or unreadable"""
+        if not self.seq_file or not os.path.exists(self.seq_file):
+            return None
+
+        try:
+            with open(self.seq_file, 'r') as f:
+                return json.load(f).get('last_seq')
+        except Exception as e:
+            logger.warning("Cannot read changes seq file {}: {}".format(self.seq_file, str(e)))
+            return None
+
+    def _save_seq(self, seq):
+        """Persist seq atomically (write temp file, then rename over the old one)"""
+        if not self.seq_file:
+            return
+
+        tmp_file = self.seq_file + '.tmp'
+        try:
+            with open(tmp_file, 'w') as f:
+                json.dump({'last_seq': seq, 'saved_at': time.time()}, f)
+            try:
+                os.replace(tmp_file, self.seq_file)
+            except AttributeError:
+                # Python 2.7 has no os.replace; rename is atomic on POSIX
+                os.rename(tmp_file, self.seq_file)
+        except Exception as e:
+            logger.warning("Cannot persist changes seq: {}".format(str(e)))
+
+    def _short_seq(self):
+        """Shortened sequence for logging (CouchDB 2.x seqs are long opaque strings)"""
+        seq = str(self.last_seq)
+        return seq if len(seq) <= 20 else seq[:20] + '...'
@@ -54,6 +54,28 @@ class Config(object):
         self.config.set('database', 'password', 'password')
         self.config.set('database', 'auto_sync', 'True')
         self.config.set('database', 'sync_interval', '30')
+        self.config.set('database', 'identifier_index', 'True')
+        self.config.set('database', 'plate_index', 'True')  # Fuzzy plate matching for ALPR misreads
+        self.config.set('database', 'plate_fuzzy_max_distance', '1')
+        self.config.set('database', 'changes_batch_size', '500')
+        self.config.set('database', 'changes_poll_timeout', '30')
+        self.config.set('database', 'changes_seq_file', 'changes_seq.json')
+        self.config.set('database', 'scan_page_size', '200')
+        self.config.set('database', 'scan_time_budget_ms', '1500')
+        self.config.set('database', 'write_behind', 'True')  # Journal exit saves/attachments, drain after gate opens
+        self.config.set('database', 'write_behind_dir', 'write_behind')
+        self.config.set('database', 'write_behind_fsync', 'True')
+        self.config.set('database', 'write_behind_max_pending', '500')  # Above this, write synchronously
+        self.config.set('database', 'write_behind_max_attempts', '20')  # Then the write goes to dead_letter.log
+        self.config.set('database', 'write_behind_flush_timeout', '5')
+        
+        # HTTP connection pool (camera snapshots, CouchDB)
+        self.config.add_section('http')
+        self.config.set('http', 'pool_connections', '4')
+        self.config.set('http', 'pool_maxsize', '4')
+        self.config.set('http', 'max_retries', '2')
+        self.config.set('http', 'backoff_factor', '0.2')
+        self.config.set('http', 'couchdb_timeout', '30')
         
         # Serial/Gate settings
         self.config.add_section('gate')
@@ -82,6 +104,18 @@ class Config(object):
         self.config.set('camera', 'driver_camera_password', 'admin123')
         self.config.set('camera', 'snapshot_path', 'Streaming/Channels/1/picture')
         self.config.set('camera', 'capture_timeout', '5')
+        self.config.set('camera', 'exit_capture_deadline', '5')  # Overall deadline for parallel capture
+        self.config.set('camera', 'exit_capture_wait', '0.5')  # Max gate delay waiting for the exit photo
+        
+        # Continuous frame grabber (ring buffer per camera)
+        self.config.set('camera', 'grabber_enabled', 'False')
+        self.config.set('camera', 'grabber_buffer_size', '8')
+        self.config.set('camera', 'grabber_max_age', '1.0')  # Seconds before a buffered frame is stale
+        self.config.set('camera', 'grabber_max_frame_kb', '2048')
+        self.config.set('camera', 'grabber_snapshot_interval', '0.5')  # Used when no stream URL is set
+        self.config.set('camera', 'exit_camera_stream_url', '')  # rtsp:// or MJPEG http:// URL
+        self.config.set('camera', 'driver_camera_stream_url', '')
+        self.config.set('camera', 'grabber_fake', 'False')  # Synthetic frames for testing without cameras
         
         # Raspberry Pi Camera settings
         self.config.set('camera', 'raspberry_pi_enabled', 'True')
@@ -11,7 +11,6 @@ import json
 import logging
 import datetime
 import time
-import base64
 from typing import Optional, Dict, List, Any  # For IDE support, handled by typing backport
 
 import couchdb
@@ -19,11 +18,71 @@ import requests
 from requests.auth import HTTPBasicAuth
 
 from config import config
+from http_pool import http_pool
+from image_blob import ImageBlob
+from metrics import metrics
+from tariff_engine import tariff_engine, DEFAULT_TARIF_ROWS
 from member_cache import member_cache
-from member_views import MEMBER_VIEWS, TRANSACTION_VIEWS_ENHANCED, MEMBER_INDEXES
+from changes_feed import ChangesFollower
+from write_behind import WriteBehindQueue, OP_SAVE
+from identifier_index import identifier_index, TRANSACTION_TYPES
+from plate_index import plate_index
+from member_views import (MEMBER_VIEWS, TRANSACTION_VIEWS_ENHANCED, MEMBER_INDEXES,
+                          MEMBER_VIEW_MAPS, TRANSACTION_VIEW_MAPS_ENHANCED)
+from memory_db import MemoryDatabase
 
 logger = logging.getLogger(__name__)
 
+# Fields update_transaction_status sets on exit (the only journaled saves)
+EXIT_FIELDS = ('status', 'waktu_keluar', 'bayar_keluar', 'id_pintu_keluar', 'id_op_keluar',
+               'id_shift_keluar', 'exit_processed_at', 'updated_at', 'status_transaksi',
+               'exit_time', 'operator', 'gate_id')
+
+def exit_stats_key(doc):
+    """
+    [date, gate, vehicle_type] key of an exited transaction - mirrors the
+    transactions/exit_stats map function (used by the mock database)
+    """
+    if (doc.get('type') not in ('parking_transaction', 'member_entry') or
+            doc.get('status') != 1 or not doc.get('waktu_keluar')):
+        return None
+    vehicle = 'member' if doc.get('type') == 'member_entry' else str(doc.get('id_kendaraan') or 'unknown')
+    gate = doc.get('id_pintu_keluar') or doc.get('gate_id') or 'UNKNOWN'
+    return [doc['waktu_keluar'][:10], gate, vehicle]
+
+# Python mirrors of the _design/transactions map functions (see _setup_views)
+
+def _by_barcode(doc):
+    if doc.get('type') == 'parking_transaction' and doc.get('no_barcode'):
+        yield doc['no_barcode'], doc
+
+def _by_plate(doc):
+    if doc.get('type') == 'parking_transaction' and doc.get('no_pol'):
+        yield doc['no_pol'], doc
+    if doc.get('type') == 'member_entry' and doc.get('plat_nomor'):
+        yield doc['plat_nomor'], doc
+
+def _active_transactions(doc):
+    if doc.get('type') in ('parking_transaction', 'member_entry') and doc.get('status') == 0:
+        yield doc['_id'], doc
+
+def _exit_stats(doc):
+    key = exit_stats_key(doc)
+    if key:
+        try:
+            fee = float(doc.get('bayar_keluar') or 0)
+            fee = int(fee) if fee.is_integer() else fee
+        except (TypeError, ValueError):
+            fee = 0
+        yield key, [1, fee]
+
+TRANSACTION_VIEW_MAPS = {
+    'by_barcode': _by_barcode,
+    'by_plate': _by_plate,
+    'active_transactions': _active_transactions,
+    'exit_stats': (_exit_stats, '_sum')
+}
+
 class DatabaseService(object):
     """Database service for PouchDB/CouchDB compatibility"""
     
@@ -41,6 +100,18 @@ class DatabaseService(object):
         self.views_initialized = False
         self.member_cache_enabled = True
         
+        # Identifier index (barcode/card/plate -> doc id) kept live from _changes
+        self.identifier_index_enabled = config.getboolean('database', 'identifier_index', True)
+        self.changes_follower = None
+        
+        # Fuzzy plate index over active transactions (OCR misreads: B1234XV, 0/O, ...)
+        self.plate_index_enabled = config.getboolean('database', 'plate_index', True)
+        self.plate_fuzzy_max_distance = config.getint('database', 'plate_fuzzy_max_distance', 1)
+        
+        # Write-behind journal: exit saves/attachments drain after the gate opens
+        self.write_behind_enabled = config.getboolean('database', 'write_behind', True)
+        self.write_behind = None
+        
         self._sync_status = {
             'connected': False,
             'last_sync': None,
@@ -51,16 +122,14 @@ class DatabaseService(object):
         }
         
         self._initialize_database()
+        self._initialize_write_behind()
+        self.reload_tariffs()
     
     def _initialize_database(self):
         """Initialize local and remote database connections"""
         try:
-            # Initialize CouchDB server connection
-            if self.username and self.password:
-                self.server = couchdb.Server(self.remote_url)
-                self.server.resource.credentials = (self.username, self.password)
-            else:
-                self.server = couchdb.Server(self.remote_url)
+            # Initialize CouchDB server connection (shared keep-alive session)
+            self.server = http_pool.couchdb_server(self.remote_url, self.username, self.password)
             
             # Test connection first
             try:
@@ -98,6 +167,9 @@ class DatabaseService(object):
             # Initialize member optimization views
             self._initialize_member_views()
             
+            # Build identifier index / member cache feed and start following _changes
+            self._initialize_changes_feed()
+            
             # Test connection
             self._sync_status['connected'] = True
             logger.info("Database connection established")
@@ -108,113 +180,25 @@ class DatabaseService(object):
             self._initialize_mock_database()
     
     def _initialize_mock_database(self):
-        """Initialize mock database for testing when CouchDB is not available"""
+        """Initialize in-memory database (indexed views) when CouchDB is not available"""
         try:
-            logger.info("Initializing mock database...")
-            
-            # Create mock database object
-            class MockDatabase:
-                def __init__(self):
-                    self.docs = {}
-                    self.views = {}
-                
-                def __getitem__(self, doc_id):
-                    if doc_id in self.docs:
-                        return self.docs[doc_id].copy()
-                    else:
-                        raise couchdb.ResourceNotFound("Document not found: {}".format(doc_id))
-                
-                def __setitem__(self, doc_id, doc):
-                    self.docs[doc_id] = doc.copy()
-                
-                def __contains__(self, doc_id):
-                    return doc_id in self.docs
-                
-                def __iter__(self):
-                    return iter(self.docs.keys())
-                
-                def get(self, doc_id, default=None):
-                    return self.docs.get(doc_id, default)
-                
-                def save(self, doc):
-                    doc_id = doc.get('_id')
-                    if not doc_id:
-                        import uuid
-                        doc_id = str(uuid.uuid4())
-                        doc['_id'] = doc_id
-                    
-                    # Add revision if not exists
-                    if '_rev' not in doc:
-                        doc['_rev'] = '1-{}'.format(hash(str(doc)) % 1000000)
-                    
-                    self.docs[doc_id] = doc.copy()
-                    logger.info("Mock DB: Saved document {}".format(doc_id))
-                    return doc_id, doc['_rev']
-                
-                def delete(self, doc):
-                    doc_id = doc.get('_id')
-                    if doc_id in self.docs:
-                        del self.docs[doc_id]
-                        logger.info("Mock DB: Deleted document {}".format(doc_id))
-                        return True
-                    return False
-                
-                def view(self, view_name, **kwargs):
-                    # Simple mock view implementation
-                    result = []
-                    
-                    if view_name == 'transactions/by_barcode':
-                        key = kwargs.get('key')
-                        for doc_id, doc in self.docs.items():
-                            if (doc.get('type') in ['parking_transaction', 'member_entry'] and
-                                (doc.get('no_barcode') == key or doc.get('card_number') == key)):
-                                result.append(MockRow(doc_id, doc))
-                    
-                    elif view_name == 'transactions/by_plate':
-                        key = kwargs.get('key')
-                        for doc_id, doc in self.docs.items():
-                            if (doc.get('type') in ['parking_transaction', 'member_entry'] and
-                                (doc.get('no_pol') == key or doc.get('plat_nomor') == key)):
-                                result.append(MockRow(doc_id, doc))
-                    
-                    elif view_name == 'transactions/active_transactions':
-                        limit = kwargs.get('limit', 100)
-                        count = 0
-                        for doc_id, doc in self.docs.items():
-                            if (doc.get('type') in ['parking_transaction', 'member_entry'] and
-                                doc.get('status') == 0 and count < limit):
-                                result.append(MockRow(doc_id, doc))
-                                count += 1
-                    
-                    return result
-                
-                def info(self):
-                    return {'doc_count': len(self.docs)}
-                
-                def put_attachment(self, doc, data, filename, content_type):
-                    # Mock attachment storage
-                    doc_id = doc.get('_id')
-                    if doc_id in self.docs:
-                        if '_attachments' not in self.docs[doc_id]:
-                            self.docs[doc_id]['_attachments'] = {}
-                        self.docs[doc_id]['_attachments'][filename] = {
-                            'content_type': content_type,
-                            'length': len(data),
-                            'data': 'mock_attachment_data'
-                        }
-                        logger.info("Mock DB: Added attachment {} to {}".format(filename, doc_id))
-                        return True
-                    return False
+            logger.info("Initializing in-memory database...")
             
-            class MockRow:
-                def __init__(self, key, value):
-                    self.key = key
-                    self.value = value
+            self.local_db = MemoryDatabase(self.local_db_name)
+            self.local_db.register_design('transactions', TRANSACTION_VIEW_MAPS)
+            self.local_db.register_design('members', MEMBER_VIEW_MAPS)
+            self.local_db.register_design('transactions_enhanced', TRANSACTION_VIEW_MAPS_ENHANCED)
+            self.views_initialized = True
             
-            self.local_db = MockDatabase()
             self._sync_status['connected'] = True
             self._sync_status['error_message'] = "Using mock database (CouchDB not available)"
             
+            # Mock writes all go through this service, so the index stays authoritative
+            if self.identifier_index_enabled:
+                identifier_index.build_from_docs(self.local_db.docs.values())
+            if self.plate_index_enabled:
+                plate_index.build_from_docs(self.local_db.docs.values())
+            
             logger.info("Mock database initialized successfully")
             
         except Exception as e:
@@ -225,7 +209,7 @@ class DatabaseService(object):
     def _setup_views(self):
         """Setup CouchDB views for efficient querying"""
         
-        # Skip view setup for mock database
+        # Mock database registers Python mirrors of these views as in-memory indexes
         if hasattr(self.local_db, 'docs'):  # Mock database check
             logger.info("Skipping view setup for mock database")
             return
@@ -257,17 +241,19 @@ class DatabaseService(object):
                         }
                     }'''
                 },
-                'today_exits': {
+                'exit_stats': {
+                    # Value [count, fee] so one _sum yields both exits and revenue per group;
+                    # the date comes from waktu_keluar, never from the clock at index time
                     'map': '''function(doc) {
-                        if ((doc.type === 'parking_transaction' || doc.type === 'member_entry') && 
-                            doc.status === 1 && doc.waktu_keluar) {
-                            var exitDate = new Date(doc.waktu_keluar);
-                            var today = new Date();
-                            if (exitDate.toDateString() === today.toDateString()) {
-                                emit(doc._id, doc);
-                            }
+                        if ((doc.type === 'parking_transaction' || doc.type === 'member_entry') &&
+                            doc.status === 1 && typeof doc.waktu_keluar === 'string') {
+                            var vehicle = doc.type === 'member_entry' ? 'member' : String(doc.id_kendaraan || 'unknown');
+                            var gate = doc.id_pintu_keluar || doc.gate_id || 'UNKNOWN';
+                            emit([doc.waktu_keluar.substring(0, 10), gate, vehicle],
+                                 [1, Number(doc.bayar_keluar) || 0]);
                         }
-                    }'''
+                    }''',
+                    'reduce': '_sum'
                 }
             }
         }
@@ -359,7 +345,227 @@ class DatabaseService(object):
             logger.error("Failed to initialize member views: {}".format(str(e)))
             self.views_initialized = False
             return False
+
+    def _initialize_changes_feed(self):
+        """Start _changes follower yang menjaga identifier index dan member cache tetap live"""
+        if not self.identifier_index_enabled and not self.member_cache_enabled:
+            logger.info("Identifier index and member cache disabled - not following _changes")
+            return False
+
+        try:
+            self.changes_follower = ChangesFollower(
+                self.local_db,
+                batch_size=config.getint('database', 'changes_batch_size', 500),
+                poll_timeout=config.getint('database', 'changes_poll_timeout', 30),
+                seq_file=config.get('database', 'changes_seq_file', 'changes_seq.json')
+            )
+
+            if self.member_cache_enabled:
+                member_cache.attach_feed(self.changes_follower)
+
+            if self.plate_index_enabled:
+                # Only active transactions matter: seed from the view, _changes keeps it live
+                plate_index.build_from_docs(
+                    row.value for row in self.local_db.view('transactions/active_transactions'))
+                self.changes_follower.add_listener(plate_index.on_change)
+
+            if self.identifier_index_enabled:
+                # The index lives in memory, so it always replays the feed from seq 0
+                count = identifier_index.build_from_changes(self.changes_follower)
+                logger.info("✅ Identifier index ready ({} transactions)".format(count))
+            else:
+                # Members were preloaded from the view; resume from the persisted seq
+                self.changes_follower.resume()
+                self.changes_follower.catch_up()
+
+            self.changes_follower.start()
+            return True
+
+        except Exception as e:
+            logger.error("Failed to start _changes feed: {}".format(str(e)))
+            identifier_index.clear()
+            plate_index.clear()
+            if self.changes_follower:
+                self.changes_follower.stop()
+                self.changes_follower = None
+            return False
+
+    def _index_doc(self, doc, deleted=False):
+        """Apply a local write to the identifier index without waiting for _changes"""
+        if self.identifier_index_enabled and doc and doc.get('_id'):
+            identifier_index.update_doc(doc['_id'], doc, deleted)
+        if self.plate_index_enabled and doc and doc.get('_id'):
+            plate_index.update_doc(doc['_id'], doc, deleted)
+
+    def _identifier_index_authoritative(self):
+        """True jika index miss boleh langsung dianggap 'not found'"""
+        if not self.identifier_index_enabled or not identifier_index.ready:
+            return False
+        if hasattr(self.local_db, 'docs'):  # Mock database - every write goes through us
+            return True
+        return self.changes_follower is not None and self.changes_follower.is_healthy()
+
+    @metrics.span('db.index_lookup')
+    def find_transaction_by_identifier(self, identifier):
+        """
+        Resolve barcode / transaction ID / card number / plate via identifier index
+        Cost: one dict lookup plus at most one document GET
+
+        Args:
+            identifier (str): Scanned code or plate number
+
+        Returns:
+            tuple: (transaction, search_method), (None, None) on a miss, or
+                   (None, search_method) when the indexed entry turned out stale
+        """
+        doc_id, search_method = identifier_index.lookup(identifier)
+        if not doc_id:
+            return None, None
+
+        try:
+            doc = self.local_db[doc_id]
+        except couchdb.ResourceNotFound:
+            identifier_index.mark_stale(doc_id)
+            return None, search_method
+
+        # Card and plate resolution only accept active transactions
+        if (doc.get('type') not in TRANSACTION_TYPES or
+                (search_method != 'barcode' and doc.get('status') != 0)):
+            identifier_index.mark_stale(doc_id, doc)
+            return None, search_method
+
+        if search_method == 'member_card' and self.member_cache_enabled:
+            member_cache.put(doc.get('card_number'), doc)
+
+        logger.info("Found transaction {} via identifier index ({})".format(doc_id, search_method))
+        return doc, search_method
+
+    def _initialize_write_behind(self):
+        """Open write-behind journal (replaying unacknowledged writes) and start draining"""
+        if not self.write_behind_enabled or self.local_db is None:
+            return
+        if hasattr(self.local_db, 'docs'):
+            logger.info("Mock database - write-behind queue disabled (writes are in-memory)")
+            return
+        
+        try:
+            self.write_behind = WriteBehindQueue(
+                config.get('database', 'write_behind_dir', 'write_behind'),
+                self._apply_write_behind,
+                fsync=config.getboolean('database', 'write_behind_fsync', True),
+                max_pending=config.getint('database', 'write_behind_max_pending', 500),
+                max_attempts=config.getint('database', 'write_behind_max_attempts', 20),
+                is_permanent=self._is_permanent_write_error
+            )
+            self.write_behind.start()
+        except Exception as e:
+            logger.error("Write-behind queue unavailable, writing synchronously: {}".format(str(e)))
+            self.write_behind = None
+    
+    @staticmethod
+    def _is_permanent_write_error(error):
+        """CouchDB rejected the write itself (4xx: validation, forbidden, bad request) - retrying won't help"""
+        server_error = getattr(couchdb, 'ServerError', None)
+        if server_error is not None and isinstance(error, server_error):
+            status = error.args[0][0] if error.args and isinstance(error.args[0], tuple) else None
+            return isinstance(status, int) and 400 <= status < 500 and status not in (408, 429)
+        return isinstance(error, (TypeError, ValueError))  # document can't be encoded
+
+    def _write_behind_available(self):
+        """True if writes can be queued (queue running and not backlogged)"""
+        if not self.write_behind:
+            return False
+        if self.write_behind.is_backlogged():
+            logger.warning("Write-behind backlog full ({} pending), writing synchronously".format(
+                self.write_behind.depth()))
+            return False
+        return True
+    
+    def _save_doc(self, doc):
+        """
+        Save document; on a revision conflict merge only the exit fields into the
+        current revision (a replayed journal entry may already have been written
+        before the crash, and concurrent edits / attachments must survive)
+        """
+        try:
+            self.local_db.save(doc)
+        except couchdb.ResourceConflict:
+            current = self.local_db.get(doc['_id'])
+            if current is None:
+                doc.pop('_rev', None)
+                logger.warning("Revision conflict saving {}, document gone - recreating".format(doc['_id']))
+                self.local_db.save(doc)
+                return
+            
+            if current.get('status') != 0:
+                logger.warning("Revision conflict saving {}: exit already recorded at {}, keeping it".format(
+                    doc['_id'], current.get('waktu_keluar')))
+                return
+            
+            for field in EXIT_FIELDS:
+                if field in doc:
+                    current[field] = doc[field]
+            logger.warning("Revision conflict saving {}, merged exit fields into {}".format(
+                doc['_id'], current['_rev']))
+            self.local_db.save(current)
+    
+    @metrics.span('db.write_behind_apply')
+    def _apply_write_behind(self, entry, data):
+        """Write one journaled operation to CouchDB (called from the drain thread)"""
+        if entry['op'] == OP_SAVE:
+            self._save_doc(entry['doc'])
+        else:
+            doc = self.local_db[entry['doc_id']]
+            self.local_db.put_attachment(doc, data, filename=entry['filename'],
+                                         content_type=entry['content_type'])
+            logger.info("Added image {} ({} bytes) to transaction {}".format(
+                entry['filename'], len(data), entry['doc_id']))
+    
+    @metrics.span('db.persist')
+    def _persist_doc(self, doc):
+        """
+        Save via write-behind journal when available, otherwise synchronously
+        
+        Returns:
+            bool: True if queued, False if written synchronously
+        """
+        if self._write_behind_available():
+            self.write_behind.enqueue_save(doc)
+            return True
+        self.local_db.save(doc)
+        return False
+    
+    def _with_pending_writes(self, doc):
+        """Overlay the queued (not yet written) version of a document - read your own writes"""
+        if self.write_behind and doc:
+            pending = self.write_behind.pending_doc(doc['_id'])
+            if pending:
+                return dict(pending)
+        return doc
     
+    def get_write_behind_stats(self):
+        """Get write-behind queue statistics"""
+        if not self.write_behind:
+            return {'enabled': False}
+        stats = self.write_behind.get_stats()
+        stats['enabled'] = True
+        return stats
+    
+    def get_identifier_index_stats(self):
+        """Get identifier index and _changes follower statistics"""
+        stats = identifier_index.get_stats()
+        stats['enabled'] = self.identifier_index_enabled
+        stats['authoritative'] = self._identifier_index_authoritative()
+        stats['changes_feed'] = self.changes_follower.get_stats() if self.changes_follower else None
+        return stats
+
+    def get_plate_index_stats(self):
+        """Get fuzzy plate index statistics"""
+        stats = plate_index.get_stats()
+        stats['enabled'] = self.plate_index_enabled
+        stats['fuzzy_max_distance'] = self.plate_fuzzy_max_distance
+        return stats
+
     def find_transaction_by_barcode(self, barcode):
         """
         Find transaction by barcode
@@ -381,59 +587,27 @@ class DatabaseService(object):
                 logger.error("Database not connected")
                 return None
             
-            # Strategy 1: Check if input is already a full transaction ID
+            # Strategy 1-3: Full transaction ID, transaction_{barcode} and alternative
+            # ID patterns, resolved together in one _all_docs?keys=[...] request
+            candidate_ids = []
             if barcode.lower().startswith('transaction_'):
-                # Handle case-insensitive search
-                actual_id = barcode.lower()
-                try:
-                    doc = self.local_db[actual_id]
-                    if doc.get('type') in ['parking_transaction', 'member_entry']:
-                        logger.info("Found transaction by full ID (lowercase): {}".format(actual_id))
-                        return doc
-                except couchdb.ResourceNotFound:
-                    # Try exact case
-                    try:
-                        doc = self.local_db[barcode]
-                        if doc.get('type') in ['parking_transaction', 'member_entry']:
-                            logger.info("Found transaction by full ID (exact case): {}".format(barcode))
-                            return doc
-                    except couchdb.ResourceNotFound:
-                        pass
-                except Exception as e:
-                    logger.warning("Error checking full ID {}: {}".format(barcode, str(e)))
-            
-            # Strategy 2: Direct lookup by transaction ID pattern
-            # Primary pattern: transaction_{barcode}
-            primary_id = "transaction_{}".format(barcode)
-            
-            try:
-                doc = self.local_db[primary_id]
-                if doc.get('type') in ['parking_transaction', 'member_entry']:
-                    logger.info("Found transaction by primary ID: {}".format(primary_id))
-                    return doc
-            except couchdb.ResourceNotFound:
-                pass
-            except Exception as e:
-                logger.warning("Error checking primary ID {}: {}".format(primary_id, str(e)))
-            
-            # Strategy 3: Alternative ID patterns
-            alternative_ids = [
+                # Handle case-insensitive search, then exact case
+                candidate_ids.extend([barcode.lower(), barcode])
+            candidate_ids.extend([
+                "transaction_{}".format(barcode),  # Primary pattern
                 barcode,  # Direct barcode as ID
                 "parking_{}".format(barcode),
                 "member_{}".format(barcode)
-            ]
+            ])
             
-            for transaction_id in alternative_ids:
-                try:
-                    doc = self.local_db[transaction_id]
-                    if doc.get('type') in ['parking_transaction', 'member_entry']:
-                        logger.info("Found transaction by alternative ID: {}".format(transaction_id))
-                        return doc
-                except couchdb.ResourceNotFound:
-                    continue
-                except Exception as e:
-                    logger.warning("Error checking alternative ID {}: {}".format(transaction_id, str(e)))
-                    continue
+            try:
+                doc_id, doc = self._get_first_candidate(
+                    candidate_ids, lambda d: d.get('type') in TRANSACTION_TYPES)
+                if doc:
+                    logger.info("Found transaction by ID pattern: {}".format(doc_id))
+                    return doc
+            except Exception as e:
+                logger.warning("Error checking candidate IDs for {}: {}".format(barcode, str(e)))
             
             # Strategy 4: Search by barcode field in views (untuk active transactions)
             try:
@@ -469,37 +643,17 @@ class DatabaseService(object):
             except Exception as e:
                 logger.warning("Active transaction manual search failed: {}".format(str(e)))
             
-            # Strategy 6: Fallback - scan all documents if database is small (untuk semua status)
+            # Strategy 6: Fallback - bounded paged scan if database is small (untuk semua status)
             try:
                 # Only do this if we have a small number of docs
                 db_info = self.local_db.info()
                 doc_count = db_info.get('doc_count', 0)
                 
                 if doc_count < 1000:  # Only scan if less than 1000 docs
-                    logger.info("Performing full database scan (doc_count: {})".format(doc_count))
-                    for doc_id in self.local_db:
-                        if doc_id.startswith('_design'):
-                            continue
-                        try:
-                            doc = self.local_db[doc_id]
-                            if doc.get('type') in ['parking_transaction', 'member_entry']:
-                                
-                                # Extract barcode from transaction ID (transaction_{barcode})
-                                extracted_barcode = None
-                                if doc_id.startswith('transaction_'):
-                                    extracted_barcode = doc_id.replace('transaction_', '')
-                                      # Check if barcode matches any field or extracted barcode (case-insensitive)
-                            if (str(extracted_barcode).lower() == str(barcode).lower() or
-                                str(doc.get('no_barcode', '')).lower() == str(barcode).lower() or
-                                str(doc.get('barcode', '')).lower() == str(barcode).lower() or
-                                str(doc.get('ticket_number', '')).lower() == str(barcode).lower() or
-                                str(doc.get('card_number', '')).lower() == str(barcode).lower() or
-                                doc_id.lower().endswith('_{}'.format(barcode.lower())) or
-                                doc_id.lower() == barcode.lower()):# Direct ID match
-                                    logger.info("Found transaction by full scan: {} (extracted barcode: {}, status: {})".format(doc_id, extracted_barcode, doc.get('status')))
-                                    return doc
-                        except:
-                            continue
+                    logger.info("Performing paged database scan (doc_count: {})".format(doc_count))
+                    doc, timed_out = self._scan_transactions_paged(barcode)
+                    if doc:
+                        return doc
                 else:
                     logger.info("Skipping full scan - too many documents: {}".format(doc_count))
                     
@@ -525,72 +679,43 @@ class DatabaseService(object):
                 logger.error("Database not connected")
                 return None
             
-            # Strategy 1: Check if input is already a full transaction ID
+            # Strategy 1-2: Full transaction ID and transaction_{barcode} in one bulk request
+            candidate_ids = []
             if barcode.lower().startswith('transaction_'):
-                # Handle case-insensitive search
-                actual_id = barcode.lower()
-                try:
-                    doc = self.local_db[actual_id]
-                    if doc.get('type') in ['parking_transaction', 'member_entry']:
-                        logger.info("Found transaction by full ID (lowercase): {} (status: {})".format(actual_id, doc.get('status')))
-                        return doc
-                except couchdb.ResourceNotFound:
-                    # Try exact case
-                    try:
-                        doc = self.local_db[barcode]
-                        if doc.get('type') in ['parking_transaction', 'member_entry']:
-                            logger.info("Found transaction by full ID (exact case): {} (status: {})".format(barcode, doc.get('status')))
-                            return doc
-                    except couchdb.ResourceNotFound:
-                        pass
-                except Exception as e:
-                    logger.warning("Error checking full ID {}: {}".format(barcode, str(e)))
+                candidate_ids.extend([barcode.lower(), barcode])
+            candidate_ids.append("transaction_{}".format(barcode))
             
-            # Strategy 2: Direct lookup by transaction ID pattern
-            primary_id = "transaction_{}".format(barcode)
             try:
-                doc = self.local_db[primary_id]
-                if doc.get('type') in ['parking_transaction', 'member_entry']:
-                    logger.info("Found transaction by primary ID: {} (status: {})".format(primary_id, doc.get('status')))
+                doc_id, doc = self._get_first_candidate(
+                    candidate_ids, lambda d: d.get('type') in TRANSACTION_TYPES)
+                if doc:
+                    logger.info("Found transaction by ID pattern: {} (status: {})".format(doc_id, doc.get('status')))
                     return doc
-            except couchdb.ResourceNotFound:
-                pass
             except Exception as e:
-                logger.warning("Error checking primary ID {}: {}".format(primary_id, str(e)))
+                logger.warning("Error checking candidate IDs for {}: {}".format(barcode, str(e)))
             
-            # Strategy 3: Full database scan (all statuses)
-            try:
-                db_info = self.local_db.info()
-                doc_count = db_info.get('doc_count', 0)
-                
-                logger.info("Performing full database scan for ANY status (doc_count: {})".format(doc_count))
-                for doc_id in self.local_db:
-                    if doc_id.startswith('_design'):
-                        continue
-                    try:
-                        doc = self.local_db[doc_id]
-                        if doc.get('type') in ['parking_transaction', 'member_entry']:
-                            
-                            # Extract barcode from transaction ID
-                            extracted_barcode = None
-                            if doc_id.startswith('transaction_'):
-                                extracted_barcode = doc_id.replace('transaction_', '')
-                            
-                            # Check if barcode matches (case-insensitive)
-                            if (str(extracted_barcode).lower() == str(barcode).lower() or
-                                str(doc.get('no_barcode', '')).lower() == str(barcode).lower() or
-                                str(doc.get('barcode', '')).lower() == str(barcode).lower() or
-                                str(doc.get('ticket_number', '')).lower() == str(barcode).lower() or
-                                str(doc.get('card_number', '')).lower() == str(barcode).lower() or
-                                doc_id.lower().endswith('_{}'.format(barcode.lower())) or
-                                doc_id.lower() == barcode.lower()):
-                                logger.info("Found transaction by full scan: {} (extracted barcode: {}, status: {})".format(doc_id, extracted_barcode, doc.get('status')))
-                                return doc
-                    except:
-                        continue
-                        
-            except Exception as e:
-                logger.warning("Full scan failed: {}".format(str(e)))
+            # Strategy 3: Indexed any-status view (single request, all identifiers)
+            view_available = False
+            if self.views_initialized:
+                try:
+                    doc = self._find_by_barcode_any_view(barcode)
+                    view_available = True
+                    if doc:
+                        logger.info("Found transaction by barcode_any view: {} (status: {})".format(doc['_id'], doc.get('status')))
+                        return doc
+                except Exception as e:
+                    logger.warning("Barcode any-status view failed: {}".format(str(e)))
+            
+            # Strategy 4: Paged _all_docs scan with a fixed time budget (view unavailable)
+            if not view_available:
+                try:
+                    doc, timed_out = self._scan_transactions_paged(barcode)
+                    if doc:
+                        return doc
+                    if timed_out:
+                        logger.warning("Scan time budget exhausted for barcode: {}".format(barcode))
+                except Exception as e:
+                    logger.warning("Paged scan failed: {}".format(str(e)))
             
             logger.info("No transaction found for barcode: {} (any status)".format(barcode))
             return None
@@ -599,6 +724,139 @@ class DatabaseService(object):
             logger.error("Error finding ANY transaction by barcode {}: {}".format(barcode, str(e)))
             return None
     
+    def _get_docs_bulk(self, doc_ids):
+        """
+        Fetch several documents in a single _all_docs?keys=[...]&include_docs=true request
+        
+        Args:
+            doc_ids (list): Document IDs (missing/deleted IDs are simply absent from the result)
+            
+        Returns:
+            dict: doc_id -> document
+        """
+        unique_ids = []
+        for doc_id in doc_ids:
+            if doc_id and doc_id not in unique_ids:
+                unique_ids.append(doc_id)
+        
+        if not unique_ids:
+            return {}
+        
+        docs = {}
+        for row in self.local_db.view('_all_docs', keys=unique_ids, include_docs=True):
+            # Missing keys come back as error rows, deleted docs with doc = null
+            if getattr(row, 'doc', None):
+                docs[row.key] = row.doc
+        return docs
+    
+    def _get_first_candidate(self, candidate_ids, accept):
+        """
+        Resolve candidate IDs in one bulk request and return the first accepted one in order
+        
+        Returns:
+            tuple: (doc_id, doc) or (None, None)
+        """
+        docs = self._get_docs_bulk(candidate_ids)
+        for doc_id in candidate_ids:
+            doc = docs.get(doc_id)
+            if doc and accept(doc):
+                return doc_id, doc
+        return None, None
+    
+    def _barcode_matches(self, doc_id, doc, barcode):
+        """Case-insensitive barcode match against _id and barcode fields (legacy full-scan rules)"""
+        wanted = str(barcode).lower()
+        lowered_id = doc_id.lower()
+        
+        # Extract barcode from transaction ID (transaction_{barcode})
+        extracted_barcode = None
+        if doc_id.startswith('transaction_'):
+            extracted_barcode = doc_id.replace('transaction_', '')
+        
+        return (str(extracted_barcode).lower() == wanted or
+                str(doc.get('no_barcode', '')).lower() == wanted or
+                str(doc.get('barcode', '')).lower() == wanted or
+                str(doc.get('ticket_number', '')).lower() == wanted or
+                str(doc.get('card_number', '')).lower() == wanted or
+                lowered_id.endswith('_{}'.format(wanted)) or
+                lowered_id == wanted)
+    
+    def _find_by_barcode_any_view(self, barcode):
+        """
+        Lookup via transactions_enhanced/by_barcode_any (any status)
+        Active transactions win when several documents share the identifier
+        
+        Returns:
+            dict or None: Matching transaction
+        """
+        result = self.local_db.view('transactions_enhanced/by_barcode_any',
+                                    key=str(barcode).lower(), include_docs=True, limit=20)
+        
+        fallback = None
+        for row in result:
+            doc = row.doc
+            if not doc or doc.get('type') not in TRANSACTION_TYPES:
+                continue
+            if doc.get('status') == 0:
+                return doc
+            if fallback is None:
+                fallback = doc
+        return fallback
+    
+    def _fetch_docs_page(self, startkey, limit):
+        """One _all_docs page with include_docs, starting at startkey (inclusive)"""
+        options = {'include_docs': True, 'limit': limit}
+        if startkey is not None:
+            options['startkey'] = startkey
+        return [(row.id, row.doc) for row in self.local_db.view('_all_docs', **options)]
+    
+    def _scan_transactions_paged(self, barcode, time_budget_ms=None, page_size=None):
+        """
+        Scan transactions in _all_docs pages (include_docs) until a match or the time budget runs out
+        Replaces the old one-GET-per-document full scan
+        
+        Args:
+            barcode (str): Barcode to match
+            time_budget_ms (int, optional): Latency ceiling for the whole scan
+            page_size (int, optional): Documents per _all_docs request
+            
+        Returns:
+            tuple: (doc or None, timed_out)
+        """
+        if time_budget_ms is None:
+            time_budget_ms = config.getint('database', 'scan_time_budget_ms', 1500)
+        if page_size is None:
+            page_size = config.getint('database', 'scan_page_size', 200)
+        
+        start_time = time.time()
+        startkey = None
+        scanned = 0
+        
+        while True:
+            # Fetch one extra row so the next page starts on it without skip
+            rows = self._fetch_docs_page(startkey, page_size + 1)
+            page, next_row = rows[:page_size], rows[page_size:]
+            
+            for doc_id, doc in page:
+                scanned += 1
+                if (doc_id.startswith('_design') or not doc or
+                        doc.get('type') not in TRANSACTION_TYPES):
+                    continue
+                if self._barcode_matches(doc_id, doc, barcode):
+                    logger.info("Found transaction by paged scan: {} (status: {}, scanned: {})".format(
+                        doc_id, doc.get('status'), scanned))
+                    return doc, False
+            
+            if not next_row:
+                return None, False
+            
+            elapsed = (time.time() - start_time) * 1000
+            if elapsed >= time_budget_ms:
+                logger.warning("Paged scan stopped after {} docs ({:.2f}ms budget)".format(scanned, elapsed))
+                return None, True
+            
+            startkey = next_row[0][0]
+    
     def find_member_transaction_optimized(self, card_number):
         """
         Optimized member transaction lookup dengan multiple strategies
@@ -627,32 +885,29 @@ class DatabaseService(object):
                     logger.info("✅ Found member in cache ({:.2f}ms)".format(elapsed))
                     return cached_result
             
-            # Strategy 2: Direct ID pattern lookup (Fast - 1-3ms)
+            # Strategy 2: Direct ID pattern lookup, one bulk request (Fast - 1-3ms)
             member_id_patterns = [
                 "member_{}".format(card_number),
                 "member_entry_{}".format(card_number),
                 card_number  # Direct card as ID
             ]
             
-            for pattern in member_id_patterns:
-                try:
-                    doc = self.local_db[pattern]
-                    if (doc.get('type') == 'member_entry' and 
-                        doc.get('status') == 0 and 
-                        doc.get('card_number') == card_number):
-                        
-                        # Cache the result
-                        if self.member_cache_enabled:
-                            member_cache.put(card_number, doc)
-                        
-                        elapsed = (time.time() - start_time) * 1000
-                        logger.info("✅ Found member by direct ID: {} ({:.2f}ms)".format(pattern, elapsed))
-                        return doc
-                except couchdb.ResourceNotFound:
-                    continue
-                except Exception as e:
-                    logger.warning("Error checking direct ID {}: {}".format(pattern, str(e)))
-                    continue
+            try:
+                pattern, doc = self._get_first_candidate(
+                    member_id_patterns,
+                    lambda d: (d.get('type') == 'member_entry' and
+                               d.get('status') == 0 and
+                               d.get('card_number') == card_number))
+                if doc:
+                    # Cache the result
+                    if self.member_cache_enabled:
+                        member_cache.put(card_number, doc)
+                    
+                    elapsed = (time.time() - start_time) * 1000
+                    logger.info("✅ Found member by direct ID: {} ({:.2f}ms)".format(pattern, elapsed))
+                    return doc
+            except Exception as e:
+                logger.warning("Error checking direct IDs for card {}: {}".format(card_number, str(e)))
             
             # Strategy 3: Indexed view lookup (Fast - 3-10ms)
             if self.views_initialized:
@@ -742,8 +997,8 @@ class DatabaseService(object):
             
             members_list = []
             
-            if self.views_initialized and not hasattr(self.local_db, 'docs'):
-                # Use optimized view for real database
+            if self.views_initialized:
+                # Use optimized view
                 try:
                     result = self.local_db.view('members/active_members', include_docs=True)
                     for row in result:
@@ -799,6 +1054,7 @@ class DatabaseService(object):
             
             # Save to database
             self.local_db.save(transaction)
+            self._index_doc(transaction)
             
             # Cache the new transaction
             if self.member_cache_enabled:
@@ -811,6 +1067,7 @@ class DatabaseService(object):
             logger.error("Failed to create member transaction: {}".format(str(e)))
             return None
     
+    @metrics.span('db.update_status')
     def update_transaction_status(self, transaction, operator="SYSTEM", gate_id="EXIT_GATE_01", exit_image_data=None):
         """
         Unified method untuk update status transaksi dari 0 ke 1 (exit)
@@ -859,8 +1116,9 @@ class DatabaseService(object):
                 transaction['operator'] = operator
                 transaction['gate_id'] = gate_id
             
-            # Save to database
-            self.local_db.save(transaction)
+            # Save to database (journaled and drained in the background when write-behind is on)
+            queued = self._persist_doc(transaction)
+            self._index_doc(transaction)
             
             # Add exit image as attachment if provided
             if exit_image_data:
@@ -889,7 +1147,8 @@ class DatabaseService(object):
                 'transaction_type': transaction_type,
                 'fee': fee,
                 'duration_hours': duration_hours,
-                'exit_time': exit_time.isoformat()
+                'exit_time': exit_time.isoformat(),
+                'write_queued': queued
             }
             
         except Exception as e:
@@ -944,8 +1203,15 @@ class DatabaseService(object):
             else:
                 logger.info("Invalidated entire member cache")
     
-    def find_transaction_by_plate(self, plate_number):
-        """Find transaction by plate number"""
+    def find_transaction_by_plate(self, plate_number, fuzzy=False):
+        """
+        Find transaction by plate number (exact view lookup)
+
+        Args:
+            plate_number (str): Plate to look up
+            fuzzy (bool): Resolve OCR misreads via the fuzzy plate index -
+                only for ALPR reads, never for typed / scanned identifiers
+        """
         try:
             # Try plate number view
             try:
@@ -956,6 +1222,10 @@ class DatabaseService(object):
             except:
                 pass
             
+            # OCR misread / different spelling: ranked candidates from the plate index
+            if fuzzy and self.plate_index_enabled and plate_index.ready:
+                return self.find_transaction_by_plate_fuzzy(plate_number)
+            
             # Scan active transactions
             try:
                 result = self.local_db.view('transactions/active_transactions')
@@ -973,64 +1243,156 @@ class DatabaseService(object):
             logger.error("Error finding transaction by plate {}: {}".format(plate_number, str(e)))
             return None
     
+    @metrics.span('db.plate_fuzzy')
+    def find_transaction_by_plate_fuzzy(self, plate_number):
+        """
+        Resolve a plate via the fuzzy plate index
+        Hanya menerima satu kandidat terbaik yang unik dan masih aktif
+
+        Returns:
+            dict: Active transaction or None (no match, ambiguous or stale)
+        """
+        if not self.plate_index_enabled or not plate_index.ready:
+            return None
+
+        doc_id, candidate = plate_index.resolve(plate_number, self.plate_fuzzy_max_distance)
+        if not doc_id:
+            return None
+
+        try:
+            doc = self.local_db[doc_id]
+        except couchdb.ResourceNotFound:
+            plate_index.update_doc(doc_id, deleted=True)
+            return None
+
+        if doc.get('status') != 0 or doc.get('type') not in TRANSACTION_TYPES:
+            plate_index.update_doc(doc_id, doc)
+            return None
+
+        if candidate['raw_distance']:
+            logger.info("Plate {} resolved to {} ({}) by fuzzy match (distance {})".format(
+                plate_number, candidate['plate'], doc_id, candidate['raw_distance']))
+        return doc
+
+    def get_plate_candidates(self, plate_number, limit=5):
+        """Ranked active transactions whose plate is close to plate_number (for the operator UI)"""
+        if not self.plate_index_enabled or not plate_index.ready:
+            return []
+        return plate_index.search(plate_number, limit=limit)
+    
+    def reload_tariffs(self):
+        """
+        Compile tariff rules from the `tarif_config` document
+        (rows shaped like the legacy `tarif` / `tarif_inap` tables)
+        """
+        try:
+            tarif_doc = self.local_db.get('tarif_config') if self.local_db is not None else None
+            if tarif_doc and tarif_doc.get('tarif'):
+                count = tariff_engine.load(tarif_doc['tarif'], tarif_doc.get('tarif_inap'))
+            else:
+                count = tariff_engine.load(DEFAULT_TARIF_ROWS)
+            return count > 0
+        except Exception as e:
+            logger.error("Error loading tariff rules: {}".format(str(e)))
+            return False
+
+    @metrics.span('db.fee')
     def calculate_parking_fee(self, transaction, exit_time=None):
         """Calculate parking fee based on transaction and exit time"""
         try:
-            if not exit_time:
-                exit_time = datetime.datetime.now()
-            elif isinstance(exit_time, str):
-                exit_time = datetime.datetime.fromisoformat(exit_time.replace('Z', '+00:00'))
-            
             # Get entry time
-            entry_time_str = transaction.get('waktu_masuk') or transaction.get('entry_time')
-            if not entry_time_str:
+            entry_time = transaction.get('waktu_masuk') or transaction.get('entry_time')
+            if not entry_time:
                 return 0
             
-            entry_time = datetime.datetime.fromisoformat(entry_time_str.replace('Z', '+00:00'))
-            
-            # Calculate duration in hours
-            duration = exit_time - entry_time
-            hours = max(1, int(duration.total_seconds() / 3600))  # Minimum 1 hour
-            
-            # Get vehicle type and tariff
-            vehicle_id = transaction.get('id_kendaraan', 1)
-            base_tariff = self._get_vehicle_tariff(vehicle_id)
-            
-            # Calculate total fee
-            total_fee = hours * base_tariff
+            quote = tariff_engine.quote(entry_time, exit_time, transaction.get('id_kendaraan', 1))
             
-            logger.info("Calculated parking fee: {} hours x {} = {}".format(
-                hours, base_tariff, total_fee))
+            logger.info("Calculated parking fee: {} minutes (vehicle {}) = {}".format(
+                quote['duration_minutes'], quote['vehicle'], quote['fee']))
             
-            return total_fee
+            return quote['fee']
             
         except Exception as e:
             logger.error("Error calculating parking fee: {}".format(str(e)))
             return 0
     
-    def _get_vehicle_tariff(self, vehicle_id):
-        """Get tariff for vehicle type"""
+    @metrics.span('db.fee_projection')
+    def get_active_fee_projection(self, exit_time=None):
+        """
+        Projected fees (incl. inap) if every vehicle still inside exited at `exit_time`
+        Semua transaksi aktif dihitung dalam satu pass (tariff_engine.quote_bulk)
+        
+        Returns:
+            dict: active, members, count, skipped (unparsable entry time), total_fee,
+                  total_overnight_fee, overnight_count, by_vehicle
+        """
         try:
-            # Try to get from kendaraan database
-            tariff = 5000  # Default tariff
-            
-            # This would be enhanced to query tariff database
-            # For now, return default based on vehicle type
-            tariff_map = {
-                1: 5000,   # Motor
-                2: 10000,  # Mobil
-                3: 15000,  # Truck
-            }
-            
-            return tariff_map.get(vehicle_id, 5000)
+            entries = []
+            vehicles = []
+            members = 0
+            for row in self.local_db.view('transactions/active_transactions'):
+                doc = row.value
+                if doc.get('type') == 'member_entry':
+                    members += 1  # Members don't pay fees
+                    continue
+                entry_time = doc.get('waktu_masuk') or doc.get('entry_time')
+                if entry_time:
+                    entries.append(entry_time)
+                    vehicles.append(doc.get('id_kendaraan', 1))
+            
+            projection = tariff_engine.quote_bulk(entries, vehicles, exit_time)
+            for key in ('fees', 'overnight_fees', 'duration_minutes', 'nights'):
+                projection.pop(key)
+            projection['members'] = members
+            projection['active'] = members + projection['count'] + projection['skipped']
+            return projection
             
         except Exception as e:
-            logger.error("Error getting vehicle tariff: {}".format(str(e)))
-            return 5000
+            logger.error("Error projecting active fees: {}".format(str(e)))
+            return None
     
+    def get_tariff_stats(self):
+        """Get tariff engine statistics"""
+        return tariff_engine.get_stats()
+    
+    @metrics.span('db.legacy_lookup')
+    def _find_transaction_legacy(self, plate_or_barcode, plate_read=False):
+        """Walk barcode -> member card -> plate strategies (used when identifier index can't answer)"""
+        start_time = time.time()
+        
+        # Try barcode search first (untuk parking transactions)
+        transaction = self.find_transaction_by_barcode(plate_or_barcode)
+        if transaction:
+            processing_time = (time.time() - start_time) * 1000
+            logger.info("Found transaction by barcode ({:.2f}ms)".format(processing_time))
+            return transaction, 'barcode'
+        
+        # Try member card search (optimized lookup)
+        member_start = time.time()
+        transaction = self.find_member_transaction_optimized(plate_or_barcode)
+        if transaction:
+            processing_time = (time.time() - member_start) * 1000
+            logger.info("Found transaction by member card ({:.2f}ms)".format(processing_time))
+            return transaction, 'member_card'
+        
+        # Try plate number search
+        plate_start = time.time()
+        transaction = self.find_transaction_by_plate(plate_or_barcode, fuzzy=plate_read)
+        if transaction:
+            processing_time = (time.time() - plate_start) * 1000
+            logger.info("Found transaction by plate number ({:.2f}ms)".format(processing_time))
+            return transaction, 'plate'
+        
+        return None, None
 
-    def process_vehicle_exit(self, plate_or_barcode, operator_id, gate_id, exit_image_data=None):
-        """Comprehensive exit processing method dengan member optimization - menggunakan unified update"""
+    def process_vehicle_exit(self, plate_or_barcode, operator_id, gate_id, exit_image_data=None, plate_read=False):
+        """
+        Comprehensive exit processing method dengan member optimization - menggunakan unified update
+
+        plate_read=True marks plate_or_barcode as an ALPR read: only then is a
+        near-miss resolved automatically by the fuzzy plate index. For scanned /
+        typed input a miss returns the plate candidates for the operator instead.
+        """
         try:
             logger.info("Processing vehicle exit for: {}".format(plate_or_barcode))
             
@@ -1048,29 +1410,31 @@ class DatabaseService(object):
             processing_time = 0
             
             start_time = time.time()
+            search_methods_tried = ['barcode', 'member_card', 'plate']
+            index_answered = False
             
-            # Try barcode search first (untuk parking transactions)
-            transaction = self.find_transaction_by_barcode(plate_or_barcode)
-            if transaction:
-                search_method = 'barcode'
-                processing_time = (time.time() - start_time) * 1000
-                logger.info("Found transaction by barcode ({:.2f}ms)".format(processing_time))
-            else:
-                # Try member card search (optimized lookup)
-                member_start = time.time()
-                transaction = self.find_member_transaction_optimized(plate_or_barcode)
+            # Identifier index first: one dict lookup + at most one GET
+            if self.identifier_index_enabled and identifier_index.ready:
+                transaction, search_method = self.find_transaction_by_identifier(plate_or_barcode)
                 if transaction:
-                    search_method = 'member_card'
-                    processing_time = (time.time() - member_start) * 1000
-                    logger.info("Found transaction by member card ({:.2f}ms)".format(processing_time))
-                else:
-                    # Try plate number search
-                    plate_start = time.time()
-                    transaction = self.find_transaction_by_plate(plate_or_barcode)
-                    if transaction:
-                        search_method = 'plate'
-                        processing_time = (time.time() - plate_start) * 1000
-                        logger.info("Found transaction by plate number ({:.2f}ms)".format(processing_time))
+                    index_answered = True
+                    processing_time = (time.time() - start_time) * 1000
+                    logger.info("Found transaction by identifier index ({:.2f}ms)".format(processing_time))
+                elif not search_method and self._identifier_index_authoritative():
+                    # Clean miss on a live index - no need to walk the slow strategies
+                    index_answered = True
+                    search_methods_tried = ['identifier_index']
+                    
+                    # ...but an OCR misread of a plate can still be resolved fuzzily
+                    if plate_read:
+                        transaction = self.find_transaction_by_plate_fuzzy(plate_or_barcode)
+                        search_methods_tried.append('plate_fuzzy')
+                        if transaction:
+                            search_method = 'plate_fuzzy'
+            
+            # Legacy multi-strategy walk when the index is unavailable, out of sync or stale
+            if not index_answered:
+                transaction, search_method = self._find_transaction_legacy(plate_or_barcode, plate_read)
             
             total_search_time = (time.time() - start_time) * 1000
             
@@ -1081,10 +1445,15 @@ class DatabaseService(object):
                     'message': 'No active transaction found for: {}'.format(plate_or_barcode),
                     'fee': 0,
                     'error_code': 'TRANSACTION_NOT_FOUND',
-                    'search_methods_tried': ['barcode', 'member_card', 'plate'],
-                    'search_time_ms': total_search_time
+                    'search_methods_tried': search_methods_tried,
+                    'search_time_ms': total_search_time,
+                    # Near-miss plates for the operator to confirm (never auto-completed)
+                    'candidates': self.get_plate_candidates(plate_or_barcode)
                 }
             
+            # Exit already journaled but not yet written counts as exited
+            transaction = self._with_pending_writes(transaction)
+            
             # Use unified update method
             update_result = self.update_transaction_status(transaction, operator_id, gate_id, exit_image_data)
             
@@ -1129,27 +1498,66 @@ class DatabaseService(object):
         except:
             return 0
     
-    def get_today_exit_stats(self):
-        """Get today's exit statistics"""
-        try:
-            result = self.local_db.view('transactions/today_exits')
+    @staticmethod
+    def _date_key(value):
+        """date / datetime / 'YYYY-MM-DD...' -> 'YYYY-MM-DD'"""
+        if hasattr(value, 'strftime'):
+            return value.strftime('%Y-%m-%d')
+        return str(value)[:10]
+    
+    @metrics.span('db.exit_stats')
+    def get_exit_stats(self, date_range=None, group_level=1):
+        """
+        Exit counts and revenue from the transactions/exit_stats reduce view
+        Cost is O(groups), not O(exits)
+        
+        Args:
+            date_range (tuple, optional): (start, end) inclusive, as date/datetime or
+                                          'YYYY-MM-DD' (default: today)
+            group_level (int): 0 = total, 1 = per date, 2 = per date+gate,
+                               3 = per date+gate+vehicle type
             
+        Returns:
+            dict: total_exits, total_revenue and groups [{'key', 'exits', 'revenue'}]
+        """
+        if date_range is None:
+            today = datetime.date.today()
+            date_range = (today, today)
+        start, end = self._date_key(date_range[0]), self._date_key(date_range[1])
+        
+        options = {'startkey': [start], 'endkey': [end, {}], 'reduce': True}
+        if group_level:
+            options['group_level'] = group_level
+        
+        try:
+            groups = []
             total_exits = 0
             total_revenue = 0
             
-            for row in result:
-                doc = row.value
-                total_exits += 1
-                total_revenue += doc.get('bayar_keluar', 0)
+            for row in self.local_db.view('transactions/exit_stats', **options):
+                exits, revenue = row.value
+                total_exits += exits
+                total_revenue += revenue
+                if group_level:
+                    groups.append({'key': row.key, 'exits': exits, 'revenue': revenue})
             
             return {
                 'total_exits': total_exits,
-                'total_revenue': total_revenue
+                'total_revenue': total_revenue,
+                'groups': groups
             }
             
         except Exception as e:
-            logger.error("Error getting today's stats: {}".format(str(e)))
-            return {'total_exits': 0, 'total_revenue': 0}
+            logger.error("Error getting exit stats: {}".format(str(e)))
+            return {'total_exits': 0, 'total_revenue': 0, 'groups': []}
+    
+    def get_today_exit_stats(self):
+        """Get today's exit statistics (evaluated at query time, correct across midnight)"""
+        stats = self.get_exit_stats(group_level=0)
+        return {
+            'total_exits': stats['total_exits'],
+            'total_revenue': stats['total_revenue']
+        }
     
     def get_settings(self):
         """Get gate settings from database"""
@@ -1205,7 +1613,8 @@ class DatabaseService(object):
             
             self._sync_status['sync_active'] = True
             
-            # This would implement actual sync logic
+            # This would implement actual sync logic; the remote couchdb.Server
+            # must come from http_pool.couchdb_server() to share keep-alive connections
             # For now, just update sync status
             self._sync_status['last_sync'] = datetime.datetime.now().isoformat()
             self._sync_status['sync_active'] = False
@@ -1248,24 +1657,37 @@ class DatabaseService(object):
         
         return self._sync_status.copy()
     
+    @metrics.span('db.add_image')
     def add_image_to_transaction(self, transaction_id, image_name, image_data):
-        """Add image attachment to transaction"""
+        """
+        Add image attachment to transaction
+        
+        Args:
+            transaction_id (str): Transaction document ID
+            image_name (str): Attachment filename
+            image_data: ImageBlob, raw bytes or base64 string / data URL
+        """
         try:
-            doc = self.local_db[transaction_id]
+            # Raw bytes go straight into the attachment; only legacy base64 input is decoded
+            image = ImageBlob.coerce(image_data)
+            if not image:
+                logger.warning("No image data for {} on transaction {}".format(image_name, transaction_id))
+                return False
             
-            # Convert base64 image data if needed
-            if isinstance(image_data, str) and image_data.startswith('data:image'):
-                # Remove data URL prefix
-                image_data = image_data.split(',')[1]
+            # Journal upload, drained after any queued save of the same transaction
+            if self._write_behind_available():
+                self.write_behind.enqueue_attachment(transaction_id, image_name, image.data, image.content_type)
+                logger.info("Queued image {} ({} bytes) for transaction {}".format(
+                    image_name, len(image), transaction_id))
+                return True
             
-            # Decode base64
-            image_bytes = base64.b64decode(image_data)
+            doc = self.local_db[transaction_id]
             
             # Add as attachment
-            self.local_db.put_attachment(doc, image_bytes, filename=image_name, 
-                                       content_type='image/jpeg')
+            self.local_db.put_attachment(doc, image.data, filename=image_name, 
+                                       content_type=image.content_type)
             
-            logger.info("Added image {} to transaction {}".format(image_name, transaction_id))
+            logger.info("Added image {} ({} bytes) to transaction {}".format(image_name, len(image), transaction_id))
             return True
             
         except Exception as e:
@@ -1302,6 +1724,7 @@ class DatabaseService(object):
             
             # Save to database
             saved_doc = self.local_db.save(test_transaction)
+            self._index_doc(test_transaction)
             
             # Add entry image as attachment if provided
             if entry_image_data:
@@ -1348,6 +1771,7 @@ class DatabaseService(object):
             
             # Save to database
             self.local_db.save(member_entry)
+            self._index_doc(member_entry)
             
             # Cache the test member
             if self.member_cache_enabled:
@@ -1412,6 +1836,7 @@ class DatabaseService(object):
                 try:
                     doc = self.local_db[doc_id]
                     self.local_db.delete(doc)
+                    self._index_doc(doc, deleted=True)
                     deleted_count += 1
                     logger.info("Deleted test transaction: {}".format(doc_id))
                 except:
@@ -1495,5 +1920,16 @@ class DatabaseService(object):
             logger.error("Error getting transaction info: {}".format(str(e)))
             return None
 
+    def cleanup(self):
+        """Stop _changes follower (last seq is already persisted) and flush write-behind queue"""
+        try:
+            if self.changes_follower:
+                self.changes_follower.stop()
+            if self.write_behind:
+                self.write_behind.stop(flush_timeout=config.getint('database', 'write_behind_flush_timeout', 5))
+            logger.info("Database service cleanup completed")
+        except Exception as e:
+            logger.error("Error during database cleanup: {}".format(str(e)))
+
 # Global database service instance
 db_service = DatabaseService()
@@ -0,0 +1,429 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Continuous Frame Grabber untuk Exit Gate System
+Satu background thread per kamera yang menyimpan N frame terakhir (JPEG) di
+ring buffer, sehingga capture tidak perlu HTTP snapshot / warm-up per event
+Compatible with Python 2.7 and 3.x
+"""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import io
+import time
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+CV2_AVAILABLE = False
+try:
+    import cv2
+    import numpy as np
+    CV2_AVAILABLE = True
+except ImportError:
+    pass
+
+JPEG_SOI = b'\xff\xd8'
+JPEG_EOI = b'\xff\xd9'
+
+def frame_sharpness(data):
+    """
+    Sharpness score of a JPEG frame
+
+    Uses variance of the Laplacian on a 1/4 size grayscale decode when OpenCV is
+    available, otherwise the JPEG size (sharper frames compress worse)
+    """
+    if CV2_AVAILABLE:
+        try:
+            gray = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_4)
+            if gray is not None:
+                return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+        except Exception as e:
+            logger.debug("Sharpness decode failed: {}".format(str(e)))
+    return float(len(data))
+
+class Frame(object):
+    """Single JPEG frame in the ring buffer"""
+
+    def __init__(self, data, timestamp=None, sequence=0):
+        self.data = data  # JPEG bytes
+        self.timestamp = timestamp or time.time()
+        self.sequence = sequence
+        self._sharpness = None
+
+    @property
+    def sharpness(self):
+        """Lazily computed sharpness score"""
+        if self._sharpness is None:
+            self._sharpness = frame_sharpness(self.data)
+        return self._sharpness
+
+    @property
+    def age(self):
+        return time.time() - self.timestamp
+
+# ============== FRAME SOURCES ==============
+# Every source implements open() / read() -> JPEG bytes or None at end of stream / close()
+
+class MJPEGSource(object):
+    """HTTP multipart MJPEG stream (one long-lived request)"""
+
+    def __init__(self, url, auth=None, timeout=10, chunk_size=4096, max_frame_bytes=2 * 1024 * 1024):
+        self.url = url
+        self.auth = auth
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.max_frame_bytes = max_frame_bytes
+        self.response = None
+        self.chunks = None
+        self.buffer = bytearray()
+
+    def open(self):
+        from http_pool import http_pool  # Lazy: keeps FakeSource usable without couchdb/requests
+        self.response = http_pool.get(self.url, auth=self.auth, timeout=self.timeout, stream=True)
+        if self.response.status_code != 200:
+            raise IOError("HTTP {} from MJPEG stream".format(self.response.status_code))
+        self.chunks = self.response.iter_content(chunk_size=self.chunk_size)
+        self.buffer = bytearray()
+
+    def read(self):
+        while True:
+            start = self.buffer.find(JPEG_SOI)
+            if start >= 0:
+                end = self.buffer.find(JPEG_EOI, start + 2)
+                if end >= 0:
+                    data = bytes(self.buffer[start:end + 2])
+                    del self.buffer[:end + 2]
+                    return data
+            elif len(self.buffer) > 1:
+                # Keep the last byte, it may be the first half of a marker
+                del self.buffer[:-1]
+
+            if len(self.buffer) > self.max_frame_bytes * 2:
+                logger.warning("MJPEG buffer overflow without frame boundary, resyncing")
+                self.buffer = bytearray()
+
+            chunk = next(self.chunks, None)
+            if not chunk:
+                return None
+            self.buffer.extend(chunk)
+
+    def close(self):
+        if self.response is not None:
+            self.response.close()
+        self.response = None
+        self.chunks = None
+
+class SnapshotPollSource(object):
+    """Poll an HTTP snapshot URL at a fixed interval over a keep-alive session"""
+
+    def __init__(self, url, auth=None, timeout=5, interval=0.5):
+        self.url = url
+        self.auth = auth
+        self.timeout = timeout
+        self.interval = interval
+        self.next_poll = 0
+
+    def open(self):
+        self.next_poll = 0
+
+    def read(self):
+        delay = self.next_poll - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        self.next_poll = time.time() + self.interval
+
+        from http_pool import http_pool
+        response = http_pool.get(self.url, auth=self.auth, timeout=self.timeout)
+        if response.status_code != 200:
+            raise IOError("HTTP {} from snapshot URL".format(response.status_code))
+        return response.content
+
+    def close(self):
+        pass
+
+class OpenCVSource(object):
+    """RTSP URL or local video device via cv2.VideoCapture"""
+
+    def __init__(self, source, jpeg_quality=85):
+        self.source = source
+        self.jpeg_quality = jpeg_quality
+        self.capture = None
+
+    def open(self):
+        if not CV2_AVAILABLE:
+            raise IOError("OpenCV not available")
+        self.capture = cv2.VideoCapture(self.source)
+        if not self.capture.isOpened():
+            raise IOError("Could not open video source {}".format(self.source))
+
+    def read(self):
+        ret, frame = self.capture.read()
+        if not ret:
+            return None
+        ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        return buffer.tobytes() if ok else None
+
+    def close(self):
+        if self.capture is not None:
+            self.capture.release()
+        self.capture = None
+
+class PiCameraSource(object):
+    """Raspberry Pi camera kept running - warm-up happens once, not per capture"""
+
+    def __init__(self, camera_id=0, use_picamera2=True, resolution=(1024, 768), interval=0.2):
+        self.camera_id = camera_id
+        self.use_picamera2 = use_picamera2
+        self.resolution = resolution
+        self.interval = interval
+        self.camera = None
+        self.frames = None
+
+    def open(self):
+        if self.use_picamera2:
+            from picamera2 import Picamera2
+            self.camera = Picamera2(self.camera_id)
+            self.camera.configure(self.camera.create_still_configuration(main={'size': self.resolution}))
+            self.camera.start()
+        else:
+            from picamera import PiCamera
+            self.camera = PiCamera(camera_num=self.camera_id, resolution=self.resolution)
+            self.frames = self.camera.capture_continuous(io.BytesIO(), format='jpeg', use_video_port=True)
+        time.sleep(2)  # Warm up once for the lifetime of the grabber
+
+    def read(self):
+        time.sleep(self.interval)
+        if self.use_picamera2:
+            stream = io.BytesIO()
+            self.camera.capture_file(stream, format='jpeg')
+            return stream.getvalue()
+
+        stream = next(self.frames)
+        data = stream.getvalue()
+        stream.seek(0)
+        stream.truncate()
+        return data
+
+    def close(self):
+        if self.camera is not None:
+            try:
+                if self.use_picamera2:
+                    self.camera.stop()
+                self.camera.close()
+            except Exception as e:
+                logger.warning("Error closing Pi camera: {}".format(str(e)))
+        self.camera = None
+        self.frames = None
+
+class FakeSource(object):
+    """Synthetic frame source for testing without cameras"""
+
+    def __init__(self, frames=None, fps=10, loop=True):
+        """
+        Args:
+            frames (list, optional): JPEG byte strings to replay; synthetic frames if None
+            fps (float): Frames per second (0 = as fast as possible)
+            loop (bool): Replay frames forever
+        """
+        self.frames = frames
+        self.fps = fps
+        self.loop = loop
+        self.index = 0
+
+    def open(self):
+        self.index = 0
+
+    def read(self):
+        if self.fps:
+            time.sleep(1.0 / self.fps)
+
+        if self.frames is None:
+            self.index += 1
+            return JPEG_SOI + 'FAKE{:08d}'.format(self.index).encode('ascii') + JPEG_EOI
+
+        if self.index >= len(self.frames):
+            if not self.loop:
+                return None
+            self.index = 0
+        data = self.frames[self.index]
+        self.index += 1
+        return data
+
+    def close(self):
+        pass
+
+# ============== GRABBER ==============
+
+class FrameGrabber(object):
+    """Background reader yang menyimpan N frame terakhir dari satu kamera"""
+
+    def __init__(self, name, source, buffer_size=8, max_frame_bytes=2 * 1024 * 1024, retry_delay=5):
+        """
+        Initialize frame grabber
+
+        Args:
+            name (str): Camera name
+            source: Frame source (open/read/close)
+            buffer_size (int): Frames kept in the ring buffer (default: 8)
+            max_frame_bytes (int): Larger frames are dropped, bounding memory to
+                                   buffer_size * max_frame_bytes (default: 2 MB)
+            retry_delay (int): Max seconds between reconnect attempts (default: 5)
+        """
+        self.name = name
+        self.source = source
+        self.buffer_size = buffer_size
+        self.max_frame_bytes = max_frame_bytes
+        self.retry_delay = retry_delay
+
+        self.frames = deque(maxlen=buffer_size)
+        self.lock = threading.Lock()
+        self.sequence = 0
+        self.connected = False
+
+        # Grab thread
+        self.grab_thread = None
+        self.stop_thread = False
+
+        self.stats = {
+            'frames_received': 0,
+            'frames_dropped': 0,
+            'reconnects': 0,
+            'errors': 0,
+            'last_error': None
+        }
+
+    def start(self):
+        """Start background grab thread"""
+        if self.grab_thread and self.grab_thread.is_alive():
+            return
+
+        self.stop_thread = False
+        self.grab_thread = threading.Thread(target=self._grab_loop)
+        self.grab_thread.daemon = True
+        self.grab_thread.start()
+
+        logger.info("Frame grabber started for camera '{}' (buffer: {} frames)".format(
+            self.name, self.buffer_size))
+
+    def stop(self):
+        """Stop background grab thread"""
+        self.stop_thread = True
+        if self.grab_thread and self.grab_thread.is_alive():
+            self.grab_thread.join(timeout=2)
+
+        logger.info("Frame grabber stopped for camera '{}'".format(self.name))
+
+    def _grab_loop(self):
+        """Read frames until stopped, reconnecting with backoff"""
+        delay = 1
+
+        while not self.stop_thread:
+            try:
+                self.source.open()
+                self.connected = True
+                delay = 1
+
+                while not self.stop_thread:
+                    data = self.source.read()
+                    if data is None:
+                        break
+                    self._push(data)
+
+            except Exception as e:
+                self.stats['errors'] += 1
+                self.stats['last_error'] = str(e)
+                logger.warning("Frame grabber '{}' error (retry in {}s): {}".format(self.name, delay, str(e)))
+
+            finally:
+                self.connected = False
+                try:
+                    self.source.close()
+                except Exception:
+                    pass
+
+            if not self.stop_thread:
+                self.stats['reconnects'] += 1
+                time.sleep(delay)
+                delay = min(delay * 2, self.retry_delay)
+
+    def _push(self, data):
+        """Append frame to ring buffer (oldest frame falls out)"""
+        if len(data) > self.max_frame_bytes:
+            self.stats['frames_dropped'] += 1
+            return
+
+        with self.lock:
+            self.sequence += 1
+            self.frames.append(Frame(data, sequence=self.sequence))
+            self.stats['frames_received'] += 1
+
+    def latest(self, max_age=None):
+        """
+        Get freshest frame
+
+        Args:
+            max_age (float, optional): Reject frames older than this many seconds
+
+        Returns:
+            Frame or None
+        """
+        with self.lock:
+            frame = self.frames[-1] if self.frames else None
+
+        if frame is None or (max_age is not None and frame.age > max_age):
+            return None
+        return frame
+
+    def frames_between(self, start_time, end_time):
+        """Frames with timestamp in [start_time, end_time]"""
+        with self.lock:
+            return [frame for frame in self.frames if start_time <= frame.timestamp <= end_time]
+
+    def sharpest(self, around=None, window=0.5):
+        """
+        Pick the sharpest frame around a trigger time
+
+        Args:
+            around (float, optional): Trigger timestamp (default: now)
+            window (float): Seconds before/after the trigger to consider
+
+        Returns:
+            Frame or None
+        """
+        if around is None:
+            around = time.time()
+
+        candidates = self.frames_between(around - window, around + window)
+        if not candidates:
+            return None
+        return max(candidates, key=lambda frame: frame.sharpness)
+
+    def get_stats(self):
+        """
+        Get grabber statistics
+
+        Returns:
+            dict: Frame counters, buffer usage and measured fps
+        """
+        with self.lock:
+            frames = list(self.frames)
+
+        fps = 0
+        if len(frames) > 1:
+            span = frames[-1].timestamp - frames[0].timestamp
+            fps = (len(frames) - 1) / span if span > 0 else 0
+
+        stats = dict(self.stats)
+        stats.update({
+            'connected': self.connected,
+            'buffer_frames': len(frames),
+            'buffer_size': self.buffer_size,
+            'buffer_bytes': sum(len(frame.data) for frame in frames),
+            'max_buffer_bytes': self.buffer_size * self.max_frame_bytes,
+            'latest_age': round(frames[-1].age, 3) if frames else None,
+            'fps': round(fps, 2)
+        })
+        return stats
@@ -15,6 +15,12 @@ import os
 import json
 from datetime import datetime
 
+# Metrics import with fallback (gate_service is also imported as app.gate_service)
+try:
+    from metrics import metrics
+except ImportError:
+    from app.metrics import metrics
+
 # Remove problematic imports for Python 2.7 compatibility
 try:
     from enum import Enum
@@ -433,6 +439,7 @@ class GateService(object):
             logger.error("Serial command failed: {}".format(str(e)))
             return False
     
+    @metrics.span('gate.open')
     def open_gate(self, auto_close_timeout=None):
         """Open the gate with enhanced error handling and logging"""
         with self.lock:
@@ -558,7 +565,8 @@ class GateService(object):
             logger.info(f"🔆 GPIO gate OPEN signal sent to pin {pin} ({state_name} - Gate Opening)")
             # Jika pulse mode, hanya ON sebentar lalu OFF
             if self.gpio_config.get('pulse_duration', 0) > 0:
-                time.sleep(self.gpio_config['pulse_duration'])
+                with metrics.span('gate.gpio_pulse'):
+                    time.sleep(self.gpio_config['pulse_duration'])
                 # OFF relay setelah pulse
                 inactive_state = GPIO.LOW if self.gpio_config['active_high'] else GPIO.HIGH
                 GPIO.output(pin, inactive_state)
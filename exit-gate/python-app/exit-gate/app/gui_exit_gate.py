@@ -541,6 +541,9 @@ class ExitGateGUI(object):
                             self.last_driver_image_data = None
                         else:
                             self.log("❌ No transaction found in database: {}".format(result.get('message', 'Unknown error')))
+                            if result.get('candidates'):
+                                self.log("Possible plates (confirm via search): {}".format(
+                                    ', '.join(candidate['plate'] for candidate in result['candidates'])))
                             transaction_found = False
                     except Exception as db_error:
                         self.log("Database error: {}".format(str(db_error)))
@@ -1231,8 +1234,8 @@ class ExitGateGUI(object):
                 result = self.camera_service.capture_image(camera_name)
                 if result.success:
                     self.log(f"✅ {camera_name.upper()} camera capture successful")
-                    if result.image_data:
-                        self.root.after(0, self.update_camera_preview, result.image_data)
+                    if result.image:
+                        self.root.after(0, self.update_camera_preview, result.image)
                     if self.audio_service:
                         self.audio_service.play_scan_sound()
                 else:
@@ -1257,8 +1260,8 @@ class ExitGateGUI(object):
                 result = self.camera_service.capture_exit_images()
                 if result.success:
                     self.log("✅ Exit images capture successful")
-                    if result.image_data:
-                        self.root.after(0, self.update_camera_preview, result.image_data)
+                    if result.image:
+                        self.root.after(0, self.update_camera_preview, result.image)
                     if self.audio_service:
                         self.audio_service.play_scan_sound()
                 else:
@@ -1274,13 +1277,14 @@ class ExitGateGUI(object):
     
     def capture_exit_images_async(self, barcode):
         """Capture exit images asynchronously with barcode context (non-blocking)"""
+        scan_time = time.time()
         def worker():
             try:
                 if not self.camera_service:
                     self.log("Camera service not available for async capture")
                     return
                 self.log(f"Auto-capturing exit images for barcode: {barcode}")
-                result = self.camera_service.capture_exit_images()
+                result = self.camera_service.capture_exit_images(around=scan_time)
                 if result.success:
                     self.log(f"✅ Auto-capture successful for barcode: {barcode}")
                     if hasattr(result, 'plate_image_data') and result.plate_image_data:
@@ -1289,10 +1293,10 @@ class ExitGateGUI(object):
                     if hasattr(result, 'driver_image_data') and result.driver_image_data:
                         self.last_driver_image_data = result.driver_image_data
                         self.log("Stored driver image data")
-                    if result.image_data:
-                        self.last_exit_image_data = result.image_data
+                    if result.image:
+                        self.last_exit_image_data = result.image
                         self.log("Stored combined exit image data")
-                        self.root.after(0, self.update_camera_preview, result.image_data)
+                        self.root.after(0, self.update_camera_preview, result.image)
                     # Save images as attachment to transaction (main thread)
                     self.root.after(0, self.save_exit_images_to_transaction, barcode, result)
                 else:
@@ -1346,11 +1350,11 @@ class ExitGateGUI(object):
                     self.log("❌ Failed to save exit driver image")
             
             # Save combined image data (fallback)
-            if images_saved == 0 and capture_result.image_data:
+            if images_saved == 0 and capture_result.image:
                 success = self.db_service.add_image_to_transaction(
                     transaction_id, 
                     'exit.jpg', 
-                    capture_result.image_data
+                    capture_result.image
                 )
                 if success:
                     self.log("✅ Saved exit image as attachment (combined)")
@@ -1406,21 +1410,19 @@ class ExitGateGUI(object):
                 self.audio_service.play_error_sound()
     
     def update_camera_preview(self, image_data):
-        """Update camera preview with base64 image data"""
+        """Update camera preview with an ImageBlob (raw bytes or legacy base64 also accepted)"""
         try:
             if not image_data or not self.camera_preview_label:
                 return
             
             # Try to use PIL for image preview
             try:
-                # Decode base64 image
-                import base64
-                import io
                 from PIL import Image, ImageTk
+                from image_blob import ImageBlob
                 
-                # Decode and resize image for preview
-                image_bytes = base64.b64decode(image_data)
-                image = Image.open(io.BytesIO(image_bytes))
+                # Decode straight from the captured bytes and resize for preview
+                image = Image.open(ImageBlob.coerce(image_data).stream())
+                image.draft('RGB', (320, 240))  # JPEG: let the decoder downscale
                 
                 # Resize image to fit preview area (maintain aspect ratio)
                 preview_width = 320  # Smaller for small screens
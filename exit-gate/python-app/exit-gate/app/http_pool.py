@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Shared HTTP Connection Pool untuk Exit Gate System
+Keep-alive sessions per host untuk camera snapshots dan satu CouchDB session
+yang dipakai bersama oleh semua couchdb.Server (local + remote sync)
+Compatible with Python 2.7 and 3.x
+"""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import logging
+import threading
+
+import couchdb
+import couchdb.http
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from urllib3.util.retry import Retry
+except ImportError:
+    from requests.packages.urllib3.util.retry import Retry
+
+try:
+    from urllib.parse import urlsplit
+except ImportError:
+    from urlparse import urlsplit
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+class CountingConnectionPool(couchdb.http.ConnectionPool):
+    """couchdb ConnectionPool that counts reused vs newly opened connections"""
+
+    def __init__(self, *args, **kwargs):
+        couchdb.http.ConnectionPool.__init__(self, *args, **kwargs)
+        self.new_connections = 0
+        self.reused_connections = 0
+
+    def get(self, url):
+        scheme, host = urlsplit(url)[:2]
+        idle = len(getattr(self, 'conns', {}).get((scheme, host), ()))
+
+        conn = couchdb.http.ConnectionPool.get(self, url)
+
+        if idle:
+            self.reused_connections += 1
+        else:
+            self.new_connections += 1
+        return conn
+
+class HTTPPool(object):
+    """Per-host keep-alive requests sessions plus a shared couchdb session"""
+
+    def __init__(self):
+        self.pool_connections = config.getint('http', 'pool_connections', 4)
+        self.pool_maxsize = config.getint('http', 'pool_maxsize', 4)
+        self.max_retries = config.getint('http', 'max_retries', 2)
+        self.backoff_factor = config.getfloat('http', 'backoff_factor', 0.2)
+        self.couchdb_timeout = config.getint('http', 'couchdb_timeout', 30)
+
+        self.sessions = {}  # (scheme, host:port) -> requests.Session
+        self.couchdb_http_session = None
+        self.lock = threading.Lock()
+
+        logger.info("HTTP pool initialized (pool_maxsize: {}, max_retries: {}, backoff: {}s)".format(
+            self.pool_maxsize, self.max_retries, self.backoff_factor))
+
+    def _host_key(self, url):
+        """Pool key without embedded credentials"""
+        parts = urlsplit(url)
+        host = parts.hostname or ''
+        if parts.port:
+            host = "{}:{}".format(host, parts.port)
+        return parts.scheme or 'http', host
+
+    def _create_session(self):
+        """Create keep-alive session with retry/backoff on connect errors and 502/503/504"""
+        retry = Retry(
+            total=self.max_retries,
+            connect=self.max_retries,
+            read=0,  # Never replay a request whose response was already in flight
+            status=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=(502, 503, 504),
+            raise_on_status=False  # Return the last 5xx response so callers see the status code
+        )
+        adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                              pool_maxsize=self.pool_maxsize,
+                              max_retries=retry)
+
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def session_for(self, url):
+        """
+        Get keep-alive session for the URL's host
+
+        Args:
+            url (str): Request URL
+
+        Returns:
+            requests.Session: Session shared by every request to that host
+        """
+        key = self._host_key(url)
+        with self.lock:
+            session = self.sessions.get(key)
+            if session is None:
+                session = self._create_session()
+                self.sessions[key] = session
+                logger.debug("Created HTTP session for {}://{}".format(key[0], key[1]))
+            return session
+
+    def get(self, url, **kwargs):
+        """GET through the host's pooled session"""
+        return self.session_for(url).get(url, **kwargs)
+
+    def couchdb_session(self):
+        """
+        Shared couchdb.http.Session (keep-alive pool + retry delays)
+
+        Returns:
+            couchdb.http.Session: Pass as session= to every couchdb.Server
+        """
+        with self.lock:
+            if self.couchdb_http_session is None:
+                retry_delays = [0] + [self.backoff_factor * (2 ** i) for i in range(self.max_retries)]
+                session = couchdb.http.Session(timeout=self.couchdb_timeout,
+                                               retry_delays=retry_delays)
+                session.connection_pool = CountingConnectionPool(self.couchdb_timeout)
+                self.couchdb_http_session = session
+            return self.couchdb_http_session
+
+    def couchdb_server(self, url, username=None, password=None):
+        """Create couchdb.Server sharing the pooled session"""
+        server = couchdb.Server(url, session=self.couchdb_session())
+        if username and password:
+            server.resource.credentials = (username, password)
+        return server
+
+    def get_stats(self):
+        """
+        Get pool statistics
+
+        Returns:
+            dict: Per-host request, new and reused connection counters
+        """
+        hosts = {}
+        with self.lock:
+            sessions = list(self.sessions.items())
+            couchdb_session = self.couchdb_http_session
+
+        for (scheme, host), session in sessions:
+            requests_count = 0
+            new_connections = 0
+            for adapter in set(session.adapters.values()):
+                pools = adapter.poolmanager.pools
+                for pool_key in list(pools.keys()):
+                    pool = pools.get(pool_key)
+                    if pool is None:
+                        continue
+                    requests_count += getattr(pool, 'num_requests', 0)
+                    new_connections += getattr(pool, 'num_connections', 0)
+
+            hosts["{}://{}".format(scheme, host)] = {
+                'requests': requests_count,
+                'new_connections': new_connections,
+                'reused_connections': max(0, requests_count - new_connections)
+            }
+
+        couchdb_stats = None
+        if couchdb_session is not None:
+            pool = couchdb_session.connection_pool
+            couchdb_stats = {
+                'new_connections': getattr(pool, 'new_connections', 0),
+                'reused_connections': getattr(pool, 'reused_connections', 0)
+            }
+
+        return {
+            'pool_connections': self.pool_connections,
+            'pool_maxsize': self.pool_maxsize,
+            'max_retries': self.max_retries,
+            'backoff_factor': self.backoff_factor,
+            'hosts': hosts,
+            'couchdb': couchdb_stats
+        }
+
+    def cleanup(self):
+        """Close all pooled sessions"""
+        with self.lock:
+            for session in self.sessions.values():
+                try:
+                    session.close()
+                except Exception as e:
+                    logger.warning("Error closing HTTP session: {}".format(str(e)))
+            self.sessions.clear()
+        logger.info("HTTP pool cleanup completed")
+
+
+# Global HTTP pool instance
+http_pool = HTTPPool()
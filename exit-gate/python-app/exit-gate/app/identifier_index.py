@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Identifier Index untuk Exit Gate System
+In-process index barcode / transaction_{id} / card_number / plat nomor -> doc id
+sehingga setiap scan cukup satu dict lookup plus maksimal satu document GET
+Compatible with Python 2.7 and 3.x
+"""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+TRANSACTION_TYPES = ('parking_transaction', 'member_entry')
+
+# Prefixes that the legacy ID strategies try (member_entry_ must precede member_)
+ID_PREFIXES = ('transaction_', 'parking_', 'member_entry_', 'member_')
+
+# Barcode fields matched by the legacy full-scan strategy
+BARCODE_FIELDS = ('no_barcode', 'barcode', 'ticket_number')
+
+NAMESPACE_BARCODE = 'barcode'
+NAMESPACE_CARD = 'card'
+NAMESPACE_PLATE = 'plate'
+
+# Lookup order mirrors process_vehicle_exit: barcode -> member card -> plate
+LOOKUP_ORDER = (
+    (NAMESPACE_BARCODE, 'barcode'),
+    (NAMESPACE_CARD, 'member_card'),
+    (NAMESPACE_PLATE, 'plate')
+)
+
+def normalize_identifier(value):
+    """Normalize scanned code / field value untuk index key"""
+    if value is None:
+        return ''
+    return str(value).strip().lower()
+
+class IdentifierIndex(object):
+    """Thread-safe identifier -> doc id index untuk parking_transaction dan member_entry"""
+
+    def __init__(self):
+        # (namespace, value) -> doc_id, or list of doc_ids on collision
+        self.keys = {}
+        # doc_id -> tuple of keys owned by that doc
+        self.doc_keys = {}
+        # doc ids with status 0
+        self.active_docs = set()
+
+        self.ready = False
+        self.lock = threading.RLock()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'stale': 0,
+            'updates': 0,
+            'total_requests': 0,
+            'build_time_ms': None,
+            'built_at': None
+        }
+
+    def _doc_index_keys(self, doc_id, doc):
+        """Compute index keys for a document"""
+        keys = set()
+
+        lowered_id = normalize_identifier(doc_id)
+        keys.add((NAMESPACE_BARCODE, lowered_id))
+        for prefix in ID_PREFIXES:
+            if lowered_id.startswith(prefix):
+                keys.add((NAMESPACE_BARCODE, lowered_id[len(prefix):]))
+                break
+
+        for field in BARCODE_FIELDS:
+            value = normalize_identifier(doc.get(field))
+            if value:
+                keys.add((NAMESPACE_BARCODE, value))
+
+        # Card and plate lookups only ever accept active transactions
+        if doc.get('status') == 0:
+            card_number = normalize_identifier(doc.get('card_number'))
+            if doc.get('type') == 'member_entry' and card_number:
+                keys.add((NAMESPACE_CARD, card_number))
+
+            for field in ('no_pol', 'plat_nomor'):
+                plate = normalize_identifier(doc.get(field))
+                if plate:
+                    keys.add((NAMESPACE_PLATE, plate))
+
+        keys.discard((NAMESPACE_BARCODE, ''))
+        return tuple(keys)
+
+    def _add_key(self, key, doc_id):
+        """Point key at doc_id, keeping every colliding doc id"""
+        current = self.keys.get(key)
+        if current is None or current == doc_id:
+            self.keys[key] = doc_id
+        elif isinstance(current, list):
+            if doc_id not in current:
+                current.append(doc_id)
+        else:
+            self.keys[key] = [current, doc_id]
+
+    def _remove_key(self, key, doc_id):
+        """Remove doc_id from key"""
+        current = self.keys.get(key)
+        if current is None:
+            return
+        if isinstance(current, list):
+            if doc_id in current:
+                current.remove(doc_id)
+            if len(current) == 1:
+                self.keys[key] = current[0]
+        elif current == doc_id:
+            del self.keys[key]
+
+    def _pick(self, key):
+        """Pick best doc id for key - active transactions win over completed ones"""
+        current = self.keys.get(key)
+        if current is None or not isinstance(current, list):
+            return current
+
+        for doc_id in reversed(current):
+            if doc_id in self.active_docs:
+                return doc_id
+        return current[-1]
+
+    def update_doc(self, doc_id, doc=None, deleted=False):
+        """
+        Insert, update or remove a document from the index
+
+        Args:
+            doc_id (str): Document ID
+            doc (dict, optional): Document body (None or deleted removes it)
+            deleted (bool): True if the document was deleted
+        """
+        if not doc_id or doc_id.startswith('_design'):
+            return
+
+        with self.lock:
+            for key in self.doc_keys.pop(doc_id, ()):
+                self._remove_key(key, doc_id)
+            self.active_docs.discard(doc_id)
+
+            if deleted or not doc or doc.get('_deleted') or doc.get('type') not in TRANSACTION_TYPES:
+                return
+
+            keys = self._doc_index_keys(doc_id, doc)
+            for key in keys:
+                self._add_key(key, doc_id)
+            self.doc_keys[doc_id] = keys
+            if doc.get('status') == 0:
+                self.active_docs.add(doc_id)
+
+            self.stats['updates'] += 1
+
+    def on_change(self, doc_id, doc, deleted):
+        """ChangesFollower listener"""
+        self.update_doc(doc_id, doc, deleted)
+
+    def build_from_docs(self, docs):
+        """
+        Build index from an iterable of documents (mock database / tests)
+
+        Returns:
+            int: Number of documents indexed
+        """
+        start_time = time.time()
+        with self.lock:
+            self.clear()
+            for doc in docs:
+                self.update_doc(doc.get('_id'), doc)
+            self._mark_built(start_time)
+            return len(self.doc_keys)
+
+    def build_from_changes(self, follower):
+        """
+        Build index by replaying the _changes feed through the follower
+
+        Args:
+            follower (ChangesFollower): Follower positioned at the start of the feed
+
+        Returns:
+            int: Number of documents indexed
+        """
+        start_time = time.time()
+        with self.lock:
+            self.clear()
+        follower.add_listener(self.on_change)
+        follower.catch_up()
+        with self.lock:
+            self._mark_built(start_time)
+            return len(self.doc_keys)
+
+    def _mark_built(self, start_time):
+        """Record build timing and mark index ready"""
+        self.ready = True
+        self.stats['build_time_ms'] = round((time.time() - start_time) * 1000, 2)
+        self.stats['built_at'] = time.time()
+        logger.info("Identifier index built: {} docs, {} keys ({:.2f}ms)".format(
+            len(self.doc_keys), len(self.keys), self.stats['build_time_ms']))
+
+    def lookup(self, code):
+        """
+        Resolve scanned code to document ID
+
+        Args:
+            code (str): Barcode, transaction ID, card number or plate number
+
+        Returns:
+            tuple: (doc_id, search_method) or (None, None)
+        """
+        value = normalize_identifier(code)
+
+        with self.lock:
+            self.stats['total_requests'] += 1
+
+            if value:
+                for namespace, method in LOOKUP_ORDER:
+                    doc_id = self._pick((namespace, value))
+                    if doc_id:
+                        self.stats['hits'] += 1
+                        return doc_id, method
+
+            self.stats['misses'] += 1
+            return None, None
+
+    def mark_stale(self, doc_id, doc=None):
+        """Record a lookup whose fetched document no longer matched, and re-index it"""
+        with self.lock:
+            self.stats['stale'] += 1
+        self.update_doc(doc_id, doc, deleted=doc is None)
+
+    def clear(self):
+        """Drop all index entries"""
+        with self.lock:
+            self.keys.clear()
+            self.doc_keys.clear()
+            self.active_docs.clear()
+            self.ready = False
+
+    def get_stats(self):
+        """
+        Get index statistics
+
+        Returns:
+            dict: Index size, build time and hit/miss counters
+        """
+        with self.lock:
+            total_requests = self.stats['total_requests']
+            hit_rate = (self.stats['hits'] / float(total_requests) * 100) if total_requests > 0 else 0
+
+            return {
+                'ready': self.ready,
+                'docs': len(self.doc_keys),
+                'keys': len(self.keys),
+                'active_docs': len(self.active_docs),
+                'hits': self.stats['hits'],
+                'misses': self.stats['misses'],
+                'stale': self.stats['stale'],
+                'updates': self.stats['updates'],
+                'total_requests': total_requests,
+                'hit_rate': round(hit_rate, 2),
+                'build_time_ms': self.stats['build_time_ms'],
+                'built_at': self.stats['built_at']
+            }
+
+
+# Global identifier index instance
+identifier_index = IdentifierIndex()
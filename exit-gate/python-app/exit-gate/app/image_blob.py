@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Binary Image Object untuk Exit Gate System
+Gambar dibawa sebagai bytes dari kamera sampai CouchDB attachment / GUI;
+base64 hanya dibuat di boundary JSON/HTTP yang membutuhkannya
+Compatible with Python 2.7 and 3.x
+"""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import io
+import time
+import base64
+
+try:
+    text_type = unicode  # Python 2.7
+except NameError:
+    text_type = str
+
+JPEG_MAGIC = b'\xff\xd8'
+PNG_MAGIC = b'\x89PNG'
+
+class ImageBlob(object):
+    """Encoded image bytes (JPEG/PNG) plus capture metadata"""
+
+    def __init__(self, data, content_type=None, camera=None, timestamp=None):
+        """
+        Args:
+            data (bytes): Encoded image, kept as-is (no copy)
+            content_type (str, optional): MIME type, sniffed from the magic bytes if None
+            camera (str, optional): Source camera name
+            timestamp (float, optional): Capture time (default: now)
+        """
+        self.data = data
+        self.content_type = content_type or self._sniff(data)
+        self.camera = camera
+        self.timestamp = timestamp or time.time()
+
+    @staticmethod
+    def _sniff(data):
+        if data[:4] == PNG_MAGIC:
+            return 'image/png'
+        return 'image/jpeg'
+
+    @classmethod
+    def from_base64(cls, value, **kwargs):
+        """Decode a base64 string or data URL (legacy callers)"""
+        if value.startswith('data:'):
+            header, value = value.split(',', 1)
+            kwargs.setdefault('content_type', header[5:].split(';')[0] or None)
+        return cls(base64.b64decode(value), **kwargs)
+
+    @classmethod
+    def coerce(cls, value, **kwargs):
+        """
+        Accept ImageBlob, raw bytes or a base64 string / data URL
+
+        Returns:
+            ImageBlob or None for empty input
+        """
+        if not value:
+            return None
+        if isinstance(value, ImageBlob):
+            return value
+        if isinstance(value, text_type):
+            return cls.from_base64(value, **kwargs)
+        if isinstance(value, (bytearray, memoryview)):
+            return cls(bytes(value), **kwargs)
+        return cls(value, **kwargs)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __bool__(self):
+        return bool(self.data)
+
+    __nonzero__ = __bool__  # Python 2.7
+
+    def view(self):
+        """Zero-copy memoryview of the image bytes"""
+        return memoryview(self.data)
+
+    def stream(self):
+        """File-like object over the image bytes (for PIL.Image.open)"""
+        return io.BytesIO(self.data)
+
+    def to_base64(self):
+        """Base64 text - only for JSON/HTTP boundaries"""
+        return base64.b64encode(self.data).decode('ascii')
+
+    def to_data_url(self):
+        """data: URL for browser/websocket consumers"""
+        return "data:{};base64,{}".format(self.content_type, self.to_base64())
@@ -13,17 +13,21 @@ import json
 import time
 import threading
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait
 
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, Response, render_template, request, jsonify, send_from_directory
 from werkzeug.serving import run_simple
 
 # Import our services
 from config import config, EXIT_GATE_VERSION
 from database_service import db_service
+from member_cache import member_cache
 from gate_service import gate_service
 from usb_barcode_scanner import usb_barcode_scanner
 from camera_service import camera_service
 from audio_service import audio_service
+from http_pool import http_pool
+from metrics import metrics
 
 # Configure logging
 logging.basicConfig(
@@ -49,6 +53,9 @@ app_state = {
     }
 }
 
+# Exit photos are captured off the request thread, started at scan time
+exit_capture_pool = ThreadPoolExecutor(max_workers=2)
+
 # Initialize services
 def initialize_services():
     """Initialize all services"""
@@ -105,21 +112,40 @@ def process_barcode(barcode):
     
     app_state['processing'] = True
     
+    scan_time = time.time()
+    
+    # Exit photo is taken at the scan, in parallel with the transaction lookup
+    capture_future = start_exit_capture(scan_time)
+    
     try:
         logger.info("=== BARCODE PROCESSING STARTED ===")
         logger.info("Barcode: {}".format(barcode))
         
         # Play scan sound
-        audio_service.play_scan_sound()
+        with metrics.span('exit.audio_scan'):
+            audio_service.play_scan_sound()
         
         # Process vehicle exit
-        result = db_service.process_vehicle_exit(
-            barcode,
-            config.get('system', 'operator_id', 'SYSTEM'),
-            config.get('system', 'gate_id', 'EXIT_GATE_01')
-        )
+        with metrics.span('exit.process_vehicle_exit'):
+            result = db_service.process_vehicle_exit(
+                barcode,
+                config.get('system', 'operator_id', 'SYSTEM'),
+                config.get('system', 'gate_id', 'EXIT_GATE_01')
+            )
         
         if result['success']:
+            # Let the photo finish before the barrier lifts (bounded: instant from the frame grabber)
+            if capture_future is not None:
+                with metrics.span('exit.image_capture_wait'):
+                    wait([capture_future], timeout=config.getfloat('camera', 'exit_capture_wait', 0.5))
+            
+            # Open gate - the exit is already committed to the local write-behind journal
+            logger.info("=== OPENING GATE - GPIO SHOULD TRIGGER NOW ===")
+            with metrics.span('exit.gate_open'):
+                gate_opened = gate_service.open_gate(config.getint('system', 'auto_close_timeout', 10))
+            metrics.observe('exit.scan_to_gate_open', time.time() - scan_time)
+            logger.info("Gate open result: {}".format(gate_opened))
+            
             # Update current transaction
             app_state['current_transaction'] = result
             
@@ -134,49 +160,58 @@ def process_barcode(barcode):
             logger.info("Transaction type: {}".format(transaction_type))
             logger.info("Search time: {:.2f}ms".format(search_time))
             logger.info("Total processing time: {:.2f}ms".format(total_time))
-            
-            # Capture exit images
-            capture_exit_images(result['transaction']['_id'])
-            
-            # Open gate - THIS SHOULD TRIGGER GPIO
-            logger.info("=== OPENING GATE - GPIO SHOULD TRIGGER NOW ===")
-            gate_opened = gate_service.open_gate(config.getint('system', 'auto_close_timeout', 10))
-            logger.info("Gate open result: {}".format(gate_opened))
+            logger.info("Write queued: {}".format(result.get('write_queued', False)))
             
             # Play success sound
-            audio_service.play_success_sound()
+            with metrics.span('exit.audio_success'):
+                audio_service.play_success_sound()
+            
+            # Queue the exit image upload behind the exit save
+            with metrics.span('exit.image_capture'):
+                capture_exit_images(result['transaction']['_id'], capture_future)
             
             # Update stats
-            update_stats()
+            with metrics.span('exit.stats_refresh'):
+                update_stats()
             
             logger.info("Exit processed successfully: fee = {}".format(result.get('fee', 0)))
         else:
             # Play error sound
             audio_service.play_error_sound()
             logger.error("Exit processing failed: {}".format(result['message']))
+            if result.get('candidates'):
+                logger.info("Possible plates: {}".format(
+                    ', '.join(candidate['plate'] for candidate in result['candidates'])))
     
     except Exception as e:
         logger.error("Error processing barcode: {}".format(str(e)))
         audio_service.play_error_sound()
     
     finally:
+        metrics.observe('exit.total', time.time() - scan_time)
         app_state['processing'] = False
 
-def capture_exit_images(transaction_id):
-    """Capture exit images and save to transaction"""
+def start_exit_capture(scan_time):
+    """Start capturing exit images (sharpest frames around the scan) in the background"""
+    if not camera_service:
+        return None
+    return exit_capture_pool.submit(camera_service.capture_exit_images, scan_time)
+
+def capture_exit_images(transaction_id, capture_future):
+    """Save the exit images captured at the scan to the transaction"""
     try:
-        if not camera_service:
+        if capture_future is None:
             return
         
-        # Capture images from cameras
-        result = camera_service.capture_exit_images()
+        # Capture started at the scan (bounded by the camera capture deadline)
+        result = capture_future.result()
         
-        if result.success and result.image_data:
-            # Add image to transaction
+        if result.success and result.image:
+            # Add image to transaction (raw bytes, no base64 round trip)
             db_service.add_image_to_transaction(
                 transaction_id,
                 'exit_combined.jpg',
-                result.image_data
+                result.image
             )
             logger.info("Exit images captured and saved to transaction")
         else:
@@ -213,6 +248,7 @@ def api_status():
     audio_info = audio_service.get_audio_info()
     scanner_config = usb_barcode_scanner.get_config()
     sync_status = db_service.get_sync_status()
+    index_stats = db_service.get_identifier_index_stats()
     
     return jsonify({
         'success': True,
@@ -223,10 +259,44 @@ def api_status():
             'cameras': camera_status,
             'audio': audio_info,
             'scanner': scanner_config,
-            'database': sync_status
+            'database': sync_status,
+            'identifier_index': index_stats,
+            'plate_index': db_service.get_plate_index_stats(),
+            'member_cache': member_cache.get_stats(),
+            'write_behind': db_service.get_write_behind_stats(),
+            'tariff': db_service.get_tariff_stats(),
+            'latency': metrics.get_stats(),
+            'http_pool': http_pool.get_stats()
         }
     })
 
+@app.route('/api/stats/exits')
+def api_exit_stats():
+    """Exit counts/revenue grouped by [date, gate, vehicle_type] (?start=&end=&group_level=)"""
+    today = datetime.now().strftime('%Y-%m-%d')
+    start = request.args.get('start', today)
+    end = request.args.get('end', start)
+    group_level = request.args.get('group_level', 1, type=int)
+    
+    return jsonify({
+        'success': True,
+        'data': db_service.get_exit_stats((start, end), group_level)
+    })
+
+@app.route('/api/stats/active')
+def api_active_projection():
+    """Projected revenue and inap charges for vehicles still inside (?at=ISO exit time)"""
+    projection = db_service.get_active_fee_projection(request.args.get('at'))
+    if projection is None:
+        return jsonify({'success': False, 'message': 'Projection failed'})
+    
+    return jsonify({'success': True, 'data': projection})
+
+@app.route('/api/metrics')
+def api_metrics():
+    """Per-stage latency quantiles in Prometheus text format"""
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/scan', methods=['POST'])
 def api_scan():
     """Simulate barcode scan"""
@@ -325,13 +395,14 @@ def api_search_transactions():
     # Try to find by barcode
     transaction = db_service.find_transaction_by_barcode(query)
     if not transaction:
-        # Try to find by plate
-        transaction = db_service.find_transaction_by_plate(query)
+        # Try to find by plate (read-only lookup: a fuzzy best match is only displayed)
+        transaction = db_service.find_transaction_by_plate(query, fuzzy=True)
     
     if transaction:
         return jsonify({'success': True, 'data': transaction})
     else:
-        return jsonify({'success': False, 'message': 'Transaction not found'})
+        return jsonify({'success': False, 'message': 'Transaction not found',
+                        'candidates': db_service.get_plate_candidates(query)})
 
 @app.route('/api/stats')
 def api_stats():
@@ -402,6 +473,9 @@ def cleanup():
         usb_barcode_scanner.cleanup()
         gate_service.cleanup()
         audio_service.cleanup()
+        db_service.cleanup()
+        camera_service.cleanup()
+        http_pool.cleanup()
         logger.info("Cleanup completed successfully")
     except Exception as e:
         logger.error("Error during cleanup: {}".format(str(e)))
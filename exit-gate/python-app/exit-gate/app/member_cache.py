@@ -15,7 +15,11 @@ from collections import OrderedDict
 logger = logging.getLogger(__name__)
 
 class MemberCache(object):
-    """High-performance cache untuk member cards dengan LRU eviction dan TTL"""
+    """High-performance cache untuk member cards dengan LRU eviction dan TTL
+    
+    Jika di-attach ke ChangesFollower, cache di-update langsung dari _changes feed
+    dan TTL expiry dinonaktifkan selama feed healthy.
+    """
     
     def __init__(self, max_size=1000, ttl=300):  # 5 minutes TTL
         """
@@ -27,14 +31,18 @@ class MemberCache(object):
         """
         self.cache = OrderedDict()
         self.access_times = {}
+        self.doc_cards = {}  # doc _id -> card_number, resolves deletes from the feed
         self.max_size = max_size
         self.ttl = ttl
+        self.feed = None
         self.lock = threading.RLock()
         self.stats = {
             'hits': 0,
             'misses': 0,
             'evictions': 0,
-            'total_requests': 0
+            'total_requests': 0,
+            'feed_updates': 0,
+            'feed_invalidations': 0
         }
         
         logger.info("Member cache initialized (max_size: {}, ttl: {}s)".format(max_size, ttl))
@@ -53,10 +61,10 @@ class MemberCache(object):
             current_time = time.time()
             self.stats['total_requests'] += 1
             
-            # Check if exists and not expired
+            # Check if exists and not expired (no expiry while the feed keeps us coherent)
             if card_number in self.cache:
                 access_time = self.access_times.get(card_number, 0)
-                if current_time - access_time < self.ttl:
+                if self.is_coherent() or current_time - access_time < self.ttl:
                     # Move to end (LRU)
                     self.cache.move_to_end(card_number)
                     self.access_times[card_number] = current_time
@@ -66,8 +74,7 @@ class MemberCache(object):
                     return self.cache[card_number]
                 else:
                     # Expired
-                    del self.cache[card_number]
-                    del self.access_times[card_number]
+                    self._remove(card_number)
                     logger.debug("Cache EXPIRED for card: {}".format(card_number))
             
             self.stats['misses'] += 1
@@ -88,8 +95,7 @@ class MemberCache(object):
             # Remove oldest if at capacity
             if len(self.cache) >= self.max_size and card_number not in self.cache:
                 oldest_key = next(iter(self.cache))
-                del self.cache[oldest_key]
-                del self.access_times[oldest_key]
+                self._remove(oldest_key)
                 self.stats['evictions'] += 1
                 logger.debug("Evicted cache entry: {}".format(oldest_key))
             
@@ -98,6 +104,9 @@ class MemberCache(object):
             self.access_times[card_number] = current_time
             self.cache.move_to_end(card_number)
             
+            if isinstance(member_data, dict) and member_data.get('_id'):
+                self.doc_cards[member_data['_id']] = card_number
+            
             logger.debug("Cached member: {}".format(card_number))
     
     def invalidate(self, card_number=None):
@@ -109,14 +118,67 @@ class MemberCache(object):
         """
         with self.lock:
             if card_number:
-                self.cache.pop(card_number, None)
-                self.access_times.pop(card_number, None)
+                self._remove(card_number)
                 logger.debug("Invalidated cache for card: {}".format(card_number))
             else:
                 self.cache.clear()
                 self.access_times.clear()
+                self.doc_cards.clear()
                 logger.info("Invalidated entire member cache")
     
+    def _remove(self, card_number):
+        """Remove single entry (caller holds lock)"""
+        member_data = self.cache.pop(card_number, None)
+        self.access_times.pop(card_number, None)
+        if isinstance(member_data, dict):
+            self.doc_cards.pop(member_data.get('_id'), None)
+    
+    def attach_feed(self, follower):
+        """
+        Keep cache coherent from a ChangesFollower instead of TTL expiry
+        
+        Args:
+            follower (ChangesFollower): Follower yang dispatch member_entry changes
+        """
+        self.feed = follower
+        follower.add_listener(self.apply_change)
+        logger.info("Member cache attached to _changes feed")
+    
+    def is_coherent(self):
+        """True selama _changes feed healthy (TTL tidak dipakai)"""
+        return self.feed is not None and self.feed.is_healthy()
+    
+    def apply_change(self, doc_id, doc, deleted):
+        """
+        Apply a _changes row to the cache
+        
+        Args:
+            doc_id (str): Document ID
+            doc (dict or None): Document body (include_docs)
+            deleted (bool): True if the document was deleted
+        """
+        with self.lock:
+            if deleted or not doc or doc.get('_deleted'):
+                card_number = self.doc_cards.get(doc_id)
+                if card_number:
+                    self._remove(card_number)
+                    self.stats['feed_invalidations'] += 1
+                return
+            
+            if doc.get('type') != 'member_entry' or not doc.get('card_number'):
+                return
+            
+            card_number = doc['card_number']
+            if doc.get('status') == 0:
+                self.put(card_number, doc)
+                self.stats['feed_updates'] += 1
+            elif card_number in self.cache:
+                # Only drop the entry if it is this document that exited
+                cached = self.cache[card_number]
+                if not isinstance(cached, dict) or cached.get('_id') in (None, doc_id):
+                    self._remove(card_number)
+                    self.stats['feed_invalidations'] += 1
+    
     def get_stats(self):
         """
         Get cache statistics
@@ -136,7 +198,10 @@ class MemberCache(object):
                 'hit_rate': round(hit_rate, 2),
                 'cache_size': len(self.cache),
                 'max_size': self.max_size,
-                'ttl_seconds': self.ttl
+                'ttl_seconds': self.ttl,
+                'coherent': self.is_coherent(),
+                'feed_updates': self.stats['feed_updates'],
+                'feed_invalidations': self.stats['feed_invalidations']
             }
     
     def cleanup_expired(self):
@@ -147,6 +212,9 @@ class MemberCache(object):
             int: Number of expired entries removed
         """
         with self.lock:
+            if self.is_coherent():
+                return 0
+            
             current_time = time.time()
             expired_keys = []
             
@@ -155,8 +223,7 @@ class MemberCache(object):
                     expired_keys.append(card_number)
             
             for key in expired_keys:
-                del self.cache[key]
-                del self.access_times[key]
+                self._remove(key)
             
             if expired_keys:
                 logger.info("Cleaned up {} expired cache entries".format(len(expired_keys)))
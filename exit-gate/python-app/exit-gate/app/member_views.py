@@ -114,6 +114,35 @@ TRANSACTION_VIEWS_ENHANCED = {
             """
         },
         
+        # Any-status barcode lookup - lowercase keys for every identifier the old
+        # full database scan compared against (including each "_" suffix of _id)
+        "by_barcode_any": {
+            "map": """
+            function(doc) {
+                if (doc.type === 'parking_transaction' || doc.type === 'member_entry') {
+                    var seen = {};
+                    var add = function(value) {
+                        if (value === undefined || value === null || value === '') return;
+                        var key = String(value).toLowerCase();
+                        if (!seen[key]) {
+                            seen[key] = true;
+                            emit(key, doc.status);
+                        }
+                    };
+                    var id = doc._id.toLowerCase();
+                    add(id);
+                    for (var i = 0; i < id.length; i++) {
+                        if (id.charAt(i) === '_') add(id.substring(i + 1));
+                    }
+                    add(doc.no_barcode);
+                    add(doc.barcode);
+                    add(doc.ticket_number);
+                    add(doc.card_number);
+                }
+            }
+            """
+        },
+        
         # Universal search view - search by any identifier
         "universal_search": {
             "map": """
@@ -166,3 +195,89 @@ MEMBER_INDEXES = [
         "type": "json"
     }
 ]
+
+# Python mirrors of the map functions above (MemoryDatabase secondary indexes).
+# Keep them in sync with the JavaScript: each yields the same (key, value) pairs.
+
+def _by_card_number(doc):
+    if doc.get('type') == 'member_entry' and doc.get('card_number'):
+        yield doc['card_number'], doc
+
+def _active_members(doc):
+    if doc.get('type') == 'member_entry' and doc.get('status') == 0 and doc.get('card_number'):
+        fields = ('_id', 'card_number', 'plat_nomor', 'id_member', 'member_name',
+                  'waktu_masuk', 'entry_time', 'status', 'type')
+        yield doc['card_number'], dict((field, doc.get(field)) for field in fields)
+
+def _by_plate_number(doc):
+    if doc.get('type') == 'member_entry' and doc.get('plat_nomor'):
+        yield doc['plat_nomor'].lower(), doc
+
+def _by_card_and_status(doc):
+    if doc.get('type') == 'member_entry' and doc.get('card_number'):
+        yield [doc['card_number'], doc.get('status')], doc
+
+def _by_member_id(doc):
+    if doc.get('type') == 'member_entry' and doc.get('id_member'):
+        yield doc['id_member'], doc
+
+def _by_identifier(doc):
+    if doc.get('type') == 'parking_transaction' and doc.get('no_barcode'):
+        yield doc['no_barcode'], doc
+        yield 'barcode_' + doc['no_barcode'], doc
+    if doc.get('type') == 'member_entry' and doc.get('card_number'):
+        yield doc['card_number'], doc
+        yield 'card_' + doc['card_number'], doc
+
+def _active_by_type(doc):
+    if doc.get('status') == 0:
+        if doc.get('type') == 'parking_transaction' and doc.get('no_barcode'):
+            yield ['barcode', doc['no_barcode']], doc
+        if doc.get('type') == 'member_entry' and doc.get('card_number'):
+            yield ['member', doc['card_number']], doc
+
+def _by_barcode_any(doc):
+    if doc.get('type') not in ('parking_transaction', 'member_entry'):
+        return
+    seen = set()
+    doc_id = doc['_id'].lower()
+    values = [doc_id] + [doc_id[i + 1:] for i, char in enumerate(doc_id) if char == '_']
+    values += [doc.get(field) for field in ('no_barcode', 'barcode', 'ticket_number', 'card_number')]
+    for value in values:
+        if value is None or value == '':
+            continue
+        key = '{}'.format(value).lower()
+        if key not in seen:
+            seen.add(key)
+            yield key, doc.get('status')
+
+def _universal_search(doc):
+    if doc.get('type') == 'parking_transaction':
+        if doc.get('no_barcode'):
+            yield ['parking', 'barcode', doc['no_barcode']], doc
+        if doc.get('no_pol'):
+            yield ['parking', 'plate', doc['no_pol'].lower()], doc
+        yield ['parking', 'id', doc['_id']], doc
+    if doc.get('type') == 'member_entry':
+        if doc.get('card_number'):
+            yield ['member', 'card', doc['card_number']], doc
+        if doc.get('plat_nomor'):
+            yield ['member', 'plate', doc['plat_nomor'].lower()], doc
+        if doc.get('id_member'):
+            yield ['member', 'member_id', doc['id_member']], doc
+        yield ['member', 'id', doc['_id']], doc
+
+MEMBER_VIEW_MAPS = {
+    'by_card_number': _by_card_number,
+    'active_members': _active_members,
+    'by_plate_number': _by_plate_number,
+    'by_card_and_status': _by_card_and_status,
+    'by_member_id': _by_member_id
+}
+
+TRANSACTION_VIEW_MAPS_ENHANCED = {
+    'by_identifier': _by_identifier,
+    'active_by_type': _active_by_type,
+    'by_barcode_any': _by_barcode_any,
+    'universal_search': _universal_search
+}
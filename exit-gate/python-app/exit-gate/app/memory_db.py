@@ -0,0 +1,431 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+In-Memory Database untuk Exit Gate System
+Subset couchdb.Database API yang dipakai DatabaseService (get/save/delete/
+put_attachment/view) dengan secondary index per view: setiap view di-update
+saat dokumen ditulis sehingga query key/range cukup bisect, bukan full scan
+Compatible with Python 2.7 and 3.x
+"""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import io
+import copy
+import uuid
+import numbers
+import logging
+import threading
+from bisect import bisect_left, bisect_right, insort
+
+try:
+    from couchdb import ResourceNotFound, ResourceConflict
+except ImportError:
+    class ResourceNotFound(Exception):
+        """Document / view / attachment tidak ditemukan (couchdb.ResourceNotFound)"""
+
+    class ResourceConflict(Exception):
+        """Revision conflict (couchdb.ResourceConflict)"""
+
+try:
+    string_types = (str, unicode)  # Python 2
+except NameError:
+    string_types = (str,)
+
+logger = logging.getLogger(__name__)
+
+class _Top(object):
+    """Sorts after every doc id - upper bound for an inclusive key range"""
+
+    def __lt__(self, other):
+        return False
+
+    def __gt__(self, other):
+        return other is not self
+
+    def __eq__(self, other):
+        return other is self
+
+    def __ne__(self, other):
+        return other is not self
+
+    __hash__ = object.__hash__
+
+TOP = _Top()
+
+def collation_key(value):
+    """
+    Sort key following CouchDB view collation:
+    null < false < true < numbers < strings < arrays < objects
+    """
+    if value is None:
+        return (0,)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, numbers.Number):
+        return (2, value)
+    if isinstance(value, string_types):
+        return (3, value)
+    if isinstance(value, (list, tuple)):
+        return (4, tuple(collation_key(item) for item in value))
+    if isinstance(value, dict):
+        return (5, tuple((k, collation_key(v)) for k, v in sorted(value.items())))
+    return (6, repr(value))
+
+def _sum(values):
+    """Builtin _sum reduce; arrays are summed element-wise"""
+    total = None
+    for value in values:
+        if isinstance(value, (list, tuple)):
+            total = list(total or [])
+            total.extend([0] * (len(value) - len(total)))
+            for i, item in enumerate(value):
+                total[i] += item
+        else:
+            total = (total or 0) + value
+    return total
+
+BUILTIN_REDUCE = {
+    '_sum': _sum,
+    '_count': len
+}
+
+class Row(dict):
+    """View result row (attribute access like couchdb.client.Row)"""
+
+    @property
+    def id(self):
+        return self.get('id')
+
+    @property
+    def key(self):
+        return self.get('key')
+
+    @property
+    def value(self):
+        return self.get('value')
+
+    @property
+    def doc(self):
+        return self.get('doc')
+
+    @property
+    def error(self):
+        return self.get('error')
+
+class ViewIndex(object):
+    """Sorted (collation key, doc id, n, key, value) entries for one view"""
+
+    def __init__(self, map_func, reduce_func=None):
+        """
+        Args:
+            map_func (callable): doc -> iterable of (key, value), mirrors the JS emit()
+            reduce_func (str, optional): '_sum' or '_count'
+        """
+        self.map_func = map_func
+        self.reduce_func = reduce_func
+        self.entries = []
+        self.by_doc = {}
+
+    def update(self, doc_id, doc):
+        """Re-index one document (doc None = deleted)"""
+        for entry in self.by_doc.pop(doc_id, ()):
+            del self.entries[bisect_left(self.entries, entry)]
+
+        if doc is None or doc_id.startswith('_design/'):
+            return
+
+        emitted = []
+        for n, (key, value) in enumerate(self.map_func(doc) or ()):
+            entry = (collation_key(key), doc_id, n, key, value)
+            insort(self.entries, entry)
+            emitted.append(entry)
+        if emitted:
+            self.by_doc[doc_id] = emitted
+
+    def range(self, startkey=None, endkey=None, descending=False, inclusive_end=True,
+              has_start=False, has_end=False):
+        """Entries between startkey and endkey (CouchDB semantics, incl. descending)"""
+        low, high = (endkey, startkey) if descending else (startkey, endkey)
+        has_low, has_high = (has_end, has_start) if descending else (has_start, has_end)
+        low_inclusive = inclusive_end if descending else True
+        high_inclusive = True if descending else inclusive_end
+
+        lo = 0
+        if has_low:
+            ckey = collation_key(low)
+            lo = bisect_left(self.entries, (ckey,)) if low_inclusive else bisect_right(self.entries, (ckey, TOP))
+        hi = len(self.entries)
+        if has_high:
+            ckey = collation_key(high)
+            hi = bisect_right(self.entries, (ckey, TOP)) if high_inclusive else bisect_left(self.entries, (ckey,))
+
+        rows = self.entries[lo:max(lo, hi)]
+        return rows[::-1] if descending else rows
+
+class MemoryDatabase(object):
+    """Indexed in-memory replacement for couchdb.Database (offline mode and tests)"""
+
+    def __init__(self, name='transactions'):
+        self.name = name
+        self.docs = {}
+        self.doc_ids = []  # sorted, for _all_docs ranges
+        self.attachments = {}
+        self.views = {}
+        self.update_seq = 0
+        self.lock = threading.RLock()
+
+    # -- views -------------------------------------------------------------
+
+    def register_view(self, view_name, map_func, reduce_func=None):
+        """
+        Register a secondary index 'design/view' and build it over existing documents
+
+        Args:
+            view_name (str): e.g. 'transactions/by_barcode'
+            map_func (callable): doc -> iterable of (key, value)
+            reduce_func (str, optional): '_sum' or '_count'
+        """
+        if reduce_func is not None and reduce_func not in BUILTIN_REDUCE:
+            raise ValueError("Unsupported reduce: {}".format(reduce_func))
+
+        index = ViewIndex(map_func, reduce_func)
+        with self.lock:
+            for doc_id, doc in self.docs.items():
+                index.update(doc_id, doc)
+            self.views[view_name] = index
+
+    def register_design(self, design, view_maps):
+        """Register every view of a design doc: {view: map_func or (map_func, reduce)}"""
+        for view, definition in view_maps.items():
+            if isinstance(definition, tuple):
+                self.register_view('{}/{}'.format(design, view), *definition)
+            else:
+                self.register_view('{}/{}'.format(design, view), definition)
+
+    # -- documents ---------------------------------------------------------
+
+    def __contains__(self, doc_id):
+        return doc_id in self.docs
+
+    def __iter__(self):
+        return iter(list(self.doc_ids))
+
+    def __getitem__(self, doc_id):
+        with self.lock:
+            doc = self.docs.get(doc_id)
+            if doc is None:
+                raise ResourceNotFound("Document not found: {}".format(doc_id))
+            return copy.deepcopy(doc)
+
+    def __setitem__(self, doc_id, doc):
+        doc['_id'] = doc_id
+        self.save(doc)
+
+    def __delitem__(self, doc_id):
+        self.delete(self[doc_id])
+
+    def get(self, doc_id, default=None):
+        with self.lock:
+            doc = self.docs.get(doc_id)
+            return copy.deepcopy(doc) if doc is not None else default
+
+    def _next_rev(self, current):
+        generation = int(current['_rev'].split('-', 1)[0]) if current else 0
+        return '{}-{}'.format(generation + 1, uuid.uuid4().hex)
+
+    def _store(self, doc_id, doc):
+        """Write (doc) or remove (None) a document and update every index"""
+        if doc is None:
+            del self.docs[doc_id]
+            del self.doc_ids[bisect_left(self.doc_ids, doc_id)]
+        else:
+            if doc_id not in self.docs:
+                insort(self.doc_ids, doc_id)
+            self.docs[doc_id] = doc
+        for index in self.views.values():
+            index.update(doc_id, doc)
+        self.update_seq += 1
+
+    def _check_rev(self, doc_id, rev):
+        current = self.docs.get(doc_id)
+        if (current['_rev'] if current else None) != rev:
+            raise ResourceConflict("Document update conflict: {}".format(doc_id))
+        return current
+
+    def save(self, doc):
+        """
+        Create or update a document (updates doc['_id'] / doc['_rev'] in place)
+
+        Raises:
+            ResourceConflict: _rev does not match the stored revision
+        """
+        with self.lock:
+            doc_id = doc.get('_id') or uuid.uuid4().hex
+            current = self._check_rev(doc_id, doc.get('_rev'))
+
+            stored = copy.deepcopy(doc)
+            stored['_id'] = doc_id
+            stored['_rev'] = self._next_rev(current)
+            self._store(doc_id, stored)
+
+        doc['_id'] = doc_id
+        doc['_rev'] = stored['_rev']
+        return doc_id, stored['_rev']
+
+    def delete(self, doc):
+        """Delete document (its _rev must be current)"""
+        with self.lock:
+            if doc.get('_id') not in self.docs:
+                raise ResourceNotFound("Document not found: {}".format(doc.get('_id')))
+            self._check_rev(doc['_id'], doc.get('_rev'))
+            for name in list(self.docs[doc['_id']].get('_attachments', {})):
+                self.attachments.pop((doc['_id'], name), None)
+            self._store(doc['_id'], None)
+
+    def put_attachment(self, doc, content, filename=None, content_type=None):
+        """Attach bytes (or a file-like object) to doc; bumps doc['_rev'] in place"""
+        if hasattr(content, 'read'):
+            filename = filename or getattr(content, 'name', None)
+            content = content.read()
+        if filename is None:
+            raise ValueError("Attachment filename required")
+
+        with self.lock:
+            if doc.get('_id') not in self.docs:
+                raise ResourceNotFound("Document not found: {}".format(doc.get('_id')))
+            current = self._check_rev(doc['_id'], doc.get('_rev'))
+
+            stored = copy.deepcopy(current)
+            stored['_rev'] = self._next_rev(current)
+            stored.setdefault('_attachments', {})[filename] = {
+                'content_type': content_type or 'application/octet-stream',
+                'length': len(content),
+                'revpos': int(stored['_rev'].split('-', 1)[0]),
+                'stub': True
+            }
+            self.attachments[(doc['_id'], filename)] = bytes(content)
+            self._store(doc['_id'], stored)
+
+        doc['_rev'] = stored['_rev']
+        doc['_attachments'] = copy.deepcopy(stored['_attachments'])
+        return True
+
+    def get_attachment(self, id_or_doc, filename, default=None):
+        """Attachment as a file-like object (like couchdb-python), or default"""
+        doc_id = id_or_doc['_id'] if isinstance(id_or_doc, dict) else id_or_doc
+        data = self.attachments.get((doc_id, filename))
+        return io.BytesIO(data) if data is not None else default
+
+    def info(self):
+        return {'db_name': self.name, 'doc_count': len(self.docs), 'update_seq': self.update_seq}
+
+    # -- queries -----------------------------------------------------------
+
+    def view(self, name, wrapper=None, **options):
+        """
+        Query _all_docs or a registered view
+
+        Options: key, keys, startkey, endkey, descending, inclusive_end, skip, limit,
+        include_docs, reduce, group, group_level
+
+        Raises:
+            ResourceNotFound: view not registered
+        """
+        with self.lock:
+            if name == '_all_docs':
+                rows = self._all_docs(options)
+            else:
+                index = self.views.get(name)
+                if index is None:
+                    raise ResourceNotFound("View not found: {}".format(name))
+                rows = self._query(index, options)
+
+        skip = options.get('skip', 0)
+        limit = options.get('limit')
+        rows = rows[skip:skip + limit] if limit is not None else rows[skip:]
+        return [wrapper(row) for row in rows] if wrapper else rows
+
+    def _all_docs(self, options):
+        include_docs = options.get('include_docs', False)
+
+        def row(doc_id):
+            doc = self.docs[doc_id]
+            result = Row(id=doc_id, key=doc_id, value={'rev': doc['_rev']})
+            if include_docs:
+                result['doc'] = copy.deepcopy(doc)
+            return result
+
+        if 'keys' in options:
+            return [row(k) if k in self.docs else Row(key=k, error='not_found') for k in options['keys']]
+
+        if 'key' in options:
+            return [row(options['key'])] if options['key'] in self.docs else []
+
+        descending = options.get('descending', False)
+        inclusive_end = options.get('inclusive_end', True)
+        start, end = options.get('startkey'), options.get('endkey')
+        low, high = (end, start) if descending else (start, end)
+        lo = 0 if low is None else (
+            bisect_left(self.doc_ids, low) if (inclusive_end or not descending)
+            else bisect_right(self.doc_ids, low))
+        hi = len(self.doc_ids) if high is None else (
+            bisect_right(self.doc_ids, high) if (inclusive_end or descending)
+            else bisect_left(self.doc_ids, high))
+
+        doc_ids = self.doc_ids[lo:max(lo, hi)]
+        return [row(doc_id) for doc_id in (doc_ids[::-1] if descending else doc_ids)]
+
+    def _query(self, index, options):
+        descending = options.get('descending', False)
+        inclusive_end = options.get('inclusive_end', True)
+
+        if 'keys' in options:
+            entries = []
+            for key in options['keys']:
+                entries.extend(index.range(key, key, descending, True, True, True))
+        elif 'key' in options:
+            entries = index.range(options['key'], options['key'], descending, True, True, True)
+        else:
+            entries = index.range(options.get('startkey'), options.get('endkey'), descending,
+                                  inclusive_end, 'startkey' in options, 'endkey' in options)
+
+        if index.reduce_func and options.get('reduce', True):
+            return self._reduce(index, entries, options)
+
+        include_docs = options.get('include_docs', False)
+        rows = []
+        for _, doc_id, _, key, value in entries:
+            row = Row(id=doc_id, key=key, value=copy.deepcopy(value))
+            if include_docs:
+                # Linked documents: emit(key, {_id: ...}) includes that document
+                linked = value.get('_id') if isinstance(value, dict) else None
+                doc = self.docs.get(linked or doc_id)
+                row['doc'] = copy.deepcopy(doc) if doc is not None else None
+            rows.append(row)
+        return rows
+
+    def _reduce(self, index, entries, options):
+        reduce = BUILTIN_REDUCE[index.reduce_func]
+        group_level = options.get('group_level')
+        if options.get('group') and group_level is None:
+            group_level = -1  # exact keys
+
+        if not group_level:
+            return [Row(key=None, value=reduce([entry[4] for entry in entries]))] if entries else []
+
+        rows = []
+        current = None
+        values = []
+        for entry in entries:
+            key = entry[3]
+            if group_level > 0 and isinstance(key, (list, tuple)):
+                key = list(key[:group_level])
+            if values and key != current:
+                rows.append(Row(key=current, value=reduce(values)))
+                values = []
+            current = key
+            values.append(entry[4])
+        if values:
+            rows.append(Row(key=current, value=reduce(values)))
+        return rows
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Latency Metrics untuk Exit Gate System
+Named spans di sekitar setiap tahap exit pipeline, diagregasi menjadi rolling
+p50/p95/p99 dan diekspos dalam Prometheus text format (/api/metrics)
+Compatible with Python 2.7 and 3.x
+"""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import time
+import logging
+import threading
+import functools
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+class SpanStats(object):
+    """Rolling window of durations plus lifetime count/sum for one span"""
+
+    def __init__(self, window=1024):
+        self.samples = deque(maxlen=window)  # seconds
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+
+    def observe(self, duration, error=False):
+        self.samples.append(duration)
+        self.count += 1
+        self.total += duration
+        if error:
+            self.errors += 1
+
+    def quantiles(self):
+        """Nearest-rank quantiles over the rolling window"""
+        ordered = sorted(self.samples)
+        if not ordered:
+            return dict((q, 0.0) for q in QUANTILES)
+        return dict((q, ordered[min(len(ordered) - 1, int(q * len(ordered)))]) for q in QUANTILES)
+
+class Span(object):
+    """Context manager / decorator timing one pipeline stage"""
+
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+        self.start_time = None
+
+    def __enter__(self):
+        self.start_time = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.registry.observe(self.name, time.time() - self.start_time, error=exc_type is not None)
+        return False
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with Span(self.registry, self.name):
+                return func(*args, **kwargs)
+        return wrapper
+
+class Metrics(object):
+    """Span registry"""
+
+    def __init__(self, prefix='exit_gate', window=1024):
+        """
+        Initialize metrics registry
+
+        Args:
+            prefix (str): Prometheus metric name prefix (default: exit_gate)
+            window (int): Samples kept per span for quantiles (default: 1024)
+        """
+        self.prefix = prefix
+        self.window = window
+        self.spans = {}
+        self.lock = threading.Lock()
+
+    def span(self, name):
+        """
+        Time a stage
+
+        Usage:
+            with metrics.span('db.lookup'):
+                ...
+
+            @metrics.span('gate.open')
+            def open_gate(...):
+        """
+        return Span(self, name)
+
+    def observe(self, name, duration, error=False):
+        """Record a duration in seconds"""
+        with self.lock:
+            stats = self.spans.get(name)
+            if stats is None:
+                stats = self.spans[name] = SpanStats(self.window)
+            stats.observe(duration, error)
+
+    def get_stats(self):
+        """
+        Get per-span summary in milliseconds
+
+        Returns:
+            dict: span -> count, errors, avg_ms, p50_ms, p95_ms, p99_ms
+        """
+        with self.lock:
+            spans = [(name, stats, stats.quantiles()) for name, stats in self.spans.items()]
+
+        result = {}
+        for name, stats, quantiles in spans:
+            result[name] = {
+                'count': stats.count,
+                'errors': stats.errors,
+                'avg_ms': round(stats.total / stats.count * 1000, 2) if stats.count else 0,
+                'p50_ms': round(quantiles[0.5] * 1000, 2),
+                'p95_ms': round(quantiles[0.95] * 1000, 2),
+                'p99_ms': round(quantiles[0.99] * 1000, 2)
+            }
+        return result
+
+    def render_prometheus(self):
+        """
+        Render spans as a Prometheus summary
+
+        Returns:
+            str: Prometheus text exposition format
+        """
+        name = '{}_span_duration_seconds'.format(self.prefix)
+        errors_name = '{}_span_errors_total'.format(self.prefix)
+        lines = [
+            '# HELP {} Duration of exit pipeline stages (rolling window quantiles).'.format(name),
+            '# TYPE {} summary'.format(name)
+        ]
+        error_lines = [
+            '# HELP {} Spans that ended with an exception.'.format(errors_name),
+            '# TYPE {} counter'.format(errors_name)
+        ]
+
+        with self.lock:
+            spans = sorted((span, stats, stats.quantiles()) for span, stats in self.spans.items())
+
+        for span, stats, quantiles in spans:
+            for q in QUANTILES:
+                lines.append('{}{{span="{}",quantile="{}"}} {:.6f}'.format(name, span, q, quantiles[q]))
+            lines.append('{}_sum{{span="{}"}} {:.6f}'.format(name, span, stats.total))
+            lines.append('{}_count{{span="{}"}} {}'.format(name, span, stats.count))
+            error_lines.append('{}{{span="{}"}} {}'.format(errors_name, span, stats.errors))
+
+        return '\n'.join(lines + error_lines) + '\n'
+
+    def reset(self):
+        with self.lock:
+            self.spans.clear()
+
+
+# Global metrics instance
+metrics = Metrics()
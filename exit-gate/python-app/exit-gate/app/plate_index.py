@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Plate Index untuk Exit Gate System
+Fuzzy index plat nomor kendaraan yang masih di dalam (status 0): plat dinormalisasi
+dengan peta kebingungan OCR (0/O/D/Q, 1/I/L, 8/B, ...) lalu dicari dengan batas
+edit distance lewat deletion-neighbourhood index (setiap query cukup beberapa dict lookup)
+Compatible with Python 2.7 and 3.x
+"""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+TRANSACTION_TYPES = ('parking_transaction', 'member_entry')
+PLATE_FIELDS = ('no_pol', 'plat_nomor')
+
+# Characters OCR confuses, folded onto one canonical character
+OCR_CONFUSIONS = {
+    'O': '0', 'Q': '0', 'D': '0',
+    'I': '1', 'L': '1',
+    'Z': '2',
+    'S': '5',
+    'G': '6',
+    'B': '8',
+}
+
+def normalize_plate(value):
+    """Upper case, only letters and digits ('b 1234-xy' -> 'B1234XY')"""
+    if not value:
+        return ''
+    return ''.join(ch for ch in str(value).upper() if ch.isalnum())
+
+def canonical_plate(value):
+    """Normalized plate with OCR look-alikes folded ('B1234XY' and '81234XY' match)"""
+    return ''.join(OCR_CONFUSIONS.get(ch, ch) for ch in normalize_plate(value))
+
+def edit_distance(a, b, max_distance=None):
+    """Levenshtein distance (returns max_distance + 1 as soon as it is exceeded)"""
+    if a == b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    if max_distance is not None and len(a) - len(b) > max_distance:
+        return max_distance + 1
+
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if max_distance is not None and min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+def deletion_variants(word, depth):
+    """Every string obtained by deleting up to `depth` characters from word"""
+    variants = set([word])
+    frontier = set([word])
+    for _ in range(depth):
+        next_frontier = set()
+        for item in frontier:
+            for i in range(len(item)):
+                next_frontier.add(item[:i] + item[i + 1:])
+        variants |= next_frontier
+        frontier = next_frontier
+    return variants
+
+class PlateIndex(object):
+    """
+    Thread-safe fuzzy plate -> doc id index for active transactions
+
+    Two plates within edit distance k always share a string reachable from both
+    by at most k deletions, so a search only looks up the query's deletion
+    variants and verifies the handful of plates found there.
+    """
+
+    def __init__(self, max_distance=2):
+        self.max_distance = max_distance
+
+        # deletion variant -> set of canonical plates
+        self.variants = {}
+        # canonical plate -> set of doc ids
+        self.plates = {}
+        # doc_id -> (normalized plate, canonical plate)
+        self.doc_plates = {}
+
+        self.ready = False
+        self.lock = threading.RLock()
+        self.stats = {
+            'searches': 0,
+            'exact_hits': 0,
+            'fuzzy_hits': 0,
+            'ambiguous': 0,
+            'misses': 0,
+            'updates': 0,
+            'build_time_ms': None
+        }
+
+    def _add(self, doc_id, plate):
+        canonical = canonical_plate(plate)
+        if not canonical:
+            return
+        doc_ids = self.plates.get(canonical)
+        if doc_ids is None:
+            doc_ids = self.plates[canonical] = set()
+            for variant in deletion_variants(canonical, self.max_distance):
+                self.variants.setdefault(variant, set()).add(canonical)
+        doc_ids.add(doc_id)
+        self.doc_plates[doc_id] = (normalize_plate(plate), canonical)
+
+    def _remove(self, doc_id):
+        entry = self.doc_plates.pop(doc_id, None)
+        if entry is None:
+            return
+        canonical = entry[1]
+        doc_ids = self.plates.get(canonical)
+        if doc_ids is None:
+            return
+        doc_ids.discard(doc_id)
+        if doc_ids:
+            return
+        del self.plates[canonical]
+        for variant in deletion_variants(canonical, self.max_distance):
+            owners = self.variants.get(variant)
+            if owners is not None:
+                owners.discard(canonical)
+                if not owners:
+                    del self.variants[variant]
+
+    def update_doc(self, doc_id, doc=None, deleted=False):
+        """
+        Insert, update or remove a document (only active transactions are kept)
+
+        Args:
+            doc_id (str): Document ID
+            doc (dict, optional): Document body (None or deleted removes it)
+            deleted (bool): True if the document was deleted
+        """
+        if not doc_id or doc_id.startswith('_design'):
+            return
+
+        with self.lock:
+            self._remove(doc_id)
+            if (deleted or not doc or doc.get('_deleted') or doc.get('status') != 0 or
+                    doc.get('type') not in TRANSACTION_TYPES):
+                return
+
+            for field in PLATE_FIELDS:
+                if doc.get(field):
+                    self._add(doc_id, doc[field])
+                    break
+            self.stats['updates'] += 1
+
+    def on_change(self, doc_id, doc, deleted):
+        """ChangesFollower listener"""
+        self.update_doc(doc_id, doc, deleted)
+
+    def build_from_docs(self, docs):
+        """
+        Build index from an iterable of documents
+
+        Returns:
+            int: Number of active plates indexed
+        """
+        start_time = time.time()
+        with self.lock:
+            self.clear()
+            for doc in docs:
+                self.update_doc(doc.get('_id'), doc)
+            self.ready = True
+            self.stats['build_time_ms'] = round((time.time() - start_time) * 1000, 2)
+            logger.info("Plate index built: {} active plates ({:.2f}ms)".format(
+                len(self.doc_plates), self.stats['build_time_ms']))
+            return len(self.doc_plates)
+
+    def search(self, plate, max_distance=None, limit=5):
+        """
+        Ranked candidates for a (possibly misread) plate
+
+        Args:
+            plate (str): Plate as read by ALPR / typed by the operator
+            max_distance (int, optional): Edit distance after OCR folding (<= index max_distance)
+            limit (int): Maximum candidates returned
+
+        Returns:
+            list: dicts with doc_id, plate, distance (folded) and raw_distance, best first
+        """
+        if max_distance is None or max_distance > self.max_distance:
+            max_distance = self.max_distance
+        query = normalize_plate(plate)
+        canonical = canonical_plate(query)
+        if not canonical:
+            return []
+
+        with self.lock:
+            self.stats['searches'] += 1
+            nearby = set()
+            for variant in deletion_variants(canonical, max_distance):
+                owners = self.variants.get(variant)
+                if owners:
+                    nearby |= owners
+
+            candidates = []
+            for candidate in nearby:
+                distance = edit_distance(canonical, candidate, max_distance)
+                if distance > max_distance:
+                    continue
+                for doc_id in self.plates[candidate]:
+                    stored = self.doc_plates[doc_id][0]
+                    candidates.append({
+                        'doc_id': doc_id,
+                        'plate': stored,
+                        'distance': distance,
+                        'raw_distance': edit_distance(query, stored)
+                    })
+
+        candidates.sort(key=lambda c: (c['distance'], c['raw_distance'], c['plate']))
+        return candidates[:limit]
+
+    def resolve(self, plate, max_distance=1):
+        """
+        Single best doc id for a plate, None when nothing is close enough or when
+        two vehicles are equally close (never guess between two cars)
+
+        Returns:
+            tuple: (doc_id, candidate dict) or (None, None)
+        """
+        candidates = self.search(plate, max_distance, limit=2)
+        with self.lock:
+            if not candidates:
+                self.stats['misses'] += 1
+                return None, None
+            best = candidates[0]
+            if len(candidates) > 1 and (candidates[1]['distance'], candidates[1]['raw_distance']) == \
+                    (best['distance'], best['raw_distance']):
+                self.stats['ambiguous'] += 1
+                return None, None
+            self.stats['exact_hits' if best['raw_distance'] == 0 else 'fuzzy_hits'] += 1
+            return best['doc_id'], best
+
+    def clear(self):
+        """Drop all index entries"""
+        with self.lock:
+            self.variants.clear()
+            self.plates.clear()
+            self.doc_plates.clear()
+            self.ready = False
+
+    def get_stats(self):
+        """
+        Get index statistics
+
+        Returns:
+            dict: Index size and search counters
+        """
+        with self.lock:
+            stats = dict(self.stats)
+            stats['ready'] = self.ready
+            stats['active_plates'] = len(self.doc_plates)
+            stats['variants'] = len(self.variants)
+            stats['max_distance'] = self.max_distance
+            return stats
+
+
+# Global plate index instance
+plate_index = PlateIndex()
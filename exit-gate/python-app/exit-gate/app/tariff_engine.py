@@ -0,0 +1,440 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Tariff Engine untuk Exit Gate System
+Rules dari legacy tabel `tarif` / `tarif_inap` (parkir_awal.sql) di-compile sekali
+per jenis kendaraan menjadi schedule piecewise; quote() constant time + cache,
+quote_bulk() menghitung semua transaksi aktif sekaligus (NumPy jika tersedia)
+Compatible with Python 2.7 and 3.x
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import logging
+import threading
+import warnings
+import datetime
+from bisect import bisect_right
+
+logger = logging.getLogger(__name__)
+
+NUMPY_AVAILABLE = False
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    pass
+
+MINUTES_PER_DAY = 24 * 60
+
+# Category multipliers (kategori) - anything not listed pays the full fee
+DEFAULT_CATEGORY_FACTORS = {'member': 0.8}
+
+# Dipakai selama belum ada dokumen `tarif_config`: flat per jam, minimum 1 jam
+DEFAULT_TARIF_ROWS = [
+    {'id_mobil': '1', 'tarif': 5000, 'waktu_tarif': 60, 'interval': 60, 'tarif_interval': 5000},    # Motor
+    {'id_mobil': '2', 'tarif': 10000, 'waktu_tarif': 60, 'interval': 60, 'tarif_interval': 10000},  # Mobil
+    {'id_mobil': '3', 'tarif': 15000, 'waktu_tarif': 60, 'interval': 60, 'tarif_interval': 15000},  # Truck
+    {'id_mobil': 'default', 'tarif': 5000, 'waktu_tarif': 60, 'interval': 60, 'tarif_interval': 5000}
+]
+
+def _ceil_div(a, b):
+    return -(-a // b)
+
+_TIME_FORMATS = ('%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M', '%Y-%m-%d')
+
+def _to_datetime(value):
+    """
+    Naive datetime from a datetime or ISO string ('T' or space separator,
+    optional seconds / fraction; a timezone suffix is dropped, wall time kept)
+    """
+    if isinstance(value, datetime.datetime):
+        return value.replace(tzinfo=None)
+    text = value.strip().replace(' ', 'T', 1)
+    if text.endswith('Z'):
+        text = text[:-1]
+    elif len(text) > 16 and text[-6] in '+-' and text[-3] == ':':
+        text = text[:-6]
+
+    fromisoformat = getattr(datetime.datetime, 'fromisoformat', None)  # Python 3.7+
+    if fromisoformat is not None:
+        try:
+            return fromisoformat(text)
+        except ValueError:
+            pass
+    for fmt in _TIME_FORMATS:
+        try:
+            return datetime.datetime.strptime(text, fmt)
+        except ValueError:
+            pass
+    raise ValueError("Unrecognized timestamp: {}".format(value))
+
+def _num(row, column, default=0):
+    value = row.get(column)
+    return default if value in (None, '') else value
+
+class CompiledTariff(object):
+    """
+    One vehicle class compiled from a `tarif` row
+
+    Columns used:
+        tarif / waktu_tarif        first block fee and length (minutes)
+        tarif_interval / interval  fee per following block and block length
+        tarif2 / waktu2            block fee from minute waktu2 on (progressive step)
+        tarif3 / waktu3            block fee from minute waktu3 on
+        waktu_gratis               grace period, no charge up to this many minutes
+        maksimum / max_per_hari    fee cap, per 24h when max_per_hari is set
+        tarif_inap / batas_inap_min  overnight fee (from tarif_inap) per midnight crossed,
+                                   once the stay is at least batas_inap_min minutes
+    """
+
+    def __init__(self, row, inap_row=None):
+        self.vehicle = str(row['id_mobil'])
+        self.grace = int(_num(row, 'waktu_gratis'))
+
+        interval = int(_num(row, 'interval', 60)) or 60
+        self.first_fee = float(_num(row, 'tarif'))
+        self.first_length = int(_num(row, 'waktu_tarif', interval)) or interval
+        interval_fee = float(_num(row, 'tarif_interval', self.first_fee))
+
+        # Progressive steps: (start minute, block length, block fee)
+        steps = {self.first_length: (interval, interval_fee)}
+        for fee_column, time_column in (('tarif2', 'waktu2'), ('tarif3', 'waktu3')):
+            if _num(row, fee_column) and _num(row, time_column):
+                start = max(int(row[time_column]), self.first_length)
+                steps[start] = (interval, float(row[fee_column]))
+
+        self.starts = sorted(steps)
+        self.steps = [steps[start] for start in self.starts]
+
+        # Fee already accrued when each step begins
+        self.bases = [self.first_fee]
+        for i in range(1, len(self.starts)):
+            length, fee = self.steps[i - 1]
+            blocks = _ceil_div(self.starts[i] - self.starts[i - 1], length)
+            self.bases.append(self.bases[-1] + blocks * fee)
+
+        self.daily = bool(_num(row, 'max_per_hari'))
+        cap = float(_num(row, 'maksimum'))
+        if self.daily and not cap:
+            cap = self._schedule(MINUTES_PER_DAY)
+        self.cap = cap or None
+
+        self.overnight_fee = 0.0
+        self.overnight_min = int(_num(row, 'batas_inap_min'))
+        if _num(row, 'tarif_inap') and inap_row:
+            self.overnight_fee = float(_num(inap_row, 'tarif_member'))
+
+    def _schedule(self, minutes):
+        """Uncapped piecewise fee for a stay of `minutes`"""
+        if minutes <= 0:
+            return 0.0
+        if minutes <= self.first_length:
+            return self.first_fee
+
+        i = bisect_right(self.starts, minutes - 1) - 1
+        length, fee = self.steps[i]
+        return self.bases[i] + _ceil_div(minutes - self.starts[i], length) * fee
+
+    def overnight(self, minutes, nights):
+        """Inap charge for a stay of `minutes` that crossed `nights` midnights"""
+        if nights and self.overnight_fee and minutes >= self.overnight_min:
+            return nights * self.overnight_fee
+        return 0.0
+
+    def charge(self, minutes, nights=0):
+        """Fee for a stay of `minutes` that crossed `nights` midnights"""
+        if self.grace and minutes <= self.grace:
+            fee = 0.0
+        elif self.daily:
+            days, rest = divmod(max(minutes, 1), MINUTES_PER_DAY)
+            fee = days * self.cap + min(self._schedule(rest), self.cap)
+        else:
+            fee = self._schedule(max(minutes, 1))  # First block is always billed
+            if self.cap:
+                fee = min(fee, self.cap)
+
+        return fee + self.overnight(minutes, nights)
+
+    def _schedule_array(self, minutes):
+        """Vectorised _schedule()"""
+        starts = np.array(self.starts, dtype=np.int64)
+        lengths = np.array([length for length, _ in self.steps], dtype=np.int64)
+        fees = np.array([fee for _, fee in self.steps])
+        bases = np.array(self.bases)
+
+        i = np.clip(np.searchsorted(starts, minutes - 1, side='right') - 1, 0, len(starts) - 1)
+        blocks = -((starts[i] - minutes) // lengths[i])  # ceil((minutes - start) / length)
+        fee = np.where(minutes <= self.first_length, self.first_fee, bases[i] + blocks * fees[i])
+        return np.where(minutes <= 0, 0.0, fee)
+
+    def charge_array(self, minutes, nights):
+        """
+        Vectorised charge() over int64 arrays
+
+        Returns:
+            tuple: (fee, overnight) float arrays; fee excludes the inap part
+        """
+        billed = np.maximum(minutes, 1)
+        if self.daily:
+            days, rest = np.divmod(billed, MINUTES_PER_DAY)
+            fee = days * self.cap + np.minimum(self._schedule_array(rest), self.cap)
+        else:
+            fee = self._schedule_array(billed)
+            if self.cap:
+                fee = np.minimum(fee, self.cap)
+        if self.grace:
+            fee = np.where(minutes <= self.grace, 0.0, fee)
+
+        overnight = np.where((nights > 0) & (minutes >= self.overnight_min),
+                             nights * self.overnight_fee, 0.0)
+        return fee, overnight
+
+class TariffEngine(object):
+    """Compiled tariff rules shared by every gate; quote() is constant time"""
+
+    def __init__(self, tarif_rows=None, tarif_inap_rows=None, category_factors=None, cache_size=4096):
+        """
+        Initialize tariff engine
+
+        Args:
+            tarif_rows (list): Rows shaped like the legacy `tarif` table
+            tarif_inap_rows (list, optional): Rows shaped like `tarif_inap`
+            category_factors (dict, optional): kategori -> fee multiplier
+            cache_size (int): Max cached quotes (default: 4096)
+        """
+        self.category_factors = dict(DEFAULT_CATEGORY_FACTORS if category_factors is None else category_factors)
+        self.cache_size = cache_size
+        self.tariffs = {}
+        self.default_vehicle = None
+        self.cache = {}
+        self.lock = threading.Lock()
+        self.stats = {'quotes': 0, 'cache_hits': 0}
+
+        if tarif_rows:
+            self.load(tarif_rows, tarif_inap_rows)
+
+    def load(self, tarif_rows, tarif_inap_rows=None):
+        """
+        Compile rules (replaces previous rules and clears the cache)
+
+        Returns:
+            int: Number of vehicle classes compiled
+        """
+        inap = dict((str(row['id_mobil']), row) for row in (tarif_inap_rows or []))
+        tariffs = {}
+        for row in tarif_rows:
+            try:
+                tariff = CompiledTariff(row, inap.get(str(row['id_mobil'])))
+                tariffs[tariff.vehicle] = tariff
+            except Exception as e:
+                logger.error("Skipping tarif row {}: {}".format(row.get('id_mobil'), str(e)))
+
+        with self.lock:
+            self.tariffs = tariffs
+            self.default_vehicle = 'default' if 'default' in tariffs else (
+                str(tarif_rows[0]['id_mobil']) if tarif_rows else None)
+            self.cache = {}
+
+        logger.info("Tariff engine compiled {} vehicle classes".format(len(tariffs)))
+        return len(tariffs)
+
+    @staticmethod
+    def _to_datetime(value):
+        return _to_datetime(value)
+
+    def quote(self, entry, exit=None, vehicle=None, category=None):
+        """
+        Quote parking fee
+
+        Args:
+            entry: Entry time (datetime or ISO string)
+            exit: Exit time (default: now)
+            vehicle: id_kendaraan / id_mobil; unknown vehicles use the default class
+            category (str, optional): kategori, e.g. 'member'
+
+        Returns:
+            dict: fee, duration_minutes, nights, vehicle, category
+        """
+        entry_time = self._to_datetime(entry)
+        exit_time = self._to_datetime(exit) if exit else datetime.datetime.now()
+
+        minutes = max(0, int((exit_time - entry_time).total_seconds() // 60))
+        nights = max(0, (exit_time.date() - entry_time.date()).days)
+
+        vehicle = str(vehicle) if vehicle is not None else self.default_vehicle
+        key = (vehicle, category, minutes, nights)
+
+        with self.lock:
+            self.stats['quotes'] += 1
+            fee = self.cache.get(key)
+            if fee is not None:
+                self.stats['cache_hits'] += 1
+            else:
+                tariff = self.tariffs.get(vehicle) or self.tariffs.get(self.default_vehicle)
+                if tariff is None:
+                    raise ValueError("No tariff rules loaded")
+                fee = int(round(tariff.charge(minutes, nights) * self.category_factors.get(category, 1.0)))
+                if len(self.cache) >= self.cache_size:
+                    self.cache.clear()
+                self.cache[key] = fee
+
+        return {
+            'fee': fee,
+            'duration_minutes': minutes,
+            'nights': nights,
+            'vehicle': vehicle,
+            'category': category
+        }
+
+    def quote_bulk(self, entries, vehicles, exit=None, categories=None):
+        """
+        Quote many stays against one exit time (projection for active transactions)
+
+        Args:
+            entries (list): Entry times (ISO strings or datetime)
+            vehicles (list): id_kendaraan per entry
+            exit: Exit time for all entries (default: now)
+            categories (list, optional): kategori per entry
+
+        Returns:
+            dict: count, skipped (unparsable entry times), total_fee, total_overnight_fee,
+                  overnight_count, by_vehicle, plus per-entry fees, overnight_fees,
+                  duration_minutes, nights (for the entries that were quoted, in order)
+        """
+        exit_time = self._to_datetime(exit or datetime.datetime.now()).replace(microsecond=0)
+        with self.lock:
+            tariffs = self.tariffs
+            default_vehicle = self.default_vehicle
+        if not tariffs:
+            raise ValueError("No tariff rules loaded")
+
+        entries = list(entries)
+        vehicles = list(vehicles)[:len(entries)]
+        entries = entries[:len(vehicles)]
+        categories = list(categories)[:len(entries)] if categories else None
+
+        # Same parsing as quote(); a bad row is skipped instead of failing the batch
+        if NUMPY_AVAILABLE and entries:
+            result = self._quote_bulk_numpy(entries, vehicles, categories, exit_time,
+                                            tariffs, default_vehicle, self.category_factors)
+        else:
+            result = self._quote_bulk_python(entries, vehicles, categories, exit_time,
+                                             tariffs, default_vehicle, self.category_factors)
+        if result['skipped']:
+            logger.warning("Fee projection skipped {} entries with unparsable entry time".format(result['skipped']))
+
+        result.update({
+            'count': len(result['fees']),
+            'total_fee': sum(result['fees']),
+            'total_overnight_fee': sum(result['overnight_fees']),
+            'overnight_count': sum(1 for fee in result['overnight_fees'] if fee)
+        })
+        return result
+
+    @staticmethod
+    def _parse_times_numpy(entries):
+        """
+        datetime64[s] column, NaT for rows that can't be parsed. One NumPy parse
+        for the whole column; per-row _to_datetime only if that fails (timezone
+        suffixes, unknown formats)
+        """
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('error')  # NumPy warns on timezone suffixes
+                return np.array(entries, dtype='datetime64[s]')
+        except (ValueError, TypeError, Warning):
+            pass
+        parsed = []
+        for entry in entries:
+            try:
+                parsed.append(_to_datetime(entry).replace(microsecond=0))
+            except (AttributeError, TypeError, ValueError):
+                parsed.append(None)
+        return np.array(parsed, dtype='datetime64[s]')
+
+    @staticmethod
+    def _quote_bulk_numpy(entries, vehicles, categories, exit_time, tariffs, default_vehicle, category_factors):
+        """One vectorised pass per vehicle class"""
+        entry_ts = TariffEngine._parse_times_numpy(entries)
+        valid = ~np.isnat(entry_ts)
+        skipped = int(len(entry_ts) - np.count_nonzero(valid))
+        entry_ts = entry_ts[valid]
+        exit_ts = np.datetime64(exit_time, 's')
+
+        seconds = (exit_ts - entry_ts).astype(np.int64)
+        minutes = np.maximum(seconds // 60, 0)
+        nights = np.maximum((exit_ts.astype('datetime64[D]') - entry_ts.astype('datetime64[D]')).astype(np.int64), 0)
+
+        # Vehicle ids -> compiled class through a lookup table over the distinct ids
+        ids, id_codes = np.unique(np.asarray(vehicles, dtype=object)[valid].astype(str), return_inverse=True)
+        names, name_of_id = np.unique(
+            np.array([vid if vid in tariffs else default_vehicle for vid in ids.tolist()] or [default_vehicle]),
+            return_inverse=True)
+        codes = name_of_id[id_codes]
+
+        factor = np.ones(len(minutes))
+        if categories:
+            kinds, kind_codes = np.unique(np.asarray(categories, dtype=object)[valid].astype(str),
+                                          return_inverse=True)
+            factor = np.array([category_factors.get(kind, 1.0) for kind in kinds.tolist()])[kind_codes]
+
+        fees = np.zeros(len(minutes))
+        overnight = np.zeros(len(minutes))
+        for code, vehicle in enumerate(names.tolist()):
+            mask = codes == code
+            if mask.any():
+                fees[mask], overnight[mask] = tariffs[vehicle].charge_array(minutes[mask], nights[mask])
+
+        total = np.rint((fees + overnight) * factor).astype(np.int64)
+        counts = np.bincount(codes, minlength=len(names))
+        sums = np.bincount(codes, weights=total, minlength=len(names))
+        by_vehicle = dict((vehicle, {'count': int(counts[code]), 'fee': int(sums[code])})
+                          for code, vehicle in enumerate(names.tolist()) if counts[code])
+        return {
+            'fees': total.tolist(),
+            'overnight_fees': np.rint(overnight * factor).astype(np.int64).tolist(),
+            'duration_minutes': minutes.tolist(),
+            'nights': nights.tolist(),
+            'skipped': skipped,
+            'by_vehicle': by_vehicle
+        }
+
+    @staticmethod
+    def _quote_bulk_python(entries, vehicles, categories, exit_time, tariffs, default_vehicle, category_factors):
+        """Fallback tanpa NumPy"""
+        result = {'fees': [], 'overnight_fees': [], 'duration_minutes': [], 'nights': [],
+                  'skipped': 0, 'by_vehicle': {}}
+        for i, (entry, vehicle) in enumerate(zip(entries, vehicles)):
+            try:
+                entry_time = _to_datetime(entry).replace(microsecond=0)
+            except (AttributeError, TypeError, ValueError):
+                result['skipped'] += 1
+                continue
+            vehicle = str(vehicle) if str(vehicle) in tariffs else default_vehicle
+            factor = category_factors.get(str(categories[i]), 1.0) if categories else 1.0
+
+            minutes = max(0, int((exit_time - entry_time).total_seconds() // 60))
+            nights = max(0, (exit_time.date() - entry_time.date()).days)
+
+            tariff = tariffs[vehicle]
+            fee = int(round(tariff.charge(minutes, nights) * factor))
+            result['fees'].append(fee)
+            result['overnight_fees'].append(int(round(tariff.overnight(minutes, nights) * factor)))
+            result['duration_minutes'].append(minutes)
+            result['nights'].append(nights)
+            totals = result['by_vehicle'].setdefault(vehicle, {'count': 0, 'fee': 0})
+            totals['count'] += 1
+            totals['fee'] += fee
+        return result
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['vehicle_classes'] = sorted(self.tariffs)
+            stats['cached_quotes'] = len(self.cache)
+        return stats
+
+
+# Global tariff engine instance
+tariff_engine = TariffEngine(DEFAULT_TARIF_ROWS)
@@ -0,0 +1,380 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Durable Write-Behind Queue untuk Exit Gate System
+Exit decision di-commit ke append-only journal lokal (milidetik), lalu document
+save dan attachment upload di-drain oleh background thread dengan retry
+Compatible with Python 2.7 and 3.x
+"""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import os
+import io
+import json
+import time
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+OP_SAVE = 'save'
+OP_ATTACHMENT = 'attachment'
+
+class WriteBehindQueue(object):
+    """
+    Append-only journal + in-order drain worker
+
+    Journal lines are either an operation {"seq", "op", "doc_id", ...} or an
+    acknowledgement {"ack": seq}. Operations without an ack are replayed on
+    startup, so an operation is applied at least once; the apply callback must
+    be idempotent. Operations on the same doc_id are applied strictly in order;
+    a failing document is retried with backoff without blocking other documents.
+    An operation that fails permanently (or max_attempts times) is moved to the
+    dead-letter file and acknowledged, so it no longer holds up its document.
+    """
+
+    def __init__(self, journal_dir, apply_func, fsync=True, max_pending=500,
+                 retry_delay=1, max_retry_delay=60, compact_bytes=1024 * 1024,
+                 max_attempts=20, is_permanent=None):
+        """
+        Initialize write-behind queue
+
+        Args:
+            journal_dir (str): Directory for journal.log and attachment spool files
+            apply_func: Callback apply_func(entry, data) writing one operation to CouchDB;
+                        data is the attachment bytes for attachment operations
+            fsync (bool): fsync journal on every enqueue (default: True)
+            max_pending (int): Backlog size above which is_backlogged() is True (default: 500)
+            retry_delay (int): First retry delay in seconds (default: 1)
+            max_retry_delay (int): Max retry delay in seconds (default: 60)
+            compact_bytes (int): Rewrite journal when larger than this (default: 1 MB)
+            max_attempts (int): Failed attempts before an operation is dead-lettered (default: 20)
+            is_permanent: Optional is_permanent(error) -> bool; True dead-letters at once
+                          (e.g. a document rejected by validation)
+        """
+        self.journal_dir = journal_dir
+        self.journal_file = os.path.join(journal_dir, 'journal.log')
+        self.dead_letter_file = os.path.join(journal_dir, 'dead_letter.log')
+        self.spool_dir = os.path.join(journal_dir, 'spool')
+        self.apply_func = apply_func
+        self.fsync = fsync
+        self.max_pending = max_pending
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.compact_bytes = compact_bytes
+        self.max_attempts = max_attempts
+        self.is_permanent = is_permanent
+
+        self.pending = deque()  # Operations in journal order
+        self.pending_docs = {}  # doc_id -> latest queued document (read-your-writes overlay)
+        self.retry_at = {}  # doc_id -> (next attempt time, current delay, failed attempts)
+        self.dead_letters = deque(maxlen=100)  # Most recent dead-lettered operations
+        self.seq = 0
+        self.lock = threading.RLock()
+        self.wakeup = threading.Event()
+        self.journal = None
+
+        # Drain thread
+        self.drain_thread = None
+        self.stop_thread = False
+
+        self.stats = {
+            'enqueued': 0,
+            'completed': 0,
+            'retries': 0,
+            'dead_lettered': 0,
+            'replayed': 0,
+            'last_error': None,
+            'last_drain_ms': None
+        }
+
+        if not os.path.isdir(self.spool_dir):
+            os.makedirs(self.spool_dir)
+        self._recover()
+        self.journal = io.open(self.journal_file, 'ab')
+
+    # ============== JOURNAL ==============
+
+    def _recover(self):
+        """Load unacknowledged operations from the journal"""
+        if not os.path.exists(self.journal_file):
+            return
+
+        entries = {}
+        with io.open(self.journal_file, 'rb') as f:
+            for line in f:
+                try:
+                    record = json.loads(line.decode('utf-8'))
+                except ValueError:
+                    # Torn last line from a crash mid-append
+                    logger.warning("Skipping unreadable journal line")
+                    continue
+
+                if 'ack' in record:
+                    entries.pop(record['ack'], None)
+                else:
+                    entries[record['seq']] = record
+                    self.seq = max(self.seq, record['seq'])
+
+        for seq in sorted(entries):
+            self._track(entries[seq])
+
+        self.stats['replayed'] = len(entries)
+        if entries:
+            logger.info("Write-behind journal: replaying {} pending operations".format(len(entries)))
+        self._compact()
+
+    def _append(self, record):
+        """Append one record to the journal"""
+        self.journal.write((json.dumps(record, sort_keys=True) + '\n').encode('utf-8'))
+        self.journal.flush()
+        if self.fsync and 'ack' not in record:
+            os.fsync(self.journal.fileno())
+
+    def _compact(self):
+        """Rewrite journal with only pending operations (atomic replace)"""
+        tmp_file = self.journal_file + '.tmp'
+        with io.open(tmp_file, 'wb') as f:
+            for entry in self.pending:
+                f.write((json.dumps(entry, sort_keys=True) + '\n').encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+
+        if self.journal is not None:
+            self.journal.close()
+        try:
+            os.replace(tmp_file, self.journal_file)
+        except AttributeError:
+            # Python 2.7 has no os.replace; rename is atomic on POSIX
+            os.rename(tmp_file, self.journal_file)
+        if self.journal is not None:
+            self.journal = io.open(self.journal_file, 'ab')
+
+    def _spool_path(self, seq):
+        return os.path.join(self.spool_dir, '{:012d}.bin'.format(seq))
+
+    # ============== QUEUE ==============
+
+    def _track(self, entry):
+        self.pending.append(entry)
+        if entry['op'] == OP_SAVE:
+            self.pending_docs[entry['doc_id']] = entry['doc']
+
+    def enqueue_save(self, doc):
+        """
+        Journal a document save
+
+        Args:
+            doc (dict): Full document (with _id and the _rev it was read at)
+
+        Returns:
+            int: Operation sequence number
+        """
+        with self.lock:
+            self.seq += 1
+            entry = {'seq': self.seq, 'op': OP_SAVE, 'doc_id': doc['_id'],
+                     'doc': json.loads(json.dumps(doc)), 'queued_at': time.time()}
+            self._append(entry)
+            self._track(entry)
+            self.stats['enqueued'] += 1
+
+        self.wakeup.set()
+        return entry['seq']
+
+    def enqueue_attachment(self, doc_id, filename, data, content_type='image/jpeg'):
+        """
+        Journal an attachment upload; bytes go to a spool file, not into the journal
+
+        Returns:
+            int: Operation sequence number
+        """
+        with self.lock:
+            self.seq += 1
+            spool_file = self._spool_path(self.seq)
+            with io.open(spool_file, 'wb') as f:
+                f.write(data)
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            entry = {'seq': self.seq, 'op': OP_ATTACHMENT, 'doc_id': doc_id,
+                     'filename': filename, 'content_type': content_type,
+                     'spool_file': spool_file, 'queued_at': time.time()}
+            self._append(entry)
+            self._track(entry)
+            self.stats['enqueued'] += 1
+
+        self.wakeup.set()
+        return entry['seq']
+
+    def pending_doc(self, doc_id):
+        """Latest queued (not yet written) version of a document, or None"""
+        with self.lock:
+            return self.pending_docs.get(doc_id)
+
+    def depth(self):
+        with self.lock:
+            return len(self.pending)
+
+    def is_backlogged(self):
+        """True when the backlog exceeds max_pending (callers should write synchronously)"""
+        return self.depth() >= self.max_pending
+
+    # ============== DRAIN ==============
+
+    def start(self):
+        """Start background drain thread"""
+        if self.drain_thread and self.drain_thread.is_alive():
+            return
+
+        self.stop_thread = False
+        self.drain_thread = threading.Thread(target=self._drain_loop)
+        self.drain_thread.daemon = True
+        self.drain_thread.start()
+
+        logger.info("Write-behind queue started ({} pending)".format(self.depth()))
+
+    def stop(self, flush_timeout=5):
+        """
+        Stop drain thread after trying to flush the backlog
+
+        Args:
+            flush_timeout (float): Seconds to keep draining before giving up;
+                                   leftovers stay in the journal for the next start
+        """
+        deadline = time.time() + flush_timeout
+        while self.depth() and time.time() < deadline and self.drain_thread and self.drain_thread.is_alive():
+            self.wakeup.set()
+            time.sleep(0.05)
+
+        self.stop_thread = True
+        self.wakeup.set()
+        if self.drain_thread and self.drain_thread.is_alive():
+            self.drain_thread.join(timeout=2)
+
+        with self.lock:
+            if self.journal is not None:
+                self.journal.close()
+                self.journal = None
+
+        logger.info("Write-behind queue stopped ({} pending)".format(self.depth()))
+
+    def _next_ready(self):
+        """First operation whose document is not waiting for a retry (keeps per-doc order)"""
+        now = time.time()
+        blocked = set()
+        with self.lock:
+            for entry in self.pending:
+                doc_id = entry['doc_id']
+                if doc_id in blocked:
+                    continue
+                retry = self.retry_at.get(doc_id)
+                if retry and retry[0] > now:
+                    blocked.add(doc_id)
+                    continue
+                return entry
+        return None
+
+    def _drain_loop(self):
+        while not self.stop_thread:
+            entry = self._next_ready()
+            if entry is None:
+                self.wakeup.wait(0.5)
+                self.wakeup.clear()
+                continue
+
+            start_time = time.time()
+            try:
+                data = None
+                if entry['op'] == OP_ATTACHMENT:
+                    with io.open(entry['spool_file'], 'rb') as f:
+                        data = f.read()
+                self.apply_func(entry, data)
+            except Exception as e:
+                self._retry_later(entry, e)
+                continue
+
+            self.stats['last_drain_ms'] = (time.time() - start_time) * 1000
+            self._complete(entry)
+
+    def _retry_later(self, entry, error):
+        doc_id = entry['doc_id']
+        with self.lock:
+            _, delay, attempts = self.retry_at.get(doc_id, (0, 0, 0))
+            attempts += 1
+            self.stats['last_error'] = str(error)
+            permanent = self.is_permanent is not None and self.is_permanent(error)
+            if permanent or attempts >= self.max_attempts:
+                self._dead_letter(entry, error, attempts)
+                return
+            delay = min(delay * 2, self.max_retry_delay) if delay else self.retry_delay
+            self.retry_at[doc_id] = (time.time() + delay, delay, attempts)
+            self.stats['retries'] += 1
+
+        logger.warning("Write-behind {} for {} failed (retry in {}s): {}".format(
+            entry['op'], doc_id, delay, str(error)))
+
+    def _dead_letter(self, entry, error, attempts):
+        """Park an operation that cannot succeed in dead_letter.log and acknowledge it"""
+        record = dict(entry, error=str(error), attempts=attempts, failed_at=time.time())
+        with self.lock:
+            with io.open(self.dead_letter_file, 'ab') as f:
+                f.write((json.dumps(record, sort_keys=True) + '\n').encode('utf-8'))
+                f.flush()
+                os.fsync(f.fileno())
+            self.dead_letters.append(record)
+            self.stats['dead_lettered'] += 1
+            self._complete(entry, dead=True)
+
+        logger.error("Write-behind {} for {} dead-lettered after {} attempt(s): {}".format(
+            entry['op'], entry['doc_id'], attempts, str(error)))
+
+    def _complete(self, entry, dead=False):
+        """Acknowledge operation, drop spool file, compact journal when idle or large"""
+        with self.lock:
+            self.pending.remove(entry)
+            self.retry_at.pop(entry['doc_id'], None)
+            if not dead:
+                self.stats['completed'] += 1
+
+            if entry['op'] == OP_SAVE and not any(
+                    e['op'] == OP_SAVE and e['doc_id'] == entry['doc_id'] for e in self.pending):
+                self.pending_docs.pop(entry['doc_id'], None)
+
+            self._append({'ack': entry['seq']})
+
+            # A dead-lettered attachment keeps its spool file for manual recovery
+            if entry['op'] == OP_ATTACHMENT and not dead:
+                try:
+                    os.remove(entry['spool_file'])
+                except OSError:
+                    pass
+
+            if not self.pending or os.path.getsize(self.journal_file) > self.compact_bytes:
+                self._compact()
+
+    def get_stats(self):
+        """
+        Get queue statistics
+
+        Returns:
+            dict: Depth, oldest pending age, throughput and retry counters
+        """
+        with self.lock:
+            depth = len(self.pending)
+            oldest = self.pending[0]['queued_at'] if self.pending else None
+            stats = dict(self.stats)
+            retrying = len(self.retry_at)
+
+        stats.update({
+            'depth': depth,
+            'max_pending': self.max_pending,
+            'backlogged': depth >= self.max_pending,
+            'retrying_docs': retrying,
+            'oldest_pending_age_ms': round((time.time() - oldest) * 1000, 1) if oldest else 0,
+            'journal_bytes': os.path.getsize(self.journal_file) if os.path.exists(self.journal_file) else 0,
+            'running': bool(self.drain_thread and self.drain_thread.is_alive())
+        })
+        return stats
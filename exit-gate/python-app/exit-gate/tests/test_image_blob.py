@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test Image Blob
+Test untuk memverifikasi bytes tetap raw dan base64 hanya di boundary
+"""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import sys
+import os
+import base64
+
+# Add app directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+from image_blob import ImageBlob
+
+JPEG = b'\xff\xd8\xff\xe0fake-jpeg\xff\xd9'
+
+def test_raw_bytes_are_not_copied():
+    """Raw capture bytes are wrapped as-is"""
+    blob = ImageBlob.coerce(JPEG, camera='exit')
+    assert blob.data is JPEG
+    assert blob.content_type == 'image/jpeg'
+    assert ImageBlob.coerce(blob) is blob
+    assert ImageBlob.coerce(None) is None
+    assert ImageBlob.coerce(b'') is None
+
+def test_legacy_base64_input():
+    """Base64 strings and data URLs from older callers are decoded once"""
+    encoded = base64.b64encode(JPEG).decode('ascii')
+    assert ImageBlob.coerce(encoded).data == JPEG
+
+    png = ImageBlob.coerce('data:image/png;base64,' + encoded)
+    assert png.data == JPEG
+    assert png.content_type == 'image/png'
+
+def test_boundary_encoding():
+    """to_base64 / to_data_url round-trip"""
+    blob = ImageBlob(JPEG)
+    assert base64.b64decode(blob.to_base64()) == JPEG
+    assert blob.to_data_url().startswith('data:image/jpeg;base64,')
+    assert bytes(blob.view()) == JPEG
+    assert len(blob) == len(JPEG)
+
+if __name__ == "__main__":
+    test_raw_bytes_are_not_copied()
+    test_legacy_base64_input()
+    test_boundary_encoding()
+    print("✅ Image blob: PASSED")
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test In-Memory Database
+Test untuk memverifikasi view index (key/range/reduce), revisions dan attachments
+"""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import sys
+import os
+
+# Add app directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+from memory_db import MemoryDatabase, ResourceConflict, ResourceNotFound
+from member_views import MEMBER_VIEW_MAPS
+
+def _by_gate(doc):
+    if doc.get('waktu_keluar'):
+        yield [doc['waktu_keluar'][:10], doc['gate']], [1, doc['fee']]
+
+def _make_db():
+    db = MemoryDatabase()
+    db.register_design('members', MEMBER_VIEW_MAPS)
+    db.register_view('stats/by_gate', _by_gate, '_sum')
+    for i in range(6):
+        db.save({'_id': 'member_CARD{}'.format(i), 'type': 'member_entry', 'card_number': 'CARD{}'.format(i),
+                 'plat_nomor': 'B{}XY'.format(i), 'status': i % 2})
+    return db
+
+def test_key_and_range_queries():
+    """key, keys, startkey/endkey, descending, limit/skip, include_docs"""
+    db = _make_db()
+
+    rows = db.view('members/by_card_and_status', key=['CARD2', 0])
+    assert [row.id for row in rows] == ['member_CARD2']
+    assert db.view('members/by_card_and_status', key=['CARD2', 1]) == []
+
+    rows = db.view('members/active_members', keys=['CARD4', 'CARD1', 'CARD0'])
+    assert [row.key for row in rows] == ['CARD4', 'CARD0']
+
+    rows = db.view('members/by_card_number', startkey='CARD1', endkey='CARD3')
+    assert [row.key for row in rows] == ['CARD1', 'CARD2', 'CARD3']
+    rows = db.view('members/by_card_number', startkey='CARD1', endkey='CARD3', inclusive_end=False)
+    assert [row.key for row in rows] == ['CARD1', 'CARD2']
+    rows = db.view('members/by_card_number', startkey='CARD4', endkey='CARD2', descending=True)
+    assert [row.key for row in rows] == ['CARD4', 'CARD3', 'CARD2']
+    rows = db.view('members/by_card_number', skip=1, limit=2)
+    assert [row.key for row in rows] == ['CARD1', 'CARD2']
+
+    row = db.view('members/active_members', key='CARD2', include_docs=True)[0]
+    assert row.doc['plat_nomor'] == 'B2XY'
+
+    rows = db.view('_all_docs', keys=['member_CARD1', 'missing'], include_docs=True)
+    assert rows[0].doc['card_number'] == 'CARD1'
+    assert rows[1].error == 'not_found'
+
+def test_index_follows_writes():
+    """Updates and deletes move/remove index entries"""
+    db = _make_db()
+    doc = db['member_CARD2']
+    doc['status'] = 1
+    db.save(doc)
+    assert db.view('members/active_members', key='CARD2') == []
+    assert len(db.view('members/by_card_and_status', key=['CARD2', 1])) == 1
+
+    db.delete(db['member_CARD3'])
+    assert db.view('members/by_card_number', key='CARD3') == []
+    assert 'member_CARD3' not in db
+
+def test_reduce_group_level():
+    """_sum over array values, grouped by key prefix"""
+    db = MemoryDatabase()
+    db.register_view('stats/by_gate', _by_gate, '_sum')
+    for i, (day, gate, fee) in enumerate([('2024-01-01', 'G1', 5000), ('2024-01-01', 'G2', 3000),
+                                          ('2024-01-02', 'G1', 2000), ('2024-01-01', 'G1', 1000)]):
+        db.save({'_id': 't{}'.format(i), 'waktu_keluar': day + 'T10:00:00', 'gate': gate, 'fee': fee})
+
+    total = db.view('stats/by_gate', startkey=['2024-01-01'], endkey=['2024-01-01', {}])
+    assert [row.value for row in total] == [[3, 9000]]
+
+    rows = db.view('stats/by_gate', group_level=2)
+    assert [(row.key, row.value) for row in rows] == [
+        (['2024-01-01', 'G1'], [2, 6000]), (['2024-01-01', 'G2'], [1, 3000]), (['2024-01-02', 'G1'], [1, 2000])]
+
+    rows = db.view('stats/by_gate', reduce=False, key=['2024-01-02', 'G1'])
+    assert rows[0].id == 't2'
+
+def test_revisions_and_attachments():
+    """Stale _rev conflicts; put_attachment bumps the revision"""
+    db = MemoryDatabase()
+    doc = {'_id': 'transaction_1', 'status': 0}
+    db.save(doc)
+    stale = db['transaction_1']
+
+    db.put_attachment(doc, b'\xff\xd8jpeg\xff\xd9', filename='exit.jpg', content_type='image/jpeg')
+    assert doc['_rev'].startswith('2-')
+    assert db['transaction_1']['_attachments']['exit.jpg']['length'] == 8
+    assert db.get_attachment('transaction_1', 'exit.jpg').read() == b'\xff\xd8jpeg\xff\xd9'
+
+    try:
+        db.save(stale)
+        assert False, 'stale revision saved'
+    except ResourceConflict:
+        pass
+
+    try:
+        db.view('missing/view')
+        assert False, 'unknown view answered'
+    except ResourceNotFound:
+        pass
+
+if __name__ == "__main__":
+    test_key_and_range_queries()
+    test_index_follows_writes()
+    test_reduce_group_level()
+    test_revisions_and_attachments()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test Latency Metrics
+Test untuk memverifikasi span quantiles dan Prometheus output
+"""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import sys
+import os
+
+# Add app directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+from metrics import Metrics
+
+def test_quantiles():
+    """p50/p95/p99 over the rolling window"""
+    registry = Metrics(window=100)
+    for ms in range(1, 101):
+        registry.observe('db.lookup', ms / 1000.0)
+
+    stats = registry.get_stats()['db.lookup']
+    assert stats['count'] == 100
+    assert stats['p50_ms'] == 51.0
+    assert stats['p95_ms'] == 96.0
+    assert stats['p99_ms'] == 100.0
+
+def test_span_records_errors():
+    """Context manager and decorator both record, exceptions count as errors"""
+    registry = Metrics()
+
+    @registry.span('gate.open')
+    def fail():
+        raise IOError('relay')
+
+    with registry.span('gate.open'):
+        pass
+    try:
+        fail()
+    except IOError:
+        pass
+
+    stats = registry.get_stats()['gate.open']
+    assert stats['count'] == 2
+    assert stats['errors'] == 1
+
+def test_prometheus_format():
+    """Summary lines per span plus error counter"""
+    registry = Metrics(prefix='exit_gate')
+    registry.observe('exit.total', 0.25)
+
+    text = registry.render_prometheus()
+    assert '# TYPE exit_gate_span_duration_seconds summary' in text
+    assert 'exit_gate_span_duration_seconds{span="exit.total",quantile="0.99"} 0.250000' in text
+    assert 'exit_gate_span_duration_seconds_count{span="exit.total"} 1' in text
+    assert 'exit_gate_span_errors_total{span="exit.total"} 0' in text
+    print(text)
+
+if __name__ == "__main__":
+    test_quantiles()
+    test_span_records_errors()
+    test_prometheus_format()
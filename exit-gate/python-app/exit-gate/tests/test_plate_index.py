@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test Plate Index
+Test untuk memverifikasi fuzzy plate matching (OCR confusion map + edit distance)
+"""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import sys
+import os
+import time
+
+# Add app directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+from plate_index import PlateIndex, canonical_plate, edit_distance
+
+def _sample_docs():
+    return [
+        {'_id': 'transaction_1', 'type': 'parking_transaction', 'no_pol': 'B 1234 XY', 'status': 0},
+        {'_id': 'transaction_2', 'type': 'parking_transaction', 'no_pol': 'B5678AB', 'status': 1},
+        {'_id': 'member_CARD01', 'type': 'member_entry', 'plat_nomor': 'D4321ZZ', 'status': 0},
+        {'_id': 'transaction_3', 'type': 'parking_transaction', 'no_pol': 'F1111AA', 'status': 0},
+        {'_id': 'transaction_4', 'type': 'parking_transaction', 'no_pol': 'F1112AA', 'status': 0},
+    ]
+
+def test_ocr_confusions_and_edit_distance():
+    """0/O, 8/B fold onto one key; one substituted character is found"""
+    print("=== TEST FUZZY PLATE MATCH ===")
+
+    assert canonical_plate('b 1234-xy') == canonical_plate('81234XY')
+    assert edit_distance('B1234XY', 'B1234XV') == 1
+    assert edit_distance('B1234XY', 'B234XY') == 1
+
+    index = PlateIndex()
+    assert index.build_from_docs(_sample_docs()) == 4
+
+    assert index.resolve('B1234XY')[0] == 'transaction_1'
+    assert index.resolve('81234XY')[0] == 'transaction_1'   # OCR 8/B
+    assert index.resolve('B1234XV')[0] == 'transaction_1'   # one wrong character
+    assert index.resolve('B124XY')[0] == 'transaction_1'    # dropped character
+    assert index.resolve('D432122')[0] == 'member_CARD01'   # Z/2 twice
+    assert index.resolve('B5678AB') == (None, None)         # completed transaction
+    assert index.resolve('B9999QQ') == (None, None)
+
+    # F1113AA is one edit from both F1111AA and F1112AA - never guess between two cars
+    assert index.resolve('F1113AA') == (None, None)
+    assert [c['doc_id'] for c in index.search('F1113AA')] == ['transaction_3', 'transaction_4']
+    print("✅ Fuzzy plate match: PASSED")
+
+def test_live_updates():
+    """Exit removes the plate, re-entry adds it back"""
+    index = PlateIndex()
+    index.build_from_docs(_sample_docs())
+
+    index.update_doc('transaction_1', dict(_sample_docs()[0], status=1))
+    assert index.resolve('B1234XY') == (None, None)
+
+    index.update_doc('transaction_9', {'type': 'parking_transaction', 'no_pol': 'B1234XY', 'status': 0})
+    assert index.resolve('B1234XV')[0] == 'transaction_9'
+
+    index.update_doc('transaction_9', deleted=True)
+    assert index.search('B1234XY') == []
+
+def test_search_speed():
+    """Thousands of vehicles inside: a search stays well under a millisecond"""
+    index = PlateIndex()
+    letters = 'ACEFHJKMNPRTUVWXY'
+    docs = [{'_id': 'transaction_{}'.format(i), 'type': 'parking_transaction', 'status': 0,
+             'no_pol': 'B{}{}{}'.format(1000 + i, letters[i % 17], letters[(i // 17) % 17])}
+            for i in range(5000)]
+    index.build_from_docs(docs)
+
+    start = time.time()
+    for i in range(200):
+        index.search('B{}X'.format(1000 + i * 7))
+    per_search_ms = (time.time() - start) * 1000 / 200
+    print("Plate search: {:.3f}ms".format(per_search_ms))
+    assert per_search_ms < 1.0
+
+if __name__ == "__main__":
+    test_ocr_confusions_and_edit_distance()
+    test_live_updates()
+    test_search_speed()
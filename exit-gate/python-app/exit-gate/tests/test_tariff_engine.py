@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Test Tariff Engine
+Test untuk memverifikasi grace period, tarif progresif, maksimum harian dan inap
+"""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import sys
+import os
+import time
+import datetime
+
+# Add app directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+import tariff_engine as tariff_module
+from tariff_engine import TariffEngine, DEFAULT_TARIF_ROWS
+
+ENTRY = datetime.datetime(2024, 1, 1, 8, 0)
+
+def _fee(engine, minutes, vehicle='2', category=None):
+    return engine.quote(ENTRY, ENTRY + datetime.timedelta(minutes=minutes), vehicle, category)['fee']
+
+def test_default_hourly():
+    """Default rows: minimum 1 jam, every started hour after that"""
+    engine = TariffEngine(DEFAULT_TARIF_ROWS)
+    assert _fee(engine, 0, '1') == 5000
+    assert _fee(engine, 10, '1') == 5000
+    assert _fee(engine, 60, '1') == 5000
+    assert _fee(engine, 61, '1') == 10000
+    assert _fee(engine, 180, '3') == 45000
+    assert _fee(engine, 30, '99') == 5000  # Unknown vehicle -> default class
+
+def test_progressive_grace_and_daily_cap():
+    """tarif/tarif2 steps with waktu_gratis and maksimum per hari"""
+    engine = TariffEngine([{
+        'id_mobil': '2', 'tarif': 5000, 'waktu_tarif': 120, 'interval': 60, 'tarif_interval': 2000,
+        'tarif2': 4000, 'waktu2': 240, 'waktu_gratis': 5, 'maksimum': 30000, 'max_per_hari': 1
+    }])
+    assert _fee(engine, 5) == 0
+    assert _fee(engine, 6) == 5000
+    assert _fee(engine, 120) == 5000
+    assert _fee(engine, 180) == 7000
+    assert _fee(engine, 240) == 9000
+    assert _fee(engine, 300) == 13000
+    assert _fee(engine, 1439) == 30000
+    assert _fee(engine, 1440 + 90) == 35000
+
+def test_overnight_and_category():
+    """tarif_inap per midnight crossed, member factor applied last"""
+    engine = TariffEngine(
+        [{'id_mobil': '1', 'tarif': 2000, 'waktu_tarif': 60, 'interval': 60, 'maksimum': 10000,
+          'tarif_inap': 1, 'batas_inap_min': 120}],
+        [{'id_mobil': '1', 'tarif_member': 3000}],
+        category_factors={'member': 0.5}
+    )
+    late = datetime.datetime(2024, 1, 1, 23, 0)
+    assert engine.quote(late, late + datetime.timedelta(minutes=90), '1')['fee'] == 4000
+    quote = engine.quote(late, late + datetime.timedelta(hours=10), '1')
+    assert quote['nights'] == 1
+    assert quote['fee'] == 13000
+    assert engine.quote(late, late + datetime.timedelta(hours=10), '1', 'member')['fee'] == 6500
+
+def test_quote_cache():
+    """Identical (vehicle, kategori, minutes) quotes are served from cache"""
+    engine = TariffEngine(DEFAULT_TARIF_ROWS)
+    _fee(engine, 75)
+    _fee(engine, 75)
+    stats = engine.get_stats()
+    assert stats['quotes'] == 2
+    assert stats['cache_hits'] == 1
+
+    engine.load(DEFAULT_TARIF_ROWS)
+    assert engine.get_stats()['cached_quotes'] == 0
+
+def test_bulk_matches_quote():
+    """quote_bulk (NumPy and fallback) agrees with per-transaction quote()"""
+    engine = TariffEngine(
+        [{'id_mobil': '1', 'tarif': 2000, 'waktu_tarif': 60, 'interval': 30, 'tarif_interval': 1000,
+          'tarif2': 1500, 'waktu2': 180, 'waktu_gratis': 10, 'maksimum': 15000, 'max_per_hari': 1,
+          'tarif_inap': 1},
+         {'id_mobil': 'default', 'tarif': 5000, 'maksimum': 20000}],
+        [{'id_mobil': '1', 'tarif_member': 7000}]
+    )
+    exit_time = datetime.datetime(2024, 1, 3, 9, 30)
+    entries = [exit_time - datetime.timedelta(minutes=m) for m in (0, 5, 45, 200, 900, 1500, 3000)]
+    entries = [e.isoformat() for e in entries] + ['2024-01-01T07:00:00.123456Z']
+    vehicles = [1, '1', 2, 1, '1', 7, 1, 1]
+    expected = [engine.quote(e, exit_time, v)['fee'] for e, v in zip(entries, vehicles)]
+
+    numpy_available = tariff_module.NUMPY_AVAILABLE
+    try:
+        for use_numpy in set([numpy_available, False]):
+            tariff_module.NUMPY_AVAILABLE = use_numpy
+            result = engine.quote_bulk(entries, vehicles, exit_time)
+            assert result['fees'] == expected
+            assert result['total_fee'] == sum(expected)
+            assert result['overnight_count'] == 3
+            assert result['total_overnight_fee'] == 7000 + 14000 + 14000
+            assert result['by_vehicle']['default']['count'] == 2
+    finally:
+        tariff_module.NUMPY_AVAILABLE = numpy_available
+
+def test_bulk_timestamp_formats_and_bad_rows():
+    """Space separator / no seconds parse like quote(); an unparsable row is skipped, not fatal"""
+    engine = TariffEngine(DEFAULT_TARIF_ROWS)
+    exit_time = datetime.datetime(2024, 1, 1, 10, 30)
+    entries = ['2024-01-01 08:00:00', '2024-01-01T08:00', 'kemarin', None, '2024-01-01T09:45:00+07:00']
+    vehicles = [1, 2, 1, 1, 3]
+    expected = [engine.quote(entries[i], exit_time, vehicles[i])['fee'] for i in (0, 1, 4)]
+    assert expected == [15000, 30000, 15000]
+
+    numpy_available = tariff_module.NUMPY_AVAILABLE
+    try:
+        for use_numpy in set([numpy_available, False]):
+            tariff_module.NUMPY_AVAILABLE = use_numpy
+            result = engine.quote_bulk(entries, vehicles, exit_time)
+            assert result['fees'] == expected
+            assert result['count'] == 3
+            assert result['skipped'] == 2
+    finally:
+        tariff_module.NUMPY_AVAILABLE = numpy_available
+
+def _best_of(runs, func):
+    best = None
+    for _ in range(runs):
+        start = time.time()
+        func()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def test_bulk_faster_than_per_row_quote():
+    """The NumPy projection must beat a plain quote() loop (the reason it exists)"""
+    if not tariff_module.NUMPY_AVAILABLE:
+        print("NumPy not available - skipped")
+        return
+    engine = TariffEngine(DEFAULT_TARIF_ROWS)
+    exit_time = datetime.datetime(2024, 1, 3, 9, 30)
+    entries = [(exit_time - datetime.timedelta(minutes=(i * 37) % 5000)).isoformat() for i in range(10000)]
+    vehicles = [(1, '2', 3, 7)[i % 4] for i in range(10000)]
+    categories = [('member', None, 'umum')[i % 3] for i in range(10000)]
+
+    bulk = _best_of(3, lambda: engine.quote_bulk(entries, vehicles, exit_time, categories))
+    loop = _best_of(3, lambda: [engine.quote(e, exit_time, v, c) for e, v, c in zip(entries, vehicles, categories)])
+    print("quote_bulk: {:.1f}ms, quote() loop: {:.1f}ms".format(bulk * 1000, loop * 1000))
+    assert bulk * 2 < loop
+
+if __name__ == "__main__":
+    test_default_hourly()
+    test_progressive_grace_and_daily_cap()
+    test_overnight_and_category()
+    test_quote_cache()
+    test_bulk_matches_quote()
+    test_bulk_timestamp_formats_and_bad_rows()
+    test_bulk_faster_than_per_row_quote()
@@ -22,6 +22,7 @@ from config import Config
 from gpio import GPIOService
 from audio import AudioService
 from printer import PrinterService
+from protocol import PROTOCOL_VERSION, encode_message, decode_message, message_image
 
 logger = logging.getLogger(__name__)
 
@@ -36,6 +37,9 @@ class EntryGateController:
         self.client_id = self.config.get('WEBSOCKET', 'entry_gate_id', 'entry_gate_01')
         self.server_url = f"ws://{self.config.get('WEBSOCKET', 'server_host')}:{self.config.get('WEBSOCKET', 'server_port')}"
         
+        self.binary_frames = 0  # binary frame version agreed with the server (0: JSON + base64)
+        self.current_image = None  # entry image from the ALPR response, saved with the transaction
+        
         self.processing = False
         self.running = True
         
@@ -49,7 +53,8 @@ class EntryGateController:
             # Register with server
             await self.websocket.send(json.dumps({
                 'type': 'register',
-                'client_id': self.client_id
+                'client_id': self.client_id,
+                'binary_frames': PROTOCOL_VERSION
             }))
             
             logger.info(f"Connected to server at {self.server_url}")
@@ -60,11 +65,11 @@ class EntryGateController:
             self.websocket = None
             return False
     
-    async def send_message(self, message: dict):
-        """Send message to server"""
+    async def send_message(self, message: dict, image: bytes = None, image_field: str = 'entry_image'):
+        """Send message to server (with image as binary frame if negotiated)"""
         try:
             if self.websocket:
-                await self.websocket.send(json.dumps(message))
+                await self.websocket.send(encode_message(message, image, image_field, self.binary_frames))
         except Exception as e:
             logger.error(f"Failed to send message: {e}")
     
@@ -73,11 +78,13 @@ class EntryGateController:
         try:
             async for message in self.websocket:
                 try:
-                    data = json.loads(message)
+                    data = decode_message(message)
                     msg_type = data.get('type', '')
                     
                     if msg_type == 'welcome':
-                        logger.info(f"Server welcome: {data.get('message', '')}")
+                        self.binary_frames = data.get('binary_frames', 0)
+                        logger.info(f"Server welcome: {data.get('message', '')} "
+                                    f"({'binary frames' if self.binary_frames else 'JSON'})")
                     
                     elif msg_type == 'alpr_response':
                         await self.handle_alpr_response(data)
@@ -88,8 +95,8 @@ class EntryGateController:
                     elif msg_type == 'transaction_saved':
                         logger.info(f"Transaction saved: {data.get('transaction_id', '')}")
                     
-                except json.JSONDecodeError:
-                    logger.error("Invalid JSON received from server")
+                except ValueError as e:
+                    logger.error(f"Invalid message received from server: {e}")
                 except Exception as e:
                     logger.error(f"Error handling server message: {e}")
         
@@ -100,6 +107,8 @@ class EntryGateController:
     
     async def handle_alpr_response(self, data: dict):
         """Handle ALPR response from server"""
+        self.current_image = message_image(data, '_image_data')
+        
         if not data.get('success', False):
             logger.error(f"ALPR failed: {data.get('error', 'Unknown error')}")
             # Continue with non-member flow
@@ -160,7 +169,8 @@ class EntryGateController:
             await self.send_message({
                 'type': 'save_transaction',
                 'transaction_data': transaction_data
-            })
+            }, image=self.current_image)
+            self.current_image = None
             
             # Print entry ticket
             try:
@@ -202,7 +212,8 @@ class EntryGateController:
             await self.send_message({
                 'type': 'save_transaction',
                 'transaction_data': transaction_data
-            })
+            }, image=self.current_image)
+            self.current_image = None
             
             # Print entry ticket
             try:
@@ -5,10 +5,16 @@ import asyncio
 import websockets
 import json
 import logging
-from typing import Dict, Any, Set
+from typing import Dict, Any, Set, Union
 import threading
 import sys
 import os
+import time
+import itertools
+import collections
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 # Add shared directory to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'shared'))
@@ -17,9 +23,126 @@ from config import Config
 from database import DatabaseService
 from camera import CameraService
 from alpr.alpr_service import ALPRService
+from protocol import PROTOCOL_VERSION, encode_message, decode_message, message_image
 
 logger = logging.getLogger(__name__)
 
+# ALPR / camera instances of an ALPR worker process
+_worker_alpr = None
+_worker_camera = None
+
+def _init_alpr_worker(config_sections: Dict[str, Dict[str, str]]):
+    """Process pool initializer: load the ALPR model once per worker"""
+    global _worker_alpr, _worker_camera
+    config = Config()
+    config.config.read_dict(config_sections)
+    _worker_alpr = ALPRService(config)
+    _worker_camera = CameraService(config)
+
+def _process_image(image_data: bytes):
+    """Plate detection and resize for storage (runs in an ALPR worker process)"""
+    plate_data = None
+    if _worker_alpr.is_enabled():
+        plate_data = _worker_alpr.detect_plate_from_bytes(image_data)
+    return plate_data, _worker_camera.resize_image(image_data)
+
+def _alpr_worker_ready() -> int:
+    """No-op task used to start every ALPR worker (and load its model) up front"""
+    return os.getpid()
+
+# Broadcast types where only the latest message per gate matters; a queued one
+# is replaced by a newer one and dropped first when a client's queue is full
+COALESCE_TYPES = ('gate_status',)
+
+class ClientChannel:
+    """Bounded outbound queue of one client, drained by its own writer task"""
+    
+    def __init__(self, client_id: str, websocket, max_queue: int):
+        self.client_id = client_id
+        self.websocket = websocket
+        self.max_queue = max_queue
+        self.queue = collections.deque()  # (coalesce key or None, payload, enqueued at)
+        self.ready = asyncio.Event()
+        self.closed = False
+        self.binary = 0  # negotiated binary frame protocol version (0: JSON only)
+        self.stats = {
+            'sent': 0,
+            'coalesced': 0,
+            'dropped': 0,
+            'max_depth': 0,
+            'last_send_ms': None,
+            'max_send_ms': 0.0,
+            'last_queue_ms': None
+        }
+        self.writer = asyncio.ensure_future(self._drain())
+    
+    def put(self, payload: Union[str, bytes], coalesce_key=None) -> bool:
+        """
+        Queue a serialized message without waiting for the client
+        
+        Returns:
+            False if the queue is full of messages that must be delivered
+        """
+        if self.closed:
+            return False
+        now = time.monotonic()
+        
+        if coalesce_key is not None:
+            for i, item in enumerate(self.queue):
+                if item[0] == coalesce_key:
+                    self.queue[i] = (coalesce_key, payload, item[2])
+                    self.stats['coalesced'] += 1
+                    return True
+        
+        if len(self.queue) >= self.max_queue:
+            stale = next((i for i, item in enumerate(self.queue) if item[0] is not None), None)
+            if stale is None:
+                return False
+            del self.queue[stale]
+            self.stats['dropped'] += 1
+        
+        self.queue.append((coalesce_key, payload, now))
+        self.stats['max_depth'] = max(self.stats['max_depth'], len(self.queue))
+        self.ready.set()
+        return True
+    
+    async def _drain(self):
+        try:
+            while True:
+                while not self.queue:
+                    self.ready.clear()
+                    await self.ready.wait()
+                
+                _, payload, enqueued_at = self.queue.popleft()
+                start_time = time.monotonic()
+                await self.websocket.send(payload)
+                send_ms = round((time.monotonic() - start_time) * 1000, 1)
+                self.stats['sent'] += 1
+                self.stats['last_send_ms'] = send_ms
+                self.stats['max_send_ms'] = max(self.stats['max_send_ms'], send_ms)
+                self.stats['last_queue_ms'] = round((start_time - enqueued_at) * 1000, 1)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to send message to {self.client_id}: {e}")
+            await self.close()
+    
+    async def close(self):
+        """Stop queueing and close the connection (its handler unregisters the client)"""
+        self.closed = True
+        self.queue.clear()
+        await self.websocket.close()
+    
+    def stop(self):
+        self.closed = True
+        self.writer.cancel()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        stats['depth'] = len(self.queue)
+        stats['binary'] = self.binary
+        return stats
+
 class WebSocketServer:
     def __init__(self, config: Config):
         self.config = config
@@ -27,87 +150,148 @@ class WebSocketServer:
         self.camera = CameraService(config)
         self.alpr = ALPRService(config)
         
-        self.clients: Dict[str, websockets.WebSocketServerProtocol] = {}
+        self.clients: Dict[str, ClientChannel] = {}
         self.server = None
         
         host = config.get('WEBSOCKET', 'server_host', 'localhost')
         port = config.getint('WEBSOCKET', 'server_port', 8765)
         self.host = host
         self.port = port
+        
+        # Request handling: each message runs as its own task, at most
+        # client_concurrency at a time per client and client_max_pending queued
+        self.client_concurrency = config.getint('WEBSOCKET', 'client_concurrency', 2)
+        self.client_max_pending = config.getint('WEBSOCKET', 'client_max_pending', 8)
+        self.request_timeout = config.getfloat('WEBSOCKET', 'request_timeout', 10.0)
+        self.request_ids = itertools.count(1)
+        self.client_send_queue = config.getint('WEBSOCKET', 'client_send_queue', 64)
+        self.client_stats: Dict[str, Dict[str, Any]] = {}
+        
+        # message type -> (handler, response type)
+        self.handlers = {
+            'alpr_request': (self.handle_alpr_request, 'alpr_response'),
+            'save_transaction': (self.handle_save_transaction, 'transaction_saved'),
+            'member_lookup': (self.handle_member_lookup, 'member_lookup_response'),
+            'last_entry_lookup': (self.handle_last_entry_lookup, 'last_entry_response'),
+            'server_status': (self.handle_server_status, 'server_status_response'),
+        }
+        
+        # Blocking I/O (camera, CouchDB) runs in threads, ALPR + resize in worker processes
+        self.io_executor = ThreadPoolExecutor(
+            max_workers=config.getint('WEBSOCKET', 'io_workers', 8),
+            thread_name_prefix='ws-io'
+        )
+        self.alpr_executor = None
+        self.alpr_processes = config.getint('WEBSOCKET', 'alpr_processes', 2)
+        if self.alpr_processes > 0:
+            config_sections = {section: dict(config.config[section]) for section in config.config.sections()}
+            self.alpr_executor = ProcessPoolExecutor(
+                max_workers=self.alpr_processes,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_alpr_worker,
+                initargs=(config_sections,)
+            )
     
-    async def register_client(self, websocket, client_id: str):
-        """Register a new client"""
-        self.clients[client_id] = websocket
-        logger.info(f"Client registered: {client_id}")
+    async def register_client(self, websocket, client_id: str, binary_frames: int = 0):
+        """Register a new client (binary_frames: highest binary frame version it supports)"""
+        previous = self.clients.get(client_id)
+        if previous:
+            previous.stop()
+        channel = ClientChannel(client_id, websocket, self.client_send_queue)
+        channel.binary = min(binary_frames or 0, PROTOCOL_VERSION)
+        self.clients[client_id] = channel
+        logger.info(f"Client registered: {client_id} ({'binary frames v' + str(channel.binary) if channel.binary else 'JSON'})")
         
         # Send welcome message
         await self.send_to_client(client_id, {
             'type': 'welcome',
             'message': 'Connected to parking server',
-            'client_id': client_id
+            'client_id': client_id,
+            'binary_frames': channel.binary
         })
     
-    async def unregister_client(self, client_id: str):
-        """Unregister a client"""
-        if client_id in self.clients:
+    async def unregister_client(self, client_id: str, websocket=None):
+        """Unregister a client (only its own connection when websocket is given)"""
+        channel = self.clients.get(client_id)
+        if channel and (websocket is None or channel.websocket is websocket):
+            channel.stop()
             del self.clients[client_id]
             logger.info(f"Client unregistered: {client_id}")
     
-    async def send_to_client(self, client_id: str, message: Dict[str, Any]):
-        """Send message to specific client"""
-        if client_id in self.clients:
+    def _enqueue(self, channel: ClientChannel, payload: str, coalesce_key=None):
+        """Queue for one client; a client that cannot keep up is disconnected"""
+        if not channel.put(payload, coalesce_key) and not channel.closed:
+            logger.error(f"Send queue of {channel.client_id} full ({len(channel.queue)}), disconnecting slow client")
+            asyncio.ensure_future(channel.close())
+    
+    async def send_to_client(self, client_id: str, message: Dict[str, Any], image: bytes = None,
+                             image_field: str = '_image_data'):
+        """Send message to specific client (an image goes as binary frame if the client negotiated it)"""
+        channel = self.clients.get(client_id)
+        if channel:
+            self._enqueue(channel, encode_message(message, image, image_field, channel.binary))
+    
+    async def reply(self, client_id: str, request: Dict[str, Any], response: Dict[str, Any],
+                    image: bytes = None):
+        """Send the response to a request, tagged with the request id"""
+        response['request_id'] = request.get('request_id')
+        await self.send_to_client(client_id, response, image)
+    
+    async def run_blocking(self, func, *args):
+        """Run blocking I/O in the I/O thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.io_executor, func, *args)
+    
+    def _process_image_local(self, image_data: bytes):
+        """Plate detection and resize with the server's own ALPR instance"""
+        plate_data = None
+        if self.alpr.is_enabled():
+            plate_data = self.alpr.detect_plate_from_bytes(image_data)
+        return plate_data, self.camera.resize_image(image_data)
+    
+    async def process_image(self, image_data: bytes):
+        """Plate detection and resize off the event loop: (plate_data, resized_image)"""
+        loop = asyncio.get_running_loop()
+        if self.alpr_executor:
             try:
-                await self.clients[client_id].send(json.dumps(message))
-            except Exception as e:
-                logger.error(f"Failed to send message to {client_id}: {e}")
-                await self.unregister_client(client_id)
+                return await loop.run_in_executor(self.alpr_executor, _process_image, image_data)
+            except BrokenProcessPool:
+                logger.error("ALPR worker pool broken, processing in server threads")
+                self.alpr_executor = None
+        return await loop.run_in_executor(self.io_executor, self._process_image_local, image_data)
     
     async def broadcast(self, message: Dict[str, Any], exclude_client: str = None):
-        """Broadcast message to all clients"""
+        """Broadcast message to all clients (serialized once, queued per client)"""
         if not self.clients:
             return
         
-        disconnected_clients = []
-        for client_id, websocket in self.clients.items():
-            if client_id == exclude_client:
-                continue
-            
-            try:
-                await websocket.send(json.dumps(message))
-            except Exception as e:
-                logger.error(f"Failed to send broadcast to {client_id}: {e}")
-                disconnected_clients.append(client_id)
+        payload = json.dumps(message)
+        coalesce_key = None
+        if message.get('type') in COALESCE_TYPES:
+            coalesce_key = (message['type'], message.get('gate_id'))
         
-        # Remove disconnected clients
-        for client_id in disconnected_clients:
-            await self.unregister_client(client_id)
+        for client_id, channel in list(self.clients.items()):
+            if client_id != exclude_client:
+                self._enqueue(channel, payload, coalesce_key)
     
     async def handle_alpr_request(self, client_id: str, message: Dict[str, Any]):
         """Handle ALPR processing request"""
         try:
             # Get image from camera or use provided image data
-            image_data = None
-            if 'image_data' in message:
-                import base64
-                image_data = base64.b64decode(message['image_data'])
-            else:
-                image_data = self.camera.capture_image()
+            image_data = message_image(message, 'image_data')
+            if not image_data:
+                image_data = await self.run_blocking(self.camera.capture_image)
             
             if not image_data:
-                await self.send_to_client(client_id, {
+                await self.reply(client_id, message, {
                     'type': 'alpr_response',
                     'success': False,
                     'error': 'Failed to capture image'
                 })
                 return
             
-            # Process with ALPR if enabled
-            plate_data = None
-            if self.alpr.is_enabled():
-                plate_data = self.alpr.detect_plate_from_bytes(image_data)
-            
-            # Resize image for storage
-            resized_image = self.camera.resize_image(image_data)
+            # Process with ALPR if enabled and resize image for storage
+            plate_data, resized_image = await self.process_image(image_data)
             
             response = {
                 'type': 'alpr_response',
@@ -117,14 +301,12 @@ class WebSocketServer:
                 'alpr_enabled': self.alpr.is_enabled()
             }
             
-            # Store image data temporarily for transaction saving
-            response['_image_data'] = resized_image
-            
-            await self.send_to_client(client_id, response)
+            # Image goes back to the gate (_image_data) for transaction saving
+            await self.reply(client_id, message, response, image=resized_image)
             
         except Exception as e:
             logger.error(f"Error processing ALPR request: {e}")
-            await self.send_to_client(client_id, {
+            await self.reply(client_id, message, {
                 'type': 'alpr_response',
                 'success': False,
                 'error': str(e)
@@ -134,11 +316,12 @@ class WebSocketServer:
         """Handle transaction save request"""
         try:
             transaction_data = message.get('transaction_data', {})
+            entry_image = message_image(message, 'entry_image')
             
             # Save transaction to database
-            doc_id = self.database.save_transaction(transaction_data)
+            doc_id = await self.run_blocking(self.database.save_transaction, transaction_data, entry_image)
             
-            await self.send_to_client(client_id, {
+            await self.reply(client_id, message, {
                 'type': 'transaction_saved',
                 'success': True,
                 'transaction_id': doc_id
@@ -153,7 +336,7 @@ class WebSocketServer:
             
         except Exception as e:
             logger.error(f"Error saving transaction: {e}")
-            await self.send_to_client(client_id, {
+            await self.reply(client_id, message, {
                 'type': 'transaction_saved',
                 'success': False,
                 'error': str(e)
@@ -163,9 +346,9 @@ class WebSocketServer:
         """Handle member lookup request"""
         try:
             plate_number = message.get('plate_number', '')
-            member = self.database.get_member_by_plate(plate_number)
+            member = await self.run_blocking(self.database.get_member_by_plate, plate_number)
             
-            await self.send_to_client(client_id, {
+            await self.reply(client_id, message, {
                 'type': 'member_lookup_response',
                 'success': True,
                 'member': member,
@@ -174,7 +357,7 @@ class WebSocketServer:
             
         except Exception as e:
             logger.error(f"Error looking up member: {e}")
-            await self.send_to_client(client_id, {
+            await self.reply(client_id, message, {
                 'type': 'member_lookup_response',
                 'success': False,
                 'error': str(e)
@@ -184,9 +367,9 @@ class WebSocketServer:
         """Handle last entry transaction lookup"""
         try:
             plate_number = message.get('plate_number', '')
-            transaction = self.database.get_last_entry_transaction(plate_number)
+            transaction = await self.run_blocking(self.database.get_last_entry_transaction, plate_number)
             
-            await self.send_to_client(client_id, {
+            await self.reply(client_id, message, {
                 'type': 'last_entry_response',
                 'success': True,
                 'transaction': transaction,
@@ -195,42 +378,113 @@ class WebSocketServer:
             
         except Exception as e:
             logger.error(f"Error looking up last entry: {e}")
-            await self.send_to_client(client_id, {
+            await self.reply(client_id, message, {
                 'type': 'last_entry_response',
                 'success': False,
                 'error': str(e)
             })
     
+    async def handle_server_status(self, client_id: str, message: Dict[str, Any]):
+        """Handle server status request"""
+        await self.reply(client_id, message, {
+            'type': 'server_status_response',
+            'success': True,
+            'stats': self.get_stats()
+        })
+    
+    def _stats_for(self, client_id: str) -> Dict[str, Any]:
+        return self.client_stats.setdefault(client_id or 'unregistered', {
+            'in_flight': 0,
+            'completed': 0,
+            'rejected': 0,
+            'timeouts': 0,
+            'last_latency_ms': None,
+            'max_latency_ms': 0.0
+        })
+    
+    async def _run_handler(self, client_id: str, message: Dict[str, Any], slots: asyncio.Semaphore):
+        handler = self.handlers[message['type']][0]
+        async with slots:
+            await handler(client_id, message)
+    
+    async def run_request(self, client_id: str, message: Dict[str, Any], slots: asyncio.Semaphore):
+        """Run one request within the client's concurrency limit and the request timeout"""
+        stats = self._stats_for(client_id)
+        stats['in_flight'] += 1
+        start_time = time.monotonic()
+        try:
+            await asyncio.wait_for(self._run_handler(client_id, message, slots), self.request_timeout)
+        except asyncio.TimeoutError:
+            stats['timeouts'] += 1
+            logger.error(f"Request {message['request_id']} ({message['type']}) from {client_id} timed out")
+            await self.reply(client_id, message, {
+                'type': self.handlers[message['type']][1],
+                'success': False,
+                'error': 'Request timed out'
+            })
+        except Exception as e:
+            logger.error(f"Error handling {message['type']} from {client_id}: {e}")
+        finally:
+            latency_ms = round((time.monotonic() - start_time) * 1000, 1)
+            stats['in_flight'] -= 1
+            stats['completed'] += 1
+            stats['last_latency_ms'] = latency_ms
+            stats['max_latency_ms'] = max(stats['max_latency_ms'], latency_ms)
+    
+    async def dispatch(self, client_id: str, message: Dict[str, Any], slots: asyncio.Semaphore, tasks: Set[asyncio.Task]):
+        """Start a request as its own task so the connection keeps reading"""
+        message.setdefault('request_id', next(self.request_ids))
+        if len(tasks) >= self.client_max_pending:
+            self._stats_for(client_id)['rejected'] += 1
+            logger.warning(f"Client {client_id} has {len(tasks)} pending requests, rejecting {message['type']}")
+            await self.reply(client_id, message, {
+                'type': self.handlers[message['type']][1],
+                'success': False,
+                'error': 'Server busy'
+            })
+            return
+        
+        task = asyncio.ensure_future(self.run_request(client_id, message, slots))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Server statistics"""
+        return {
+            'clients': {client_id: channel.get_stats() for client_id, channel in self.clients.items()},
+            'alpr_processes': self.alpr_processes if self.alpr_executor else 0,
+            'client_concurrency': self.client_concurrency,
+            'requests': {client_id: dict(stats) for client_id, stats in self.client_stats.items()}
+        }
+    
     async def handle_message(self, websocket, path):
         """Handle incoming WebSocket messages"""
         client_id = None
+        slots = asyncio.Semaphore(self.client_concurrency)
+        tasks: Set[asyncio.Task] = set()
         try:
             async for message in websocket:
                 try:
-                    data = json.loads(message)
+                    data = decode_message(message)
                     msg_type = data.get('type', '')
                     
                     if msg_type == 'register':
                         client_id = data.get('client_id', '')
-                        await self.register_client(websocket, client_id)
-                    
-                    elif msg_type == 'alpr_request':
-                        await self.handle_alpr_request(client_id, data)
-                    
-                    elif msg_type == 'save_transaction':
-                        await self.handle_save_transaction(client_id, data)
+                        await self.register_client(websocket, client_id, data.get('binary_frames', 0))
                     
-                    elif msg_type == 'member_lookup':
-                        await self.handle_member_lookup(client_id, data)
+                    elif msg_type in self.handlers:
+                        await self.dispatch(client_id, data, slots, tasks)
                     
-                    elif msg_type == 'last_entry_lookup':
-                        await self.handle_last_entry_lookup(client_id, data)
+                    elif msg_type == 'gate_status':
+                        # Relay to the other clients (admin / monitors)
+                        data.setdefault('gate_id', client_id)
+                        await self.broadcast(data, exclude_client=client_id)
                     
                     else:
                         logger.warning(f"Unknown message type: {msg_type}")
                 
-                except json.JSONDecodeError:
-                    logger.error("Invalid JSON received")
+                except ValueError as e:
+                    logger.error(f"Invalid message received: {e}")
                 except Exception as e:
                     logger.error(f"Error handling message: {e}")
         
@@ -239,12 +493,23 @@ class WebSocketServer:
         except Exception as e:
             logger.error(f"WebSocket error for client {client_id}: {e}")
         finally:
+            for task in list(tasks):
+                task.cancel()
             if client_id:
-                await self.unregister_client(client_id)
+                await self.unregister_client(client_id, websocket)
     
     async def start_server(self):
         """Start the WebSocket server"""
         try:
+            if self.alpr_executor:
+                # Workers start lazily; load the ALPR model in all of them before the first vehicle
+                loop = asyncio.get_running_loop()
+                pids = await asyncio.gather(*[
+                    loop.run_in_executor(self.alpr_executor, _alpr_worker_ready)
+                    for _ in range(self.alpr_processes)
+                ])
+                logger.info(f"ALPR worker processes ready: {sorted(set(pids))}")
+            
             self.server = await websockets.serve(
                 self.handle_message,
                 self.host,
@@ -257,6 +522,14 @@ class WebSocketServer:
         except Exception as e:
             logger.error(f"Failed to start WebSocket server: {e}")
             raise
+        finally:
+            self.shutdown()
+    
+    def shutdown(self):
+        """Stop the worker pools"""
+        self.io_executor.shutdown(wait=False)
+        if self.alpr_executor:
+            self.alpr_executor.shutdown(wait=False)
     
     def run(self):
         """Run the server"""
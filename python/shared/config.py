@@ -50,7 +50,13 @@ class Config:
             'server_host': 'localhost',
             'server_port': '8765',
             'entry_gate_id': 'entry_gate_01',
-            'exit_gate_id': 'exit_gate_01'
+            'exit_gate_id': 'exit_gate_01',
+            'io_workers': '8',
+            'alpr_processes': '2',
+            'client_concurrency': '2',
+            'client_max_pending': '8',
+            'request_timeout': '10.0',
+            'client_send_queue': '64'
         }
         
         self.config['AUDIO'] = {
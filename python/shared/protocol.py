@@ -0,0 +1,67 @@
+"""
+Gate <-> server websocket message protocol
+
+Text frames carry JSON messages (images base64 encoded, the original protocol).
+Binary frames, negotiated at register, carry one message with a raw JPEG:
+
+    1 byte   protocol version
+    4 bytes  header length (big endian)
+    header   JSON message, '_image_field' names the field the image belongs to
+    payload  raw image bytes
+"""
+import base64
+import json
+import struct
+from typing import Dict, Any, Optional, Union
+
+PROTOCOL_VERSION = 1
+
+_PREFIX = struct.Struct('!BI')
+
+def encode_frame(message: Dict[str, Any], image: bytes, image_field: str) -> bytes:
+    """Binary frame with the image as raw payload"""
+    header = dict(message)
+    header['_image_field'] = image_field
+    header_bytes = json.dumps(header).encode('utf-8')
+    return b''.join((_PREFIX.pack(PROTOCOL_VERSION, len(header_bytes)), header_bytes, image))
+
+def decode_frame(frame: bytes) -> Dict[str, Any]:
+    """Message of a binary frame, with the payload under its image field"""
+    if len(frame) < _PREFIX.size:
+        raise ValueError("Binary frame too short")
+    version, header_length = _PREFIX.unpack_from(frame)
+    if version != PROTOCOL_VERSION:
+        raise ValueError(f"Unsupported binary frame version {version}")
+
+    start = _PREFIX.size
+    view = memoryview(frame)
+    message = json.loads(bytes(view[start:start + header_length]))
+    message[message.pop('_image_field', 'image_data')] = bytes(view[start + header_length:])
+    return message
+
+def encode_message(message: Dict[str, Any], image: bytes = None, image_field: str = 'image_data',
+                   binary: int = 0) -> Union[str, bytes]:
+    """Websocket payload for a message, optionally with an image (binary frame if negotiated)"""
+    if image is None:
+        return json.dumps(message)
+    if binary:
+        return encode_frame(message, image, image_field)
+
+    message = dict(message)
+    message[image_field] = base64.b64encode(image).decode('ascii')
+    return json.dumps(message)
+
+def decode_message(raw: Union[str, bytes]) -> Dict[str, Any]:
+    """Message of a text (JSON) or binary frame"""
+    if isinstance(raw, (bytes, bytearray)):
+        return decode_frame(raw)
+    return json.loads(raw)
+
+def message_image(message: Dict[str, Any], image_field: str) -> Optional[bytes]:
+    """Image of a message: raw bytes from a binary frame or base64 from JSON"""
+    value = message.get(image_field)
+    if not value:
+        return None
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value)
+    return base64.b64decode(value)
@@ -5,6 +5,7 @@ Entry point for running the parking system
 
 import asyncio
 import logging
+import multiprocessing
 import sys
 import signal
 from pathlib import Path
@@ -13,21 +14,26 @@ from typing import Dict, Any
 # Add src to path for imports
 sys.path.append(str(Path(__file__).parent / "src"))
 
-from src.services.database import database_service
-from src.services.alpr import alpr_service
-from src.services.camera import camera_service
-from src.gates import create_gate
 from src.core.config import get_settings
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('parking_system.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+# Spawned ALPR pool workers re-run this module (as __mp_main__, or via cli.py);
+# only the original process creates the services and opens the log file
+if multiprocessing.current_process().name == "MainProcess":
+    from src.services.database import database_service
+    from src.services.alpr import alpr_service
+    from src.services.alpr_pool import alpr_pool
+    from src.services.camera import camera_service
+    from src.gates import create_gate
+
+    # Configure logging
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('parking_system.log'),
+            logging.StreamHandler(sys.stdout)
+        ]
+    )
 
 logger = logging.getLogger(__name__)
 
@@ -62,6 +68,14 @@ class ParkingSystemManager:
             except Exception as e:
                 logger.warning(f"⚠️ ALPR initialization failed, continuing without ALPR: {e}")
             
+            # ALPR worker processes (manless gates recognize plates in parallel)
+            if self.settings.alpr_pool_workers > 0:
+                try:
+                    alpr_pool.start()
+                    logger.info(f"✅ ALPR worker pool started ({self.settings.alpr_pool_workers} processes)")
+                except Exception as e:
+                    logger.warning(f"⚠️ ALPR worker pool failed to start, using in-process ALPR: {e}")
+            
             # Initialize camera service with fallback
             logger.info("📷 Initializing camera service...")
             try:
@@ -525,6 +539,17 @@ class ParkingSystemManager:
         except Exception as e:
             logger.error(f"❌ Error cleaning up camera service: {e}")
         
+        try:
+            alpr_pool.stop()
+        except Exception as e:
+            logger.error(f"❌ Error stopping ALPR worker pool: {e}")
+        
+        try:
+            database_service.close()
+            logger.info("✅ Database service closed")
+        except Exception as e:
+            logger.error(f"❌ Error closing database service: {e}")
+        
         logger.info("✅ Python Parking System stopped")
     
     def get_gate(self, gate_id: str):
@@ -536,7 +561,9 @@ class ParkingSystemManager:
         gate_statuses = {}
         for gate_id, gate in self.gates.items():
             try:
-                gate_statuses[gate_id] = gate.get_status().__dict__
+                gate_statuses[gate_id] = dict(gate.get_status().__dict__)
+                if hasattr(gate, "get_detection_stats"):
+                    gate_statuses[gate_id]["detection"] = gate.get_detection_stats()
             except Exception as e:
                 gate_statuses[gate_id] = {"error": str(e)}
         
@@ -545,6 +572,7 @@ class ParkingSystemManager:
             "gates": gate_statuses,
             "database": database_service.get_connection_status(),
             "alpr": alpr_service.get_status(),
+            "alpr_pool": alpr_pool.get_stats(),
             "cameras": camera_service.get_camera_status()
         }
 
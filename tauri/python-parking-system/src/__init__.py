@@ -2,8 +2,16 @@
 Main src module initialization
 """
 
+import importlib
+
 from . import core
-from . import services
-from . import gates
 
 __all__ = ["core", "services", "gates"]
+
+
+def __getattr__(name: str):
+    # services / gates are imported on first use: importing them connects the
+    # database, which spawned ALPR pool workers must not do
+    if name in ("services", "gates"):
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
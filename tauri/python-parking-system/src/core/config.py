@@ -28,6 +28,11 @@ class Settings(BaseSettings):
     couchdb_username: Optional[str] = "admin"
     couchdb_password: Optional[str] = "password"
     couchdb_database: str = "parking_system"
+    local_store_path: str = "parking_data.db"  # SQLite fallback when CouchDB is unavailable
+    local_store_log_retention: int = 1000
+    activity_log_batch_size: int = 100  # logs per _bulk_docs request
+    activity_log_flush_interval: float = 1.0  # seconds
+    activity_log_max_queue: int = 10000  # buffered logs beyond this are dropped
     
     # Camera Configuration
     camera_source: int = 0  # Camera index or IP camera URL
@@ -37,17 +42,43 @@ class Settings(BaseSettings):
     default_camera_timeout: int = 5
     camera_retry_attempts: int = 3
     
+    # Continuous frame grabber (ring buffer per camera)
+    frame_grabber_enabled: bool = False
+    frame_grabber_buffer_size: int = 8
+    frame_grabber_interval: float = 0.2  # seconds between snapshot polls / USB reads
+    frame_grabber_max_age: float = 1.0  # buffered frames older than this are ignored
+    frame_grabber_fake: bool = False  # synthetic frames for testing without cameras
+    
     # ALPR Configuration
     alpr_detector_model: str = "yolo-v9-t-384-license-plate-end2end"
     alpr_ocr_model: str = "global-plates-mobile-vit-v2-model"
     alpr_detector_path: str = "./models/yolo-v9-t-384-license-plate-end2end.pt"
     alpr_ocr_path: str = "./models/global-plates-mobile-vit-v2-model.pt" 
     alpr_confidence_threshold: float = 0.5
+    alpr_reduced_decode: bool = False  # decode camera JPEGs at 1/2 resolution
+    alpr_cascade: bool = True  # detect on a downscaled frame, OCR full resolution crops
+    alpr_cascade_width: int = 960  # frame width for the detection stage
+    alpr_pool_workers: int = 0  # ALPR worker processes for the manless gates (0 = in-process)
+    alpr_pool_max_pending: int = 16  # queued frames before new ones are dropped
+    alpr_pool_deadline: float = 2.0  # seconds a frame may wait + run before it is discarded
     
     # Automatic Detection Configuration (for manless gates)
     auto_scan_interval: int = 2
     vehicle_detection_threshold: float = 0.7
     auto_gate_timeout: int = 10
+    motion_gate_enabled: bool = True  # only run ALPR when the plate camera ROI changes
+    motion_roi: str = "0,0,1,1"  # x1,y1,x2,y2 as fractions of the frame
+    motion_width: int = 160  # downscaled width used for frame differencing
+    motion_pixel_threshold: int = 25  # gray level change that counts a pixel as changed
+    motion_min_changed_ratio: float = 0.02  # fraction of ROI pixels that must change
+    motion_force_interval: float = 30.0  # run ALPR at least this often (seconds), 0 = never
+    plate_tracker_min_hits: int = 2  # agreeing reads before a vehicle is reported
+    plate_tracker_iou_threshold: float = 0.3  # box overlap that links reads to one vehicle
+    plate_tracker_max_age: float = 10.0  # seconds without a read before the vehicle is gone
+    plate_tracker_min_similarity: float = 0.75  # plate text similarity a read needs to join a vehicle's track
+    plate_tracker_emit_cooldown: float = 90.0  # seconds a reported plate is not reported again (> motion_force_interval)
+    plate_fuzzy_max_distance: int = 1  # edits (after OCR look-alike folding) tolerated at exit
+    plate_index_refresh_interval: float = 5.0  # seconds between background re-reads of the active plates
     
     # Gate Configuration
     gate_auto_close_timeout: int = 10
@@ -194,6 +194,8 @@ class ALPRResult(BaseModel):
     plate_number: str
     confidence: float
     processing_time: float
+    decode_time: Optional[float] = None  # seconds spent decoding the image
+    predict_time: Optional[float] = None  # seconds spent in detection + OCR
     image_base64: Optional[str] = None
     bbox: Optional[Dict[str, float]] = None
 
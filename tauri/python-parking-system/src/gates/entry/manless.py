@@ -9,10 +9,14 @@ import time
 from datetime import datetime
 from typing import Optional, Dict, Any, List
 import threading
+from functools import partial
 
 from ...services.database import database_service
 from ...services.alpr import alpr_service
+from ...services.alpr_pool import alpr_pool
 from ...services.camera import camera_service
+from ...services.motion import create_motion_detector
+from ...services.plate_tracker import create_plate_tracker
 from ...services.gate import GateService, create_gate_service
 from ...core.models import ParkingTransactionCreate, ALPRResult, SystemStatus
 
@@ -45,6 +49,13 @@ class ManlessEntryGate:
         self.auto_capture_interval = 5  # seconds
         self.detection_attempts = 3
         self.confidence_threshold = 0.8
+        self.follow_up_interval = 0.3  # seconds between consecutive reads of one vehicle
+        
+        # Motion gate: ALPR only runs when the plate camera scene changes
+        self.motion_detector = create_motion_detector()
+        
+        # Reads of one vehicle across frames -> one consensus plate, one event
+        self.plate_tracker = create_plate_tracker()
         
         # Threading
         self.processing_lock = threading.Lock()
@@ -193,32 +204,59 @@ class ManlessEntryGate:
             if not settings or not settings.plate_cam_type:
                 return
             
-            plate_capture = camera_service.capture_image(
+            # Raw JPEG / BGR frame, no base64 round trip
+            plate_frame = camera_service.capture_frame(
                 self.plate_camera_id,
                 settings.plate_cam_type
             )
             
-            if not plate_capture or not plate_capture.image_base64:
+            if plate_frame is None:
                 return
+            frame_time = time.time()
             
-            # Run ALPR detection
-            alpr_result = alpr_service.detect_plate(
-                plate_capture.image_base64,
-                self.plate_camera_id
-            )
+            # Skip ALPR on an unchanged lane (tracks only live on actual reads, so they still expire)
+            if self.motion_detector and not self.motion_detector.should_analyze(plate_frame):
+                return
             
-            if alpr_result and alpr_result.confidence >= self.confidence_threshold:
-                # Vehicle detected, process entry
-                self._process_detected_vehicle(alpr_result)
+            # Read consecutive frames until the tracker agrees on the vehicle's plate
+            attempts = 0
+            while plate_frame is not None:
+                attempts += 1
+                alpr_result = alpr_pool.detect_plate(
+                    plate_frame,
+                    self.plate_camera_id
+                )
+                
+                vehicle = self.plate_tracker.update(alpr_result, self.confidence_threshold) if alpr_result else None
+                if vehicle:
+                    # New vehicle detected (reported once per vehicle, unless it was not handled)
+                    if not self._process_detected_vehicle(vehicle, frame_time):
+                        self.plate_tracker.reopen(vehicle)
+                    return
+                
+                if attempts >= self.detection_attempts or not self.plate_tracker.has_pending():
+                    return
+                
+                time.sleep(self.follow_up_interval)
+                plate_frame = camera_service.capture_frame(
+                    self.plate_camera_id,
+                    settings.plate_cam_type
+                )
+                frame_time = time.time()
             
         except Exception as e:
             logger.error(f"Error checking for vehicles: {e}")
     
-    def _process_detected_vehicle(self, alpr_result: ALPRResult):
-        """Process detected vehicle"""
+    def _process_detected_vehicle(self, alpr_result: ALPRResult, detected_at: Optional[float] = None) -> bool:
+        """
+        Process detected vehicle (detected_at: time of the frame the plate was read from)
+        
+        Returns:
+            False if the vehicle was not handled (another vehicle in progress, error)
+        """
         with self.processing_lock:
             if self.is_processing:
-                return  # Already processing another vehicle
+                return False  # Already processing another vehicle
             
             self.is_processing = True
         
@@ -237,10 +275,10 @@ class ManlessEntryGate:
                     f"Vehicle {plate_number} already inside - ignoring",
                     "WARNING"
                 )
-                return
+                return True
             
-            # Capture all images
-            images = self.capture_images()
+            # Sharpest buffered frames around the detection
+            images = self.capture_images(around=detected_at)
             
             # Check membership
             is_member = database_service.check_membership(plate_number)
@@ -261,9 +299,11 @@ class ManlessEntryGate:
                         f"Non-member detected: {plate_number} - "
                         f"Manual intervention required"
                     )
+            return True
         
         except Exception as e:
             self._log_activity(f"Error processing detected vehicle: {e}", "ERROR")
+            return False
         
         finally:
             self.is_processing = False
@@ -415,35 +455,26 @@ class ManlessEntryGate:
                 "message": f"Manual gate operation failed: {str(e)}"
             }
     
-    def capture_images(self) -> Dict[str, Optional[str]]:
-        """Capture images from both cameras"""
+    def capture_images(self, around: Optional[float] = None) -> Dict[str, Optional[str]]:
+        """Capture images from both cameras (sharpest buffered frame around `around` if given)"""
         settings = database_service.get_gate_settings(self.gate_id)
         if not settings:
             return {"plate": None, "driver": None}
         
-        images = {}
-        
-        # Capture plate camera
+        cameras = {}
         if settings.plate_cam_type:
-            plate_capture = camera_service.capture_image(
-                self.plate_camera_id,
-                settings.plate_cam_type
-            )
-            images["plate"] = plate_capture.image_base64 if plate_capture else None
-        else:
-            images["plate"] = None
-        
-        # Capture driver camera
+            cameras["plate"] = (self.plate_camera_id, settings.plate_cam_type)
         if settings.driver_cam_type:
-            driver_capture = camera_service.capture_image(
-                self.driver_camera_id,
-                settings.driver_cam_type
-            )
-            images["driver"] = driver_capture.image_base64 if driver_capture else None
-        else:
-            images["driver"] = None
+            cameras["driver"] = (self.driver_camera_id, settings.driver_cam_type)
+        
+        # Both cameras at once (max, not sum, of their latencies)
+        captures = camera_service.capture_cameras(
+            cameras, capture=partial(camera_service.capture_sharpest, around=around))
         
-        return images
+        return {
+            "plate": captures["plate"].image_base64 if captures.get("plate") else None,
+            "driver": captures["driver"].image_base64 if captures.get("driver") else None
+        }
     
     def force_detection(self) -> Dict[str, Any]:
         """Force immediate ALPR detection"""
@@ -465,17 +496,17 @@ class ManlessEntryGate:
                         "message": "No plate camera configured"
                     }
                 
-                plate_capture = camera_service.capture_image(
+                plate_frame = camera_service.capture_frame(
                     self.plate_camera_id,
                     settings.plate_cam_type
                 )
                 
-                if not plate_capture:
+                if plate_frame is None:
                     continue
                 
                 # Run ALPR
-                result = alpr_service.detect_plate(
-                    plate_capture.image_base64,
+                result = alpr_pool.detect_plate(
+                    plate_frame,
                     self.plate_camera_id
                 )
                 
@@ -511,6 +542,14 @@ class ManlessEntryGate:
                 "message": f"Force detection failed: {str(e)}"
             }
     
+    def get_detection_stats(self) -> Dict[str, Any]:
+        """Frames skipped vs analyzed by the motion gate, plate tracker counters"""
+        stats = {"motion_gate": False}
+        if self.motion_detector:
+            stats = {"motion_gate": True, **self.motion_detector.get_stats()}
+        stats["plate_tracker"] = self.plate_tracker.get_stats()
+        return stats
+    
     def get_status(self) -> SystemStatus:
         """Get system status"""
         gate_status = self.gate_service.get_status() if self.gate_service else {}
@@ -9,10 +9,15 @@ import time
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any, List
 import threading
+from functools import partial
 
 from ...services.database import database_service
+from ...services.tariff import tariff_engine
 from ...services.alpr import alpr_service
+from ...services.alpr_pool import alpr_pool
 from ...services.camera import camera_service
+from ...services.motion import create_motion_detector
+from ...services.plate_tracker import create_plate_tracker
 from ...services.gate import GateService, create_gate_service
 from ...core.models import ParkingTransactionCreate, ALPRResult, SystemStatus
 
@@ -46,6 +51,13 @@ class ManlessExitGate:
         self.detection_attempts = 3
         self.confidence_threshold = 0.8
         self.processing_timeout = 30  # seconds
+        self.follow_up_interval = 0.3  # seconds between consecutive reads of one vehicle
+        
+        # Motion gate: ALPR only runs when the plate camera scene changes
+        self.motion_detector = create_motion_detector()
+        
+        # Reads of one vehicle across frames -> one consensus plate, one event
+        self.plate_tracker = create_plate_tracker()
         
         # Threading
         self.processing_lock = threading.Lock()
@@ -194,32 +206,60 @@ class ManlessExitGate:
             if not settings or not settings.plate_cam_type:
                 return
             
-            plate_capture = camera_service.capture_image(
+            # Raw JPEG / BGR frame, no base64 round trip
+            plate_frame = camera_service.capture_frame(
                 self.plate_camera_id,
                 settings.plate_cam_type
             )
             
-            if not plate_capture or not plate_capture.image_base64:
+            if plate_frame is None:
                 return
+            frame_time = time.time()
             
-            # Run ALPR detection
-            alpr_result = alpr_service.detect_plate(
-                plate_capture.image_base64,
-                self.plate_camera_id
-            )
+            # Skip ALPR on an unchanged lane (tracks only live on actual reads, so they still expire)
+            if self.motion_detector and not self.motion_detector.should_analyze(plate_frame):
+                return
             
-            if alpr_result and alpr_result.confidence >= self.confidence_threshold:
-                # Vehicle detected, process exit
-                self._process_detected_exit_vehicle(alpr_result)
+            # Read consecutive frames until the tracker agrees on the vehicle's plate
+            attempts = 0
+            while plate_frame is not None:
+                attempts += 1
+                alpr_result = alpr_pool.detect_plate(
+                    plate_frame,
+                    self.plate_camera_id
+                )
+                
+                vehicle = self.plate_tracker.update(alpr_result, self.confidence_threshold) if alpr_result else None
+                if vehicle:
+                    # New vehicle detected (reported once per vehicle, unless it was not handled)
+                    if not self._process_detected_exit_vehicle(vehicle, frame_time):
+                        self.plate_tracker.reopen(vehicle)
+                    return
+                
+                if attempts >= self.detection_attempts or not self.plate_tracker.has_pending():
+                    return
+                
+                time.sleep(self.follow_up_interval)
+                plate_frame = camera_service.capture_frame(
+                    self.plate_camera_id,
+                    settings.plate_cam_type
+                )
+                frame_time = time.time()
             
         except Exception as e:
             logger.error(f"Error checking for exit vehicles: {e}")
     
-    def _process_detected_exit_vehicle(self, alpr_result: ALPRResult):
-        """Process detected vehicle for exit"""
+    def _process_detected_exit_vehicle(self, alpr_result: ALPRResult, detected_at: Optional[float] = None) -> bool:
+        """
+        Process detected vehicle for exit (detected_at: time of the frame the plate was read from)
+        
+        Returns:
+            False if the vehicle was not handled (another vehicle in progress,
+            no active transaction found, error)
+        """
         with self.processing_lock:
             if self.is_processing:
-                return  # Already processing another vehicle
+                return False  # Already processing another vehicle
             
             self.is_processing = True
         
@@ -231,18 +271,18 @@ class ManlessExitGate:
                 f"(confidence: {alpr_result.confidence:.2f})"
             )
             
-            # Find active transaction
-            transaction = database_service.find_transaction_by_plate(plate_number, status=0)
+            # Find active transaction (tolerates an OCR misread)
+            transaction = database_service.find_transaction_by_plate(plate_number, status=0, fuzzy=True)
             
             if not transaction:
                 self._log_activity(
                     f"No active transaction found for {plate_number} - ignoring",
                     "WARNING"
                 )
-                return
+                return False
             
-            # Capture all images
-            images = self.capture_images()
+            # Sharpest buffered frames around the detection
+            images = self.capture_images(around=detected_at)
             
             # Check if it's a member (automatic processing)
             is_member = transaction.kategori == "member"
@@ -264,9 +304,11 @@ class ManlessExitGate:
                         f"Non-member exit processed: {plate_number} - "
                         f"Payment verification required"
                     )
+            return True
         
         except Exception as e:
             self._log_activity(f"Error processing detected exit vehicle: {e}", "ERROR")
+            return False
         
         finally:
             self.is_processing = False
@@ -541,24 +583,8 @@ class ManlessExitGate:
                 minutes = duration_minutes % 60
                 duration_text = f"{hours} jam {minutes} menit"
             
-            # Calculate fee based on vehicle type and duration
-            fee = 0
-            
-            # Get vehicle type tariff
-            vehicle_type = database_service.get_vehicle_type(transaction.id_kendaraan)
-            if vehicle_type:
-                base_fee = vehicle_type.get("tarif_per_jam", 5000)
-                
-                # Minimum 1 hour billing
-                billable_hours = max(1, int(duration_hours) + (1 if duration_minutes % 60 > 0 else 0))
-                fee = base_fee * billable_hours
-            else:
-                # Default fee calculation
-                fee = 5000 * max(1, int(duration_hours) + (1 if duration_minutes % 60 > 0 else 0))
-            
-            # Member discount
-            if transaction.kategori == "member":
-                fee = int(fee * 0.8)  # 20% discount for members
+            # Fee from the shared tariff engine (vehicle class + kategori, member discount included)
+            fee = tariff_engine.quote(entry_time, exit_time, transaction.id_kendaraan, transaction.kategori)["fee"]
             
             return {
                 "duration_minutes": duration_minutes,
@@ -578,35 +604,26 @@ class ManlessExitGate:
                 "billable_hours": 1
             }
     
-    def capture_images(self) -> Dict[str, Optional[str]]:
-        """Capture images from both cameras"""
+    def capture_images(self, around: Optional[float] = None) -> Dict[str, Optional[str]]:
+        """Capture images from both cameras (sharpest buffered frame around `around` if given)"""
         settings = database_service.get_gate_settings(self.gate_id)
         if not settings:
             return {"plate": None, "driver": None}
         
-        images = {}
-        
-        # Capture plate camera
+        cameras = {}
         if settings.plate_cam_type:
-            plate_capture = camera_service.capture_image(
-                self.plate_camera_id,
-                settings.plate_cam_type
-            )
-            images["plate"] = plate_capture.image_base64 if plate_capture else None
-        else:
-            images["plate"] = None
-        
-        # Capture driver camera
+            cameras["plate"] = (self.plate_camera_id, settings.plate_cam_type)
         if settings.driver_cam_type:
-            driver_capture = camera_service.capture_image(
-                self.driver_camera_id,
-                settings.driver_cam_type
-            )
-            images["driver"] = driver_capture.image_base64 if driver_capture else None
-        else:
-            images["driver"] = None
+            cameras["driver"] = (self.driver_camera_id, settings.driver_cam_type)
+        
+        # Both cameras at once (max, not sum, of their latencies)
+        captures = camera_service.capture_cameras(
+            cameras, capture=partial(camera_service.capture_sharpest, around=around))
         
-        return images
+        return {
+            "plate": captures["plate"].image_base64 if captures.get("plate") else None,
+            "driver": captures["driver"].image_base64 if captures.get("driver") else None
+        }
     
     def force_detection(self) -> Dict[str, Any]:
         """Force immediate ALPR detection for exit"""
@@ -628,17 +645,17 @@ class ManlessExitGate:
                         "message": "No plate camera configured"
                     }
                 
-                plate_capture = camera_service.capture_image(
+                plate_frame = camera_service.capture_frame(
                     self.plate_camera_id,
                     settings.plate_cam_type
                 )
                 
-                if not plate_capture:
+                if plate_frame is None:
                     continue
                 
                 # Run ALPR
-                result = alpr_service.detect_plate(
-                    plate_capture.image_base64,
+                result = alpr_pool.detect_plate(
+                    plate_frame,
                     self.plate_camera_id
                 )
                 
@@ -674,6 +691,14 @@ class ManlessExitGate:
                 "message": f"Force detection failed: {str(e)}"
             }
     
+    def get_detection_stats(self) -> Dict[str, Any]:
+        """Frames skipped vs analyzed by the motion gate, plate tracker counters"""
+        stats = {"motion_gate": False}
+        if self.motion_detector:
+            stats = {"motion_gate": True, **self.motion_detector.get_stats()}
+        stats["plate_tracker"] = self.plate_tracker.get_stats()
+        return stats
+    
     def get_status(self) -> SystemStatus:
         """Get system status"""
         gate_status = self.gate_service.get_status() if self.gate_service else {}
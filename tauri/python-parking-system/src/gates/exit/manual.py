@@ -11,6 +11,7 @@ from typing import Optional, Dict, Any, List
 import threading
 
 from ...services.database import database_service
+from ...services.tariff import tariff_engine
 from ...services.alpr import alpr_service
 from ...services.camera import camera_service
 from ...services.gate import GateService, create_gate_service
@@ -246,8 +247,8 @@ class ManualExitGate:
         try:
             self._log_activity(f"Exit processing started by {operator_id} for plate: {plate_number}")
             
-            # Find active transaction by plate
-            transaction = database_service.find_transaction_by_plate(plate_number, status=0)
+            # Find active transaction by plate (tolerates an OCR misread / typo)
+            transaction = database_service.find_transaction_by_plate(plate_number, status=0, fuzzy=True)
             
             if not transaction:
                 return {
@@ -380,24 +381,8 @@ class ManualExitGate:
                 minutes = duration_minutes % 60
                 duration_text = f"{hours} jam {minutes} menit"
             
-            # Calculate fee based on vehicle type and duration
-            fee = 0
-            
-            # Get vehicle type tariff
-            vehicle_type = database_service.get_vehicle_type(transaction.id_kendaraan)
-            if vehicle_type:
-                base_fee = vehicle_type.get("tarif_per_jam", 5000)
-                
-                # Minimum 1 hour billing
-                billable_hours = max(1, int(duration_hours) + (1 if duration_minutes % 60 > 0 else 0))
-                fee = base_fee * billable_hours
-            else:
-                # Default fee calculation
-                fee = 5000 * max(1, int(duration_hours) + (1 if duration_minutes % 60 > 0 else 0))
-            
-            # Member discount
-            if transaction.kategori == "member":
-                fee = int(fee * 0.8)  # 20% discount for members
+            # Fee from the shared tariff engine (vehicle class + kategori, member discount included)
+            fee = tariff_engine.quote(entry_time, exit_time, transaction.id_kendaraan, transaction.kategori)["fee"]
             
             return {
                 "duration_minutes": duration_minutes,
@@ -467,6 +452,12 @@ class ManualExitGate:
                 transaction = database_service.find_transaction_by_plate(query, status=0)
                 if transaction and transaction not in transactions:
                     transactions.append(transaction)
+                elif not transaction:
+                    # Misread / partial plate: close matches, best first
+                    for candidate in database_service.find_plate_candidates(query):
+                        transaction = database_service.find_transaction_by_id(candidate["id"])
+                        if transaction and transaction.status == 0:
+                            transactions.append(transaction)
             
             # Convert to response format
             results = []
@@ -2,9 +2,21 @@
 Services module initialization
 """
 
-from .database import database_service
-from .alpr import alpr_service  
-from .camera import camera_service
-from .gate import create_gate_service
+import importlib
 
 __all__ = ["database_service", "alpr_service", "camera_service", "create_gate_service"]
+
+# Imported on first use: importing a single service module (e.g. alpr_worker in
+# the ALPR pool processes) must not create the database or camera services
+_EXPORTS = {
+    "database_service": ".database",
+    "alpr_service": ".alpr",
+    "camera_service": ".camera",
+    "create_gate_service": ".gate",
+}
+
+
+def __getattr__(name: str):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
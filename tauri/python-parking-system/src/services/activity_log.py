@@ -0,0 +1,151 @@
+"""
+Activity log sink - buffers log events in memory and writes them in batches
+(CouchDB _bulk_docs / one local store transaction) on size or time thresholds
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ActivityLogSink:
+    """Bounded in-memory buffer flushed by a background thread"""
+
+    def __init__(self, write_batch: Callable[[List[Dict[str, Any]]], Optional[List[Dict[str, Any]]]],
+                 batch_size: int = 100, flush_interval: float = 1.0, max_queue: int = 10000,
+                 retry_delay: float = 5.0, max_attempts: int = 5):
+        """
+        Args:
+            write_batch: Writes a list of log documents in one request; raises if the
+                request failed, returns the documents that were individually rejected
+            batch_size: Flush as soon as this many events are buffered
+            flush_interval: Flush at least this often (seconds)
+            max_queue: Buffered events beyond this are dropped (oldest first)
+            retry_delay: Wait after a failed batch before trying again (seconds)
+            max_attempts: Give up on a rejected event after this many writes
+        """
+        self.write_batch = write_batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.retry_delay = retry_delay
+        self.max_attempts = max_attempts
+
+        self.queue: deque = deque()
+        self.condition = threading.Condition()
+        self.flush_lock = threading.Lock()
+        self.stop_thread = False
+        self.flush_thread = None
+        self.attempts: Dict[int, int] = {}  # id(doc) -> rejected writes so far
+
+        self.stats = {
+            "queued": 0,
+            "written": 0,
+            "batches": 0,
+            "failed_batches": 0,
+            "retried": 0,
+            "failed": 0,
+            "dropped": 0,
+        }
+
+    def start(self):
+        if self.flush_thread and self.flush_thread.is_alive():
+            return
+        self.stop_thread = False
+        self.flush_thread = threading.Thread(target=self._flush_loop, name="activity-log-sink", daemon=True)
+        self.flush_thread.start()
+
+    def stop(self, flush_timeout: float = 5.0):
+        """Stop the flush thread and write whatever is still buffered"""
+        with self.condition:
+            self.stop_thread = True
+            self.condition.notify()
+        if self.flush_thread:
+            self.flush_thread.join(flush_timeout)
+        self.flush()
+
+    def submit(self, doc: Dict[str, Any]):
+        """Buffer one log event (never blocks; oldest event dropped on overflow)"""
+        with self.condition:
+            if len(self.queue) >= self.max_queue:
+                self.attempts.pop(id(self.queue.popleft()), None)
+                self.stats["dropped"] += 1
+            self.queue.append(doc)
+            self.stats["queued"] += 1
+            if len(self.queue) >= self.batch_size:
+                self.condition.notify()
+
+    def pending(self) -> List[Dict[str, Any]]:
+        """Events not yet written (read-your-writes for get_activity_logs)"""
+        with self.condition:
+            return list(self.queue)
+
+    def flush(self) -> bool:
+        """
+        Write buffered events in batches of batch_size
+
+        Returns:
+            True if the buffer was drained, False if a batch failed or some of its
+            events were rejected (those events are kept for the next attempt)
+        """
+        with self.flush_lock:
+            while True:
+                with self.condition:
+                    batch = [self.queue[i] for i in range(min(self.batch_size, len(self.queue)))]
+                if not batch:
+                    return True
+
+                try:
+                    rejected = self.write_batch(batch) or []
+                except Exception as e:
+                    self.stats["failed_batches"] += 1
+                    logger.warning(f"Activity log batch of {len(batch)} failed, keeping it buffered: {e}")
+                    return False
+
+                with self.condition:
+                    # Only events that were written leave the buffer (overflow may have dropped some)
+                    in_batch = {id(doc) for doc in batch}
+                    retry_ids = {id(doc) for doc in rejected}
+                    retry = []
+                    while self.queue and id(self.queue[0]) in in_batch:
+                        doc = self.queue.popleft()
+                        if id(doc) not in retry_ids:
+                            self.attempts.pop(id(doc), None)
+                            continue
+                        attempts = self.attempts.get(id(doc), 0) + 1
+                        if attempts >= self.max_attempts:
+                            self.attempts.pop(id(doc), None)
+                            self.stats["failed"] += 1
+                            logger.error(f"Activity log {doc.get('_id')} rejected {attempts} times, giving up")
+                        else:
+                            self.attempts[id(doc)] = attempts
+                            retry.append(doc)
+                    # Rejected events go back to the front so they keep their order
+                    self.queue.extendleft(reversed(retry))
+                    self.stats["written"] += len(batch) - len(rejected)
+                    self.stats["retried"] += len(retry)
+                    self.stats["batches"] += 1
+
+                if retry:
+                    return False
+
+    def _flush_loop(self):
+        while True:
+            with self.condition:
+                if not self.stop_thread and len(self.queue) < self.batch_size:
+                    self.condition.wait(self.flush_interval)
+                if self.stop_thread:
+                    return
+
+            if not self.flush():
+                time.sleep(self.retry_delay)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.condition:
+            stats = dict(self.stats)
+            stats["buffered"] = len(self.queue)
+        return stats
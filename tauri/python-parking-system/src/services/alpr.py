@@ -5,24 +5,35 @@ ALPR Service using fast-alpr library
 import asyncio
 import logging
 import base64
-import io
 import time
-from typing import Optional, Dict, Any, List
-from PIL import Image
+from typing import Optional, Dict, Any, List, Tuple, Union
 import numpy as np
 import cv2
 from fast_alpr import ALPR
 
+from ..core.config import settings
 from ..core.models import ALPRResult
 
 logger = logging.getLogger(__name__)
 
+# Base64 / data URL string, raw JPEG bytes, or an already decoded BGR frame
+ImageInput = Union[str, bytes, bytearray, memoryview, np.ndarray]
+
 
 class ALPRService:
     """ALPR service using fast-alpr library"""
     
-    def __init__(self, confidence_threshold: float = 0.8):
+    def __init__(self, confidence_threshold: float = 0.8, reduced_decode: bool = False,
+                 cascade: bool = True, cascade_width: int = 960, prior_max_age: float = 5.0):
         self.confidence_threshold = confidence_threshold
+        self.reduced_decode = reduced_decode  # decode JPEGs at 1/2 size (bbox scaled back)
+        
+        # Cascade: boxes on a downscaled frame, OCR / CLAHE on full resolution crops
+        self.cascade = cascade
+        self.cascade_width = cascade_width
+        self.prior_max_age = prior_max_age
+        self.box_cache: Dict[str, Tuple[Tuple[int, int, int, int], float]] = {}  # camera_id -> (box, time)
+        self.cascade_stats = {"frames": 0, "prior_hits": 0, "full_detections": 0, "clahe_retries": 0}
         self.alpr = None
         self.is_initialized = False
         self.model_loaded = False
@@ -62,12 +73,16 @@ class ALPRService:
         """Check if ALPR service is ready"""
         return self.is_initialized and self.model_loaded
     
-    def detect_plate(self, image_data: str, camera_id: str = "unknown") -> Optional[ALPRResult]:
+    def use_cascade(self) -> bool:
+        """Cascade enabled and the fast-alpr build exposes its detector / OCR stages"""
+        return self.cascade and hasattr(self.alpr, "detector") and hasattr(self.alpr, "ocr")
+    
+    def detect_plate(self, image_data: ImageInput, camera_id: str = "unknown") -> Optional[ALPRResult]:
         """
-        Detect license plate from base64 image data
+        Detect license plate from an image
         
         Args:
-            image_data: Base64 encoded image string
+            image_data: Base64 string / data URL, raw JPEG bytes or a BGR frame
             camera_id: Identifier for the camera source
             
         Returns:
@@ -77,19 +92,24 @@ class ALPRService:
             logger.error("ALPR service not ready")
             return None
         
+        if self.use_cascade():
+            return self.detect_plate_cascade(image_data, camera_id)
+        
         try:
             start_time = time.time()
             
-            # Decode base64 image
-            image = self._decode_base64_image(image_data)
+            # Decode image
+            image, scale = self._decode_image(image_data)
             if image is None:
                 logger.error("Failed to decode image data")
                 return None
+            decode_time = time.time() - start_time
             
             # Run ALPR detection
             results = self.alpr.predict(image)
             
             processing_time = time.time() - start_time
+            predict_time = processing_time - decode_time
             
             if not results or len(results) == 0:
                 logger.debug(f"No plates detected in image from {camera_id}")
@@ -102,26 +122,18 @@ class ALPRService:
                 logger.debug(f"Plate detected but confidence too low: {best_result.confidence}")
                 return None
             
-            # Extract bounding box if available
-            bbox = None
-            if hasattr(best_result, 'bbox') and best_result.bbox:
-                bbox = {
-                    "x1": float(best_result.bbox[0]),
-                    "y1": float(best_result.bbox[1]), 
-                    "x2": float(best_result.bbox[2]),
-                    "y2": float(best_result.bbox[3])
-                }
-            
             alpr_result = ALPRResult(
                 plate_number=best_result.text.upper().strip(),
                 confidence=float(best_result.confidence),
                 processing_time=processing_time,
-                bbox=bbox
+                decode_time=decode_time,
+                predict_time=predict_time,
+                bbox=self._extract_bbox(best_result, scale)
             )
             
             logger.info(f"Plate detected: {alpr_result.plate_number} "
                        f"(confidence: {alpr_result.confidence:.2f}, "
-                       f"time: {processing_time:.2f}s)")
+                       f"time: {processing_time:.2f}s, decode: {decode_time * 1000:.1f}ms)")
             
             return alpr_result
             
@@ -129,12 +141,12 @@ class ALPRService:
             logger.error(f"ALPR detection failed: {e}")
             return None
     
-    def detect_multiple_plates(self, image_data: str, camera_id: str = "unknown") -> List[ALPRResult]:
+    def detect_multiple_plates(self, image_data: ImageInput, camera_id: str = "unknown") -> List[ALPRResult]:
         """
         Detect multiple license plates from image
         
         Args:
-            image_data: Base64 encoded image string
+            image_data: Base64 string / data URL, raw JPEG bytes or a BGR frame
             camera_id: Identifier for the camera source
             
         Returns:
@@ -147,16 +159,18 @@ class ALPRService:
         try:
             start_time = time.time()
             
-            # Decode base64 image
-            image = self._decode_base64_image(image_data)
+            # Decode image
+            image, scale = self._decode_image(image_data)
             if image is None:
                 logger.error("Failed to decode image data")
                 return []
+            decode_time = time.time() - start_time
             
             # Run ALPR detection
             results = self.alpr.predict(image)
             
             processing_time = time.time() - start_time
+            predict_time = processing_time - decode_time
             
             if not results or len(results) == 0:
                 logger.debug(f"No plates detected in image from {camera_id}")
@@ -166,21 +180,13 @@ class ALPRService:
             alpr_results = []
             for result in results:
                 if result.confidence >= self.confidence_threshold:
-                    # Extract bounding box if available
-                    bbox = None
-                    if hasattr(result, 'bbox') and result.bbox:
-                        bbox = {
-                            "x1": float(result.bbox[0]),
-                            "y1": float(result.bbox[1]),
-                            "x2": float(result.bbox[2]), 
-                            "y2": float(result.bbox[3])
-                        }
-                    
                     alpr_result = ALPRResult(
                         plate_number=result.text.upper().strip(),
                         confidence=float(result.confidence),
                         processing_time=processing_time,
-                        bbox=bbox
+                        decode_time=decode_time,
+                        predict_time=predict_time,
+                        bbox=self._extract_bbox(result, scale)
                     )
                     alpr_results.append(alpr_result)
             
@@ -195,34 +201,52 @@ class ALPRService:
             logger.error(f"Multiple plate detection failed: {e}")
             return []
     
-    def _decode_base64_image(self, image_data: str) -> Optional[np.ndarray]:
-        """Decode base64 image to numpy array"""
+    def _decode_image(self, image_data: ImageInput,
+                      reduced: Optional[bool] = None) -> Tuple[Optional[np.ndarray], float]:
+        """
+        Decode any supported input straight to a BGR array
+        
+        JPEG bytes go through a single cv2.imdecode (no PIL / RGB / cvtColor copies),
+        NumPy frames are used as they are.
+        
+        Returns:
+            (BGR image or None, factor that maps image coordinates back to full resolution)
+        """
         try:
-            # Remove data URL prefix if present
-            if image_data.startswith('data:image'):
-                image_data = image_data.split(',')[1]
-            
-            # Decode base64
-            image_bytes = base64.b64decode(image_data)
+            if isinstance(image_data, np.ndarray):
+                return image_data, 1.0
             
-            # Convert to PIL Image
-            pil_image = Image.open(io.BytesIO(image_bytes))
+            if isinstance(image_data, str):
+                # Remove data URL prefix if present
+                if image_data.startswith('data:image'):
+                    image_data = image_data.split(',', 1)[1]
+                image_data = base64.b64decode(image_data)
             
-            # Convert to RGB if necessary
-            if pil_image.mode != 'RGB':
-                pil_image = pil_image.convert('RGB')
-            
-            # Convert to numpy array (OpenCV format)
-            image_array = np.array(pil_image)
-            
-            # Convert RGB to BGR for OpenCV
-            image_bgr = cv2.cvtColor(image_array, cv2.COLOR_RGB2BGR)
-            
-            return image_bgr
+            buffer = np.frombuffer(image_data, dtype=np.uint8)
+            if self.reduced_decode if reduced is None else reduced:
+                image = cv2.imdecode(buffer, cv2.IMREAD_REDUCED_COLOR_2)
+                return image, 2.0
+            return cv2.imdecode(buffer, cv2.IMREAD_COLOR), 1.0
             
         except Exception as e:
-            logger.error(f"Failed to decode base64 image: {e}")
+            logger.error(f"Failed to decode image: {e}")
+            return None, 1.0
+    
+    def _decode_base64_image(self, image_data: ImageInput) -> Optional[np.ndarray]:
+        """Decode base64 image to numpy array"""
+        return self._decode_image(image_data)[0]
+    
+    @staticmethod
+    def _extract_bbox(result: Any, scale: float = 1.0) -> Optional[Dict[str, float]]:
+        """Bounding box in full resolution coordinates, if the result has one"""
+        if not (hasattr(result, 'bbox') and result.bbox):
             return None
+        return {
+            "x1": float(result.bbox[0]) * scale,
+            "y1": float(result.bbox[1]) * scale,
+            "x2": float(result.bbox[2]) * scale,
+            "y2": float(result.bbox[3]) * scale
+        }
     
     def preprocess_image(self, image: np.ndarray) -> np.ndarray:
         """Preprocess image for better ALPR results"""
@@ -243,19 +267,139 @@ class ALPRService:
             logger.error(f"Image preprocessing failed: {e}")
             return image
     
-    def detect_with_preprocessing(self, image_data: str, camera_id: str = "unknown") -> Optional[ALPRResult]:
+    @staticmethod
+    def _ocr_confidence(ocr_result: Any) -> float:
+        """OCR confidence as one value (fast-alpr may report one per character)"""
+        if ocr_result is None or not ocr_result.text:
+            return 0.0
+        confidence = ocr_result.confidence
+        if isinstance(confidence, (list, tuple, np.ndarray)):
+            return float(np.mean(confidence)) if len(confidence) else 0.0
+        return float(confidence or 0.0)
+    
+    def _read_crop(self, crop: np.ndarray) -> Tuple[Optional[str], float]:
+        """OCR one plate crop, retrying with CLAHE on the crop only when confidence is low"""
+        ocr_result = self.alpr.ocr.predict(crop)
+        text, confidence = (ocr_result.text if ocr_result else None), self._ocr_confidence(ocr_result)
+        
+        if confidence < self.confidence_threshold:
+            self.cascade_stats["clahe_retries"] += 1
+            enhanced = self.alpr.ocr.predict(self.preprocess_image(crop))
+            enhanced_confidence = self._ocr_confidence(enhanced)
+            if enhanced_confidence > confidence:
+                text, confidence = enhanced.text, enhanced_confidence
+        
+        return text, confidence
+    
+    def _detect_boxes(self, image: np.ndarray, width: Optional[int] = None,
+                      offset: Tuple[int, int] = (0, 0)) -> List[Tuple[Tuple[int, int, int, int], float]]:
+        """Plate boxes (full resolution coordinates) detected on a downscaled copy of `image`"""
+        scale = 1.0
+        if width and image.shape[1] > width:
+            scale = image.shape[1] / width
+            image = cv2.resize(image, (width, int(image.shape[0] / scale)), interpolation=cv2.INTER_AREA)
+        
+        boxes = []
+        for detection in self.alpr.detector.predict(image):
+            box = detection.bounding_box
+            boxes.append(((int(box.x1 * scale) + offset[0], int(box.y1 * scale) + offset[1],
+                           int(box.x2 * scale) + offset[0], int(box.y2 * scale) + offset[1]),
+                          float(detection.confidence)))
+        return sorted(boxes, key=lambda item: item[1], reverse=True)
+    
+    @staticmethod
+    def _crop(image: np.ndarray, box: Tuple[int, int, int, int], margin: float = 0.0) -> Tuple[np.ndarray, int, int]:
+        """Crop a box (optionally grown by `margin` of its size), clipped to the frame"""
+        x1, y1, x2, y2 = box
+        grow_x, grow_y = int((x2 - x1) * margin), int((y2 - y1) * margin)
+        x1, y1 = max(x1 - grow_x, 0), max(y1 - grow_y, 0)
+        x2, y2 = min(x2 + grow_x, image.shape[1]), min(y2 + grow_y, image.shape[0])
+        return image[y1:y2, x1:x2], x1, y1
+    
+    def detect_plate_cascade(self, image_data: ImageInput, camera_id: str = "unknown") -> Optional[ALPRResult]:
+        """
+        Two-stage detection
+        
+        Stage 1 finds plate boxes: first around the box cached for this camera
+        (small crop), else on the frame downscaled to cascade_width.
+        Stage 2 runs OCR, and the CLAHE retry, on full resolution crops of
+        those boxes only.
+        """
+        if not self.is_ready():
+            return None
+        
+        try:
+            start_time = time.time()
+            image, _ = self._decode_image(image_data, reduced=False)
+            if image is None:
+                return None
+            decode_time = time.time() - start_time
+            self.cascade_stats["frames"] += 1
+            
+            boxes = []
+            prior = self.box_cache.get(camera_id)
+            if prior and start_time - prior[1] <= self.prior_max_age:
+                region, x0, y0 = self._crop(image, prior[0], margin=1.0)
+                if region.size:
+                    boxes = self._detect_boxes(region, offset=(x0, y0))
+                if boxes:
+                    self.cascade_stats["prior_hits"] += 1
+            if not boxes:
+                self.cascade_stats["full_detections"] += 1
+                boxes = self._detect_boxes(image, self.cascade_width)
+            
+            best = None
+            for box, _ in boxes:
+                crop, _, _ = self._crop(image, box)
+                if not crop.size:
+                    continue
+                text, confidence = self._read_crop(crop)
+                if text and (best is None or confidence > best[2]):
+                    best = (box, text, confidence)
+                if best and best[2] >= self.confidence_threshold:
+                    break
+            
+            processing_time = time.time() - start_time
+            
+            if best is None:
+                self.box_cache.pop(camera_id, None)
+                return None
+            self.box_cache[camera_id] = (best[0], start_time)
+            
+            if best[2] < self.confidence_threshold:
+                return None
+            
+            x1, y1, x2, y2 = best[0]
+            return ALPRResult(
+                plate_number=best[1].upper().strip(),
+                confidence=best[2],
+                processing_time=processing_time,
+                decode_time=decode_time,
+                predict_time=processing_time - decode_time,
+                bbox={"x1": float(x1), "y1": float(y1), "x2": float(x2), "y2": float(y2)}
+            )
+            
+        except Exception as e:
+            logger.error(f"Cascade ALPR detection failed: {e}")
+            return None
+    
+    def detect_with_preprocessing(self, image_data: ImageInput, camera_id: str = "unknown") -> Optional[ALPRResult]:
         """Detect plate with image preprocessing"""
         if not self.is_ready():
             return None
         
+        if self.use_cascade():
+            return self.detect_plate_cascade(image_data, camera_id)
+        
         try:
             # Decode image
+            start_time = time.time()
             image = self._decode_base64_image(image_data)
             if image is None:
                 return None
+            decode_time = time.time() - start_time
             
             # Try detection on original image first
-            start_time = time.time()
             results = self.alpr.predict(image)
             
             best_result = None
@@ -281,14 +425,16 @@ class ALPRService:
             return ALPRResult(
                 plate_number=best_result.text.upper().strip(),
                 confidence=float(best_result.confidence),
-                processing_time=processing_time
+                processing_time=processing_time,
+                decode_time=decode_time,
+                predict_time=processing_time - decode_time
             )
             
         except Exception as e:
             logger.error(f"ALPR detection with preprocessing failed: {e}")
             return None
     
-    async def detect_plate_async(self, image_data: str, camera_id: str = "unknown") -> Optional[ALPRResult]:
+    async def detect_plate_async(self, image_data: ImageInput, camera_id: str = "unknown") -> Optional[ALPRResult]:
         """Async version of plate detection"""
         loop = asyncio.get_event_loop()
         return await loop.run_in_executor(None, self.detect_plate, image_data, camera_id)
@@ -300,6 +446,9 @@ class ALPRService:
             "model_loaded": self.model_loaded,
             "ready": self.is_ready(),
             "confidence_threshold": self.confidence_threshold,
+            "reduced_decode": self.reduced_decode,
+            "cascade": self.cascade,
+            "cascade_stats": dict(self.cascade_stats),
             "detector_model": "yolo-v9-t-384-license-plate-end2end",
             "ocr_model": "global-plates-mobile-vit-v2-model"
         }
@@ -313,5 +462,19 @@ class ALPRService:
             logger.error(f"Invalid confidence threshold: {threshold}")
 
 
-# Global ALPR service instance
-alpr_service = ALPRService()
+# Global ALPR service instance, created on first access so that importing this
+# module (ALPR pool workers build their own service) does not load the models
+_alpr_service: Optional[ALPRService] = None
+
+
+def __getattr__(name: str):
+    global _alpr_service
+    if name == "alpr_service":
+        if _alpr_service is None:
+            _alpr_service = ALPRService(
+                reduced_decode=settings.alpr_reduced_decode,
+                cascade=settings.alpr_cascade,
+                cascade_width=settings.alpr_cascade_width
+            )
+        return _alpr_service
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,242 @@
+"""
+ALPR worker pool - plate recognition in separate processes so inference and
+JPEG decode run on several cores instead of sharing the gate process GIL
+"""
+
+import base64
+import itertools
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor, Future, TimeoutError as FutureTimeoutError
+from multiprocessing import shared_memory
+from typing import Optional, Dict, Any, Tuple
+
+import numpy as np
+
+from ..core.config import settings
+from ..core.models import ALPRResult
+from .alpr import alpr_service, ImageInput
+from .alpr_worker import PlateBox, _init_worker, _worker_ping, _worker_detect
+
+logger = logging.getLogger(__name__)
+
+
+class ALPRWorkerPool:
+    """N ALPR worker processes behind a submit()/result() API"""
+
+    def __init__(self, workers: int = 2, max_pending: int = 16, deadline: float = 2.0):
+        """
+        Args:
+            workers: Worker processes (each loads the fast-alpr model once)
+            max_pending: Requests queued or running before submit() rejects
+            deadline: Default seconds a request may take, queue time included
+        """
+        self.workers = workers
+        self.max_pending = max_pending
+        self.deadline = deadline
+
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.broken = False  # a worker died: frames are recognized in-process until restart
+        self.pending: Dict[int, Tuple[Future, shared_memory.SharedMemory, float, str]] = {}
+        # camera_id -> last plate box: sent with each request so the cascade's
+        # prior works whichever worker gets the frame
+        self.box_cache: Dict[str, PlateBox] = {}
+        self.lock = threading.Lock()
+        self.request_ids = itertools.count(1)
+
+        self.stats = {
+            "submitted": 0,
+            "completed": 0,
+            "detected": 0,
+            "rejected": 0,
+            "expired": 0,
+            "timeouts": 0,
+            "errors": 0,
+        }
+
+    @property
+    def is_running(self) -> bool:
+        return self.executor is not None
+
+    def start(self):
+        """Start the worker processes (spawned, so CUDA/ONNX state is never forked)"""
+        if self.executor or self.workers < 1:
+            return
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=({
+                "confidence_threshold": alpr_service.confidence_threshold,
+                "reduced_decode": alpr_service.reduced_decode,
+                "cascade": alpr_service.cascade,
+                "cascade_width": alpr_service.cascade_width,
+                "prior_max_age": alpr_service.prior_max_age,
+            },)
+        )
+        # Processes are spawned on demand; one ping each starts them (and loads the models) now
+        for _ in range(self.workers):
+            self.executor.submit(_worker_ping)
+        logger.info(f"ALPR worker pool started with {self.workers} processes")
+
+    def stop(self):
+        executor, self.executor = self.executor, None
+        if executor:
+            executor.shutdown(wait=True, cancel_futures=True)
+        with self.lock:
+            for request_id in list(self.pending):
+                self._release(request_id)
+            self.broken = False
+        logger.info("ALPR worker pool stopped")
+
+    def _to_shared_memory(self, image_data: ImageInput) -> Tuple[shared_memory.SharedMemory, int,
+                                                                  Optional[Tuple[int, ...]], Optional[str]]:
+        """Copy a frame into a new shared memory block (one copy, no pickling of pixels)"""
+        if isinstance(image_data, np.ndarray):
+            frame = np.ascontiguousarray(image_data)
+            shm = shared_memory.SharedMemory(create=True, size=max(frame.nbytes, 1))
+            np.ndarray(frame.shape, dtype=frame.dtype, buffer=shm.buf)[...] = frame
+            return shm, frame.nbytes, frame.shape, frame.dtype.str
+
+        if isinstance(image_data, str):
+            # Base64 is decoded here so the worker only ever sees JPEG bytes
+            if image_data.startswith('data:image'):
+                image_data = image_data.split(',', 1)[1]
+            image_data = base64.b64decode(image_data)
+
+        data = memoryview(image_data).cast("B")
+        shm = shared_memory.SharedMemory(create=True, size=max(data.nbytes, 1))
+        shm.buf[:data.nbytes] = data
+        return shm, data.nbytes, None, None
+
+    def _release(self, request_id: int):
+        """Forget a request and free its shared memory (caller holds self.lock)"""
+        entry = self.pending.pop(request_id, None)
+        if entry is None:
+            return
+        future, shm, _, _ = entry
+        future.cancel()
+        try:
+            shm.close()
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+    def submit(self, image_data: ImageInput, camera_id: str = "unknown",
+               deadline: Optional[float] = None) -> Optional[int]:
+        """
+        Queue a frame for recognition
+
+        Args:
+            image_data: Base64 string / data URL, raw JPEG bytes or a BGR frame
+            camera_id: Identifier for the camera source
+            deadline: Seconds from now after which the request is dropped
+
+        Returns:
+            Request id for result(), None if the pool is not running or full
+        """
+        if not self.executor:
+            logger.error("ALPR worker pool not started")
+            return None
+
+        with self.lock:
+            if len(self.pending) >= self.max_pending:
+                self.stats["rejected"] += 1
+                logger.warning(f"ALPR worker pool full, dropping frame from {camera_id}")
+                return None
+
+            expires = time.time() + (self.deadline if deadline is None else deadline)
+            shm, nbytes, shape, dtype = self._to_shared_memory(image_data)
+            try:
+                future = self.executor.submit(_worker_detect, shm.name, nbytes, shape, dtype, camera_id, expires,
+                                              self.box_cache.get(camera_id))
+            except Exception as e:
+                shm.close()
+                shm.unlink()
+                self.stats["errors"] += 1
+                if isinstance(e, BrokenExecutor):
+                    self.broken = True
+                logger.error(f"ALPR worker pool submit failed: {e}")
+                return None
+
+            request_id = next(self.request_ids)
+            self.pending[request_id] = (future, shm, expires, camera_id)
+            self.stats["submitted"] += 1
+            return request_id
+
+    def result(self, request_id: Optional[int], timeout: Optional[float] = None) -> Optional[ALPRResult]:
+        """
+        Wait for a submitted request
+
+        Args:
+            request_id: Id returned by submit()
+            timeout: Max seconds to wait (default: until the request deadline)
+
+        Returns:
+            ALPRResult, or None if nothing was detected, the deadline passed or the worker failed
+        """
+        with self.lock:
+            entry = self.pending.get(request_id)
+        if entry is None:
+            return None
+
+        future, _, expires, camera_id = entry
+        if timeout is None:
+            timeout = max(0.0, expires - time.time())
+
+        try:
+            status, alpr_result, box = future.result(timeout=timeout)
+        except FutureTimeoutError:
+            with self.lock:
+                self.stats["timeouts"] += 1
+                self._release(request_id)
+            return None
+        except Exception as e:
+            logger.error(f"ALPR worker failed: {e}")
+            with self.lock:
+                self.stats["errors"] += 1
+                if isinstance(e, BrokenExecutor):
+                    self.broken = True
+                self._release(request_id)
+            return None
+
+        with self.lock:
+            self._release(request_id)
+            if status == "expired":
+                self.stats["expired"] += 1
+            else:
+                if box:
+                    self.box_cache[camera_id] = box
+                else:
+                    self.box_cache.pop(camera_id, None)
+                self.stats["completed"] += 1
+                if alpr_result:
+                    self.stats["detected"] += 1
+        return alpr_result
+
+    def detect_plate(self, image_data: ImageInput, camera_id: str = "unknown") -> Optional[ALPRResult]:
+        """submit() + result(); runs in-process when the pool is not started or broken"""
+        if not self.executor or self.broken:
+            return alpr_service.detect_plate(image_data, camera_id)
+        request_id = self.submit(image_data, camera_id)
+        if request_id is None and self.broken:
+            return alpr_service.detect_plate(image_data, camera_id)
+        return self.result(request_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            stats = dict(self.stats)
+            stats["pending"] = len(self.pending)
+        stats["workers"] = self.workers if self.executor else 0
+        stats["broken"] = self.broken
+        return stats
+
+
+# Global ALPR worker pool instance (started by main when alpr_pool_workers > 0)
+alpr_pool = ALPRWorkerPool(
+    workers=settings.alpr_pool_workers,
+    max_pending=settings.alpr_pool_max_pending,
+    deadline=settings.alpr_pool_deadline
+)
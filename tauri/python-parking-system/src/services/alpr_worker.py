@@ -0,0 +1,74 @@
+"""
+ALPR pool worker entry points - run inside the spawned worker processes.
+Imports only the ALPR code: no database, cameras or gates in the workers.
+"""
+
+import time
+from multiprocessing import shared_memory
+from typing import Optional, Dict, Any, Tuple
+
+import numpy as np
+
+from ..core.models import ALPRResult
+from .alpr import ALPRService
+
+# Plate box and when it was seen, as cached by ALPRService.detect_plate_cascade
+PlateBox = Tuple[Tuple[int, int, int, int], float]
+
+# Per worker process: the ALPRService (and model) this process loaded
+_worker_service: Optional[ALPRService] = None
+
+
+def _init_worker(service_options: Dict[str, Any]):
+    """Runs once in every worker process: builds the worker's own ALPRService"""
+    global _worker_service
+    service = ALPRService(**service_options)
+    if not service.is_ready():
+        service.initialize()
+    _worker_service = service
+
+
+def _worker_ping() -> bool:
+    return _worker_service is not None
+
+
+def _worker_detect(shm_name: str, nbytes: int, shape: Optional[Tuple[int, ...]], dtype: Optional[str],
+                   camera_id: str, deadline: float, prior: Optional[PlateBox] = None
+                   ) -> Tuple[str, Optional[ALPRResult], Optional[PlateBox]]:
+    """
+    Detect a plate in a frame passed through shared memory
+
+    Args:
+        prior: The camera's last plate box, kept by the pool (any worker may get the next frame)
+
+    Returns:
+        (status, result, box): status "expired" if the deadline passed while queued,
+        else "ok"; box is the plate box the cascade will look around next time
+    """
+    if time.time() > deadline:
+        return "expired", None, prior
+
+    box_cache = _worker_service.box_cache
+    if prior:
+        box_cache[camera_id] = prior
+    else:
+        box_cache.pop(camera_id, None)
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        if shape is None:
+            # JPEG bytes: decoded straight from the shared buffer
+            view = shm.buf[:nbytes]
+            try:
+                result = _worker_service.detect_plate(view, camera_id)
+            finally:
+                view.release()
+        else:
+            frame = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+            try:
+                result = _worker_service.detect_plate(frame, camera_id)
+            finally:
+                del frame
+        return "ok", result, box_cache.pop(camera_id, None)
+    finally:
+        shm.close()
@@ -7,15 +7,18 @@ import logging
 import base64
 import io
 import time
-from typing import Optional, Dict, Any, List, Tuple
+from typing import Callable, Optional, Dict, Any, List, Tuple, Union
 import cv2
 import numpy as np
 import requests
 from requests.auth import HTTPBasicAuth
 from PIL import Image
 import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 
+from ..core.config import settings
 from ..core.models import CameraCapture
+from .frame_grabber import FrameGrabber, FakeStream
 
 logger = logging.getLogger(__name__)
 
@@ -28,6 +31,10 @@ class CameraService:
         self.cctv_cameras = {}  # camera_id -> config
         self.camera_status = {}
         self.capture_lock = threading.Lock()
+        self.capture_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="camera")
+        self.http_session = requests.Session()  # keep-alive for snapshot polling
+        self.grabbers: Dict[str, FrameGrabber] = {}
+        self.grabber_max_age = settings.frame_grabber_max_age
     
     def initialize(self):
         """Initialize camera service"""
@@ -59,6 +66,7 @@ class CameraService:
         }
         self.camera_status[camera_id] = "configured"
         logger.info(f"CCTV camera added: {camera_id} at {ip}")
+        self._auto_start_grabber(camera_id, "cctv")
     
     def add_usb_camera(self, camera_id: str, device_id: int = 0):
         """Add USB camera"""
@@ -68,6 +76,7 @@ class CameraService:
                 self.usb_cameras[camera_id] = cap
                 self.camera_status[camera_id] = "ready"
                 logger.info(f"USB camera added: {camera_id} on device {device_id}")
+                self._auto_start_grabber(camera_id, "usb")
             else:
                 self.camera_status[camera_id] = "error"
                 logger.error(f"Failed to open USB camera device {device_id}")
@@ -75,34 +84,125 @@ class CameraService:
             self.camera_status[camera_id] = "error"
             logger.error(f"Error adding USB camera {camera_id}: {e}")
     
+    def _read_cctv_jpeg(self, camera_id: str) -> bytes:
+        """Fetch one JPEG snapshot from a CCTV camera (raises on failure)"""
+        camera_config = self.cctv_cameras[camera_id]
+        response = self.http_session.get(
+            camera_config["url"],
+            timeout=10,
+            auth=HTTPBasicAuth(camera_config["username"], camera_config["password"])
+        )
+        if response.status_code != 200:
+            raise IOError(f"status {response.status_code}")
+        return response.content
+    
+    def _read_usb_frame(self, camera_id: str) -> np.ndarray:
+        """Read one BGR frame from a USB camera (raises on failure)"""
+        with self.capture_lock:
+            ret, frame = self.usb_cameras[camera_id].read()
+        if not ret:
+            raise IOError("failed to read frame")
+        return frame
+    
+    def _read_usb_jpeg(self, camera_id: str) -> bytes:
+        """Read one frame from a USB camera and encode it as JPEG (raises on failure)"""
+        _, buffer = cv2.imencode('.jpg', self._read_usb_frame(camera_id))
+        return buffer.tobytes()
+    
+    def start_grabber(self, camera_id: str, camera_type: str, buffer_size: int = 8,
+                      interval: float = 0.0, fake: bool = False) -> bool:
+        """
+        Keep the latest frames of a camera in a ring buffer so captures return
+        immediately instead of issuing a snapshot request / stale USB read
+        
+        Args:
+            camera_id: Configured camera
+            camera_type: 'cctv' or 'usb'
+            buffer_size: Frames kept in the ring buffer
+            interval: Minimum seconds between reads (snapshot polling rate for CCTV)
+            fake: Use a synthetic FakeStream instead of the camera
+        """
+        if fake:
+            read = FakeStream().read
+        elif camera_type == "cctv" and camera_id in self.cctv_cameras:
+            read = lambda: self._read_cctv_jpeg(camera_id)
+        elif camera_type == "usb" and camera_id in self.usb_cameras:
+            read = lambda: self._read_usb_jpeg(camera_id)
+        else:
+            logger.error(f"Cannot start grabber for unknown camera {camera_id} ({camera_type})")
+            return False
+        
+        if interval:
+            read_frame = read
+            def read():
+                time.sleep(interval)
+                return read_frame()
+        
+        self.stop_grabber(camera_id)
+        grabber = FrameGrabber(camera_id, read, buffer_size=buffer_size)
+        grabber.start()
+        self.grabbers[camera_id] = grabber
+        return True
+    
+    def _auto_start_grabber(self, camera_id: str, camera_type: str):
+        if settings.frame_grabber_enabled:
+            self.start_grabber(camera_id, camera_type,
+                               buffer_size=settings.frame_grabber_buffer_size,
+                               interval=settings.frame_grabber_interval,
+                               fake=settings.frame_grabber_fake)
+    
+    def stop_grabber(self, camera_id: str):
+        grabber = self.grabbers.pop(camera_id, None)
+        if grabber:
+            grabber.stop()
+    
+    def _buffered_jpeg(self, camera_id: str) -> Optional[bytes]:
+        """Freshest buffered JPEG, None if no grabber / frame is stale"""
+        grabber = self.grabbers.get(camera_id)
+        frame = grabber.latest(max_age=self.grabber_max_age) if grabber else None
+        if frame is None:
+            return None
+        self.camera_status[camera_id] = "ready"
+        return frame.data
+    
+    def _buffered_image(self, camera_id: str) -> Optional[str]:
+        """Freshest buffered frame as data URL, None if no grabber / frame is stale"""
+        data = self._buffered_jpeg(camera_id)
+        if data is None:
+            return None
+        return f"data:image/jpeg;base64,{base64.b64encode(data).decode('utf-8')}"
+    
+    def capture_sharpest(self, camera_id: str, camera_type: str, around: Optional[float] = None,
+                         window: float = 0.5) -> Optional[CameraCapture]:
+        """Sharpest buffered frame around a trigger time, falls back to capture_image"""
+        grabber = self.grabbers.get(camera_id)
+        frame = grabber.sharpest(around, window) if grabber else None
+        if frame is None:
+            return self.capture_image(camera_id, camera_type)
+        return CameraCapture(
+            camera_type=camera_type,
+            camera_source=camera_id,
+            image_base64=f"data:image/jpeg;base64,{base64.b64encode(frame.data).decode('utf-8')}"
+        )
+    
     def capture_cctv_image(self, camera_id: str) -> Optional[str]:
         """Capture image from CCTV camera"""
         if camera_id not in self.cctv_cameras:
             logger.error(f"CCTV camera {camera_id} not configured")
             return None
         
-        camera_config = self.cctv_cameras[camera_id]
+        buffered = self._buffered_image(camera_id)
+        if buffered:
+            return buffered
         
         try:
             # Make HTTP request to get snapshot
-            response = requests.get(
-                camera_config["url"],
-                timeout=10,
-                auth=HTTPBasicAuth(camera_config["username"], camera_config["password"])
-            )
+            image_base64 = base64.b64encode(self._read_cctv_jpeg(camera_id)).decode('utf-8')
             
-            if response.status_code == 200:
-                # Convert image to base64
-                image_base64 = base64.b64encode(response.content).decode('utf-8')
-                
-                self.camera_status[camera_id] = "ready"
-                logger.debug(f"CCTV image captured from {camera_id}")
-                
-                return f"data:image/jpeg;base64,{image_base64}"
-            else:
-                self.camera_status[camera_id] = "error"
-                logger.error(f"CCTV camera {camera_id} returned status {response.status_code}")
-                return None
+            self.camera_status[camera_id] = "ready"
+            logger.debug(f"CCTV image captured from {camera_id}")
+            
+            return f"data:image/jpeg;base64,{image_base64}"
                 
         except requests.exceptions.Timeout:
             self.camera_status[camera_id] = "timeout"
@@ -119,28 +219,17 @@ class CameraService:
             logger.error(f"USB camera {camera_id} not configured")
             return None
         
-        cap = self.usb_cameras[camera_id]
+        buffered = self._buffered_image(camera_id)
+        if buffered:
+            return buffered
         
         try:
-            with self.capture_lock:
-                # Read frame from camera
-                ret, frame = cap.read()
-                
-                if not ret:
-                    self.camera_status[camera_id] = "error"
-                    logger.error(f"Failed to read frame from USB camera {camera_id}")
-                    return None
-                
-                # Convert frame to JPEG
-                _, buffer = cv2.imencode('.jpg', frame)
-                
-                # Convert to base64
-                image_base64 = base64.b64encode(buffer).decode('utf-8')
-                
-                self.camera_status[camera_id] = "ready"
-                logger.debug(f"USB image captured from {camera_id}")
-                
-                return f"data:image/jpeg;base64,{image_base64}"
+            image_base64 = base64.b64encode(self._read_usb_jpeg(camera_id)).decode('utf-8')
+            
+            self.camera_status[camera_id] = "ready"
+            logger.debug(f"USB image captured from {camera_id}")
+            
+            return f"data:image/jpeg;base64,{image_base64}"
                 
         except Exception as e:
             self.camera_status[camera_id] = "error"
@@ -170,28 +259,94 @@ class CameraService:
             image_base64=image_data
         )
     
+    def capture_frame(self, camera_id: str, camera_type: str) -> Union[bytes, np.ndarray, None]:
+        """
+        Capture for ALPR without the base64 round trip
+        
+        Returns:
+            Raw JPEG bytes (buffered frame / CCTV snapshot), a BGR array for a
+            direct USB read, or None on failure
+        """
+        if camera_type not in ("cctv", "usb"):
+            logger.error(f"Unknown camera type: {camera_type}")
+            return None
+        cameras = self.cctv_cameras if camera_type == "cctv" else self.usb_cameras
+        if camera_id not in cameras:
+            logger.error(f"{camera_type.upper()} camera {camera_id} not configured")
+            return None
+        
+        buffered = self._buffered_jpeg(camera_id)
+        if buffered is not None:
+            return buffered
+        
+        try:
+            if camera_type == "cctv":
+                frame = self._read_cctv_jpeg(camera_id)
+            else:
+                frame = self._read_usb_frame(camera_id)
+            self.camera_status[camera_id] = "ready"
+            return frame
+        except Exception as e:
+            self.camera_status[camera_id] = "error"
+            logger.error(f"Error capturing frame from {camera_id}: {e}")
+            return None
+    
     async def capture_image_async(self, camera_id: str, camera_type: str) -> Optional[CameraCapture]:
         """Async version of image capture"""
         loop = asyncio.get_event_loop()
         return await loop.run_in_executor(None, self.capture_image, camera_id, camera_type)
     
-    def capture_both_cameras(self, plate_camera_id: str, plate_camera_type: str,
-                           driver_camera_id: str = None, driver_camera_type: str = None) -> Dict[str, Optional[str]]:
-        """Capture from both plate and driver cameras"""
-        results = {}
+    def capture_cameras(self, cameras: Dict[str, Tuple[str, str]], deadline: float = 10.0,
+                        capture: Optional[Callable[[str, str], Optional[CameraCapture]]] = None
+                        ) -> Dict[str, Optional[CameraCapture]]:
+        """Capture from several cameras concurrently under one overall deadline.
         
-        # Capture plate camera
-        plate_capture = self.capture_image(plate_camera_id, plate_camera_type)
-        results["plate"] = plate_capture.image_base64 if plate_capture else None
+        ``cameras`` maps a role (e.g. "plate") to ``(camera_id, camera_type)``;
+        ``capture(camera_id, camera_type)`` takes each picture (default: capture_image).
+        Cameras that fail or miss the deadline map to None.
+        """
+        capture = capture or self.capture_image
+        futures = {
+            self.capture_executor.submit(capture, camera_id, camera_type): role
+            for role, (camera_id, camera_type) in cameras.items()
+        }
+        done, not_done = wait(futures, timeout=deadline)
+        
+        results: Dict[str, Optional[CameraCapture]] = {}
+        for future in done:
+            role = futures[future]
+            try:
+                results[role] = future.result()
+            except Exception as e:
+                logger.error(f"Error capturing {role} camera: {e}")
+                results[role] = None
+        
+        for future in not_done:
+            role = futures[future]
+            future.cancel()
+            logger.warning(f"{role} camera missed the {deadline}s capture deadline")
+            results[role] = None
+        
+        return results
+    
+    def capture_both_cameras(self, plate_camera_id: str, plate_camera_type: str,
+                           driver_camera_id: str = None, driver_camera_type: str = None,
+                           deadline: float = 10.0) -> Dict[str, Optional[str]]:
+        """Capture from both plate and driver cameras in parallel (max, not sum, of latencies)"""
+        cameras = {"plate": (plate_camera_id, plate_camera_type)}
         
         # Capture driver camera if configured
         if driver_camera_id and driver_camera_type:
-            driver_capture = self.capture_image(driver_camera_id, driver_camera_type)
-            results["driver"] = driver_capture.image_base64 if driver_capture else None
-        else:
-            results["driver"] = None
+            cameras["driver"] = (driver_camera_id, driver_camera_type)
         
-        return results
+        start_time = time.time()
+        captures = self.capture_cameras(cameras, deadline)
+        logger.debug(f"Captured {len(cameras)} camera(s) in {(time.time() - start_time) * 1000:.1f}ms")
+        
+        return {
+            "plate": captures["plate"].image_base64 if captures.get("plate") else None,
+            "driver": captures["driver"].image_base64 if captures.get("driver") else None
+        }
     
     def test_camera(self, camera_id: str, camera_type: str) -> Dict[str, Any]:
         """Test camera connectivity and capture"""
@@ -235,7 +390,8 @@ class CameraService:
             return {
                 "all_cameras": self.camera_status,
                 "cctv_cameras": list(self.cctv_cameras.keys()),
-                "usb_cameras": list(self.usb_cameras.keys())
+                "usb_cameras": list(self.usb_cameras.keys()),
+                "grabbers": {cid: g.get_stats() for cid, g in self.grabbers.items()}
             }
     
     def update_cctv_config(self, camera_id: str, ip: str = None, username: str = None, 
@@ -264,6 +420,8 @@ class CameraService:
     
     def remove_camera(self, camera_id: str):
         """Remove camera configuration"""
+        self.stop_grabber(camera_id)
+        
         if camera_id in self.usb_cameras:
             cap = self.usb_cameras[camera_id]
             cap.release()
@@ -279,6 +437,11 @@ class CameraService:
     
     def cleanup(self):
         """Cleanup camera resources"""
+        for camera_id in list(self.grabbers):
+            self.stop_grabber(camera_id)
+        self.capture_executor.shutdown(wait=False)
+        self.http_session.close()
+        
         for cap in self.usb_cameras.values():
             cap.release()
         
@@ -1,6 +1,6 @@
 """
 Database Service for Python Parking System
-Supports CouchDB with JSON file fallback
+Supports CouchDB with local SQLite store fallback
 """
 
 import logging
@@ -28,10 +28,11 @@ logger = logging.getLogger(__name__)
 
 """
 Database Service for Python Parking System
-Supports CouchDB with JSON file fallback
+Supports CouchDB with local SQLite store fallback
 """
 
 import logging
+import threading
 import uuid
 import json
 import os
@@ -42,6 +43,10 @@ from ..core.config import settings
 from ..core.models import (
     ParkingTransactionCreate, SystemStatus
 )
+from .tariff import tariff_engine, DEFAULT_TARIF_ROWS
+from .local_store import LocalStore
+from .activity_log import ActivityLogSink
+from .plate_index import PlateIndex
 
 logger = logging.getLogger(__name__)
 
@@ -51,18 +56,37 @@ try:
     COUCHDB_AVAILABLE = True
 except ImportError:
     COUCHDB_AVAILABLE = False
-    logger.warning("CouchDB library not available, using JSON fallback only")
+    logger.warning("CouchDB library not available, using local store fallback only")
 
 
 class DatabaseService:
-    """Database service with CouchDB and JSON fallback"""
+    """Database service with CouchDB and local store fallback"""
     
     def __init__(self):
         self.server = None
         self.db = None
         self.connected = False
-        self.data_file = "parking_data.json"
+        self.data_file = "parking_data.json"  # Legacy JSON fallback, imported into the local store
+        self.store_file = settings.local_store_path
+        self.store: Optional[LocalStore] = None
+        self.plate_index = PlateIndex()  # fuzzy plate -> active transaction (OCR misreads)
         self._initialize_connection()
+        self.reload_tariffs()
+        
+        # Activity logs are buffered and written in batches
+        self.activity_sink = ActivityLogSink(
+            self._write_activity_batch,
+            batch_size=settings.activity_log_batch_size,
+            flush_interval=settings.activity_log_flush_interval,
+            max_queue=settings.activity_log_max_queue
+        )
+        self.activity_sink.start()
+        
+        # Plate index is refreshed in the background, never inside a lookup
+        self.plate_index_stop = threading.Event()
+        self.plate_index_thread = threading.Thread(target=self._plate_index_loop,
+                                                   name="plate-index-refresh", daemon=True)
+        self.plate_index_thread.start()
     
     def _initialize_connection(self):
         """Initialize CouchDB connection with fallback"""
@@ -91,42 +115,21 @@ class DatabaseService:
                 return
                 
             except Exception as e:
-                logger.warning(f"CouchDB not available, using JSON file fallback: {e}")
+                logger.warning(f"CouchDB not available, using local store fallback: {e}")
         
-        # Fallback to JSON file storage
+        # Fallback to local SQLite store
         self.connected = False
-        self._init_json_storage()
-    
-    def _init_json_storage(self):
-        """Initialize JSON file storage"""
-        if not os.path.exists(self.data_file):
-            initial_data = {
-                "transactions": {},
-                "members": {},
-                "settings": {},
-                "activity_logs": []
-            }
-            with open(self.data_file, 'w') as f:
-                json.dump(initial_data, f, indent=2)
-        
-        logger.info(f"Using JSON file storage: {self.data_file}")
+        self._init_local_store()
     
-    def _load_json_data(self) -> Dict[str, Any]:
-        """Load data from JSON file"""
+    def _init_local_store(self):
+        """Initialize local store (imports a legacy JSON data file once)"""
+        self.store = LocalStore(self.store_file, log_retention=settings.local_store_log_retention)
         try:
-            with open(self.data_file, 'r') as f:
-                return json.load(f)
+            self.store.import_json(self.data_file)
         except Exception as e:
-            logger.error(f"Failed to load JSON data: {e}")
-            return {"transactions": {}, "members": {}, "settings": {}, "activity_logs": []}
-    
-    def _save_json_data(self, data: Dict[str, Any]):
-        """Save data to JSON file"""
-        try:
-            with open(self.data_file, 'w') as f:
-                json.dump(data, f, indent=2)
-        except Exception as e:
-            logger.error(f"Failed to save JSON data: {e}")
+            logger.error(f"Failed to import legacy JSON data {self.data_file}: {e}")
+        
+        logger.info(f"Using local store: {self.store_file}")
     
     def _create_design_documents(self):
         """Create CouchDB design documents for views"""
@@ -159,8 +162,33 @@ class DatabaseService:
                 }
             }
             
+            # Activity log views (time range queries for get_activity_logs)
+            activity_logs_design = {
+                "_id": "_design/activity_logs",
+                "views": {
+                    "by_time": {
+                        "map": """
+                        function(doc) {
+                            if (doc.type === 'activity_log' && doc.timestamp) {
+                                emit(doc.timestamp, null);
+                            }
+                        }
+                        """
+                    },
+                    "by_gate_time": {
+                        "map": """
+                        function(doc) {
+                            if (doc.type === 'activity_log' && doc.timestamp) {
+                                emit([doc.gate_id, doc.timestamp], null);
+                            }
+                        }
+                        """
+                    }
+                }
+            }
+            
             # Save design documents
-            for design in [transactions_design]:
+            for design in [transactions_design, activity_logs_design]:
                 doc_id = design["_id"]
                 if doc_id in self.db:
                     existing = self.db[doc_id]
@@ -209,10 +237,9 @@ class DatabaseService:
                 doc_id, doc_rev = self.db.save(transaction_doc)
                 transaction_doc["_rev"] = doc_rev
             else:
-                # Save to JSON file
-                data = self._load_json_data()
-                data["transactions"][transaction_id] = transaction_doc
-                self._save_json_data(data)
+                # Save to local store
+                self.store.put_transaction(transaction_doc)
+            self.plate_index.update(transaction_doc)
             
             logger.info(f"Created transaction: {transaction_id} for plate {transaction_data.no_pol}")
             
@@ -228,8 +255,16 @@ class DatabaseService:
             logger.error(f"Failed to create transaction: {e}")
             raise
     
-    def find_transaction_by_plate(self, plate_number: str, status: int = None) -> Optional[Dict[str, Any]]:
-        """Find transaction by plate number"""
+    def find_transaction_by_plate(self, plate_number: str, status: int = None,
+                                  fuzzy: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Find transaction by plate number
+        
+        Args:
+            plate_number: Plate as read by ALPR / typed by the operator
+            status: Only transactions with this status
+            fuzzy: On an exact miss, resolve an OCR misread against active plates
+        """
         try:
             if self.connected:
                 # Use CouchDB views
@@ -240,14 +275,18 @@ class DatabaseService:
                 
                 transactions = [row.value for row in result]
             else:
-                # Use JSON file
-                data = self._load_json_data()
-                transactions = [t for t in data["transactions"].values() 
-                              if t.get("no_pol") == plate_number]
+                # Use local store (plate/status index, newest first)
+                latest = self.store.find_latest_by_plate(plate_number, status)
+                transactions = [latest] if latest else []
             
             if status is not None:
                 transactions = [t for t in transactions if t.get('status') == status]
             
+            # Only active transactions are in the plate index
+            if not transactions and fuzzy and status in (None, 0):
+                doc = self._resolve_plate_fuzzy(plate_number)
+                transactions = [doc] if doc else []
+            
             # Return most recent transaction
             if transactions:
                 latest = max(transactions, key=lambda x: x.get('entry_time', ''))
@@ -266,6 +305,51 @@ class DatabaseService:
             logger.error(f"Failed to find transaction by plate {plate_number}: {e}")
             return None
     
+    def _active_transactions(self) -> List[Dict[str, Any]]:
+        if self.connected:
+            return [row.value for row in self.db.view('transactions/active_by_plate')]
+        return self.store.active_transactions()
+    
+    def _refresh_plate_index(self):
+        """Rebuild the plate index from active transactions (other gates create transactions in the shared database)"""
+        try:
+            self.plate_index.rebuild(self._active_transactions)
+        except Exception as e:
+            logger.warning(f"Plate index refresh failed: {e}")
+    
+    def _plate_index_loop(self):
+        """Refresh the plate index every plate_index_refresh_interval until close()"""
+        while True:
+            self._refresh_plate_index()
+            if self.plate_index_stop.wait(settings.plate_index_refresh_interval):
+                return
+    
+    def _resolve_plate_fuzzy(self, plate_number: str) -> Optional[Dict[str, Any]]:
+        """Unique closest active transaction, re-read to make sure it is still active"""
+        candidate = self.plate_index.resolve(plate_number, settings.plate_fuzzy_max_distance)
+        if not candidate:
+            return None
+        
+        if self.connected:
+            doc = self.db.get(candidate["id"])
+        else:
+            doc = self.store.get_transaction(candidate["id"])
+        if not doc or doc.get("status") != 0:
+            self.plate_index.update(doc or {"_id": candidate["id"]})
+            return None
+        
+        logger.info(f"Plate {plate_number} matched active transaction {candidate['id']} "
+                    f"({candidate['plate']}, distance {candidate['raw_distance']})")
+        return dict(doc)
+    
+    def find_plate_candidates(self, plate_number: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Active transactions whose plate is close to plate_number, best first (id, plate, distance)"""
+        try:
+            return self.plate_index.search(plate_number, limit=limit)
+        except Exception as e:
+            logger.error(f"Failed to search plate candidates for {plate_number}: {e}")
+            return []
+    
     def find_transaction_by_id(self, transaction_id: Union[str, int]) -> Optional[Dict[str, Any]]:
         """Find transaction by ID"""
         try:
@@ -278,9 +362,8 @@ class DatabaseService:
                 else:
                     return None
             else:
-                # Use JSON file
-                data = self._load_json_data()
-                doc = data["transactions"].get(doc_id)
+                # Use local store
+                doc = self.store.get_transaction(doc_id)
                 if not doc:
                     return None
             
@@ -320,7 +403,7 @@ class DatabaseService:
                 # For compatibility - refresh object from database
                 if hasattr(obj, 'id') or hasattr(obj, '_id'):
                     doc_id = getattr(obj, 'id', None) or getattr(obj, '_id', None)
-                    # In JSON mode, object is already up to date
+                    # In local store mode, object is already up to date
                     pass
             
             def merge(self, obj):
@@ -338,11 +421,13 @@ class DatabaseService:
                         doc_data['_id'] = doc_id
                         self.db_service.db.save(doc_data)
                     else:
-                        # Update in JSON file
-                        data = self.db_service._load_json_data()
+                        # Update in local store
                         if 'type' in doc_data and doc_data['type'] == 'transaction':
-                            data["transactions"][doc_id] = doc_data
-                        self.db_service._save_json_data(data)
+                            doc_data['_id'] = doc_id
+                            self.db_service.store.put_transaction(doc_data)
+                    if doc_data.get('type') == 'transaction':
+                        doc_data['_id'] = doc_id
+                        self.db_service.plate_index.update(doc_data)
                 return obj
         
         return SessionContext(self)
@@ -354,12 +439,8 @@ class DatabaseService:
                 # Use CouchDB (would need design document for members)
                 return False  # Simplified for now
             else:
-                # Use JSON file
-                data = self._load_json_data()
-                for member in data["members"].values():
-                    if member.get("no_pol") == plate_number and member.get("active"):
-                        return True
-                return False
+                # Use local store
+                return self.store.is_active_member(plate_number)
             
         except Exception as e:
             logger.error(f"Failed to check membership for {plate_number}: {e}")
@@ -372,9 +453,8 @@ class DatabaseService:
                 # Use CouchDB (would need design document)
                 return None  # Simplified for now
             else:
-                # Use JSON file
-                data = self._load_json_data()
-                settings_data = data["settings"].get(gate_id)
+                # Use local store
+                settings_data = self.store.get_setting(gate_id)
                 
                 if settings_data:
                     class SettingsObj:
@@ -396,15 +476,11 @@ class DatabaseService:
                 # Use CouchDB (simplified)
                 return None
             else:
-                # Use JSON file
-                data = self._load_json_data()
-                
-                existing = data["settings"].get(gate_id, {})
+                # Use local store
+                existing = self.store.get_setting(gate_id) or {}
                 existing.update(settings_data)
                 existing["updated_at"] = datetime.utcnow().isoformat()
-                data["settings"][gate_id] = existing
-                
-                self._save_json_data(data)
+                self.store.put_setting(gate_id, existing)
                 
                 class SettingsObj:
                     def __init__(self, data):
@@ -420,10 +496,12 @@ class DatabaseService:
     def log_activity(self, gate_id: str, gate_type: str, message: str, 
                     level: str = "INFO", plate_number: str = None, 
                     operator_id: str = None):
-        """Log system activity"""
+        """Log system activity (buffered, written in batches)"""
         try:
+            log_id = str(uuid.uuid4())
             activity_doc = {
-                "id": str(uuid.uuid4()),
+                "_id": log_id,  # Fixed id: a retried batch can't write duplicates
+                "id": log_id,
                 "type": "activity_log",
                 "gate_id": gate_id,
                 "gate_type": gate_type,
@@ -434,21 +512,33 @@ class DatabaseService:
                 "timestamp": datetime.utcnow().isoformat()
             }
             
-            if self.connected:
-                # Save to CouchDB
-                self.db.save(activity_doc)
-            else:
-                # Save to JSON file
-                data = self._load_json_data()
-                data["activity_logs"].append(activity_doc)
-                # Keep only last 1000 logs
-                if len(data["activity_logs"]) > 1000:
-                    data["activity_logs"] = data["activity_logs"][-1000:]
-                self._save_json_data(data)
+            self.activity_sink.submit(activity_doc)
             
         except Exception as e:
             logger.error(f"Failed to log activity: {e}")
     
+    def _write_activity_batch(self, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Write one batch of activity logs (called from the sink thread)
+
+        Returns:
+            Documents that were not written and should be retried
+        """
+        if not self.connected:
+            self.store.append_logs(docs)
+            return []
+
+        # One _bulk_docs request; it reports per-document errors instead of raising
+        results = self.db.update(docs)
+        failed = []
+        for doc, (success, doc_id, error) in zip(docs, results):
+            if success or isinstance(error, couchdb.ResourceConflict):
+                # A conflict on our fixed _id means an earlier attempt already wrote it
+                continue
+            logger.warning(f"Activity log {doc_id} not written: {error}")
+            failed.append(doc)
+        return failed
+    
     def get_activity_logs(self, gate_id: str = None, hours: int = 24) -> List[Dict[str, Any]]:
         """Get recent activity logs"""
         try:
@@ -456,30 +546,33 @@ class DatabaseService:
             cutoff_iso = cutoff_time.isoformat()
             
             if self.connected:
-                # Use CouchDB (simplified)
-                return []
+                # Time-indexed views, newest first
+                if gate_id is None:
+                    result = self.db.view('activity_logs/by_time', startkey="\ufff0", endkey=cutoff_iso,
+                                          descending=True, include_docs=True)
+                else:
+                    result = self.db.view('activity_logs/by_gate_time', startkey=[gate_id, "\ufff0"],
+                                          endkey=[gate_id, cutoff_iso], descending=True, include_docs=True)
+                filtered_logs = [dict(row.doc) for row in result if row.doc]
             else:
-                # Use JSON file
-                data = self._load_json_data()
-                logs = data["activity_logs"]
-                
-                # Filter by time and gate
-                filtered_logs = []
-                for log in logs:
-                    if log.get("timestamp", "") >= cutoff_iso:
-                        if gate_id is None or log.get("gate_id") == gate_id:
-                            filtered_logs.append(log)
-                
-                # Sort by timestamp descending
-                filtered_logs.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
-                
-                # Convert to object-like access
-                class LogObj:
-                    def __init__(self, data):
-                        for key, value in data.items():
-                            setattr(self, key, value)
-                
-                return [LogObj(log) for log in filtered_logs]
+                # Use local store (timestamp index, newest first)
+                filtered_logs = self.store.recent_logs(cutoff_iso, gate_id)
+            
+            # Include events still buffered in the sink
+            written = {log.get("id") for log in filtered_logs}
+            pending = [log for log in self.activity_sink.pending()
+                       if log["timestamp"] >= cutoff_iso and (gate_id is None or log.get("gate_id") == gate_id)
+                       and log["id"] not in written]
+            if pending:
+                filtered_logs = sorted(pending + filtered_logs, key=lambda x: x.get("timestamp", ""), reverse=True)
+            
+            # Convert to object-like access
+            class LogObj:
+                def __init__(self, data):
+                    for key, value in data.items():
+                        setattr(self, key, value)
+            
+            return [LogObj(log) for log in filtered_logs]
             
         except Exception as e:
             logger.error(f"Failed to get activity logs: {e}")
@@ -494,6 +587,24 @@ class DatabaseService:
         }
         return vehicle_types.get(vehicle_type_id)
     
+    def reload_tariffs(self) -> bool:
+        """Compile tariff rules from `tarif_config` (rows shaped like the legacy tarif / tarif_inap tables)"""
+        try:
+            if self.connected and self.db:
+                tarif_doc = self.db.get("tarif_config")
+            else:
+                tarif_doc = self.store.get_setting("tarif_config")
+            
+            if tarif_doc and tarif_doc.get("tarif"):
+                count = tariff_engine.load(tarif_doc["tarif"], tarif_doc.get("tarif_inap"))
+            else:
+                count = tariff_engine.load(DEFAULT_TARIF_ROWS)
+            return count > 0
+            
+        except Exception as e:
+            logger.error(f"Failed to load tariff rules: {e}")
+            return False
+    
     def get_connection_status(self) -> Dict[str, Any]:
         """Get database connection status"""
         try:
@@ -505,18 +616,22 @@ class DatabaseService:
                     "type": "couchdb",
                     "database": settings.couchdb_database,
                     "server_version": info,
-                    "doc_count": self.db.info()["doc_count"]
+                    "doc_count": self.db.info()["doc_count"],
+                    "activity_log": self.activity_sink.get_stats(),
+                    "plate_index": self.plate_index.get_stats()
                 }
             else:
-                # JSON file storage
-                data = self._load_json_data()
+                # Local SQLite store
+                counts = self.store.counts()
                 return {
                     "connected": True,
-                    "type": "json_file",
-                    "database": self.data_file,
-                    "transaction_count": len(data.get("transactions", {})),
-                    "member_count": len(data.get("members", {})),
-                    "log_count": len(data.get("activity_logs", []))
+                    "type": "local_store",
+                    "database": self.store_file,
+                    "transaction_count": counts["transactions"],
+                    "member_count": counts["members"],
+                    "log_count": counts["activity_logs"],
+                    "activity_log": self.activity_sink.get_stats(),
+                    "plate_index": self.plate_index.get_stats()
                 }
         except Exception as e:
             return {
@@ -546,9 +661,8 @@ class DatabaseService:
                 for member in sample_members:
                     self.db.save(member)
             else:
-                # JSON file sample data
-                data = self._load_json_data()
-                data["members"]["member1"] = {
+                # Local store sample data
+                self.store.put_member({
                     "id": "member1",
                     "no_pol": "B1234ABC",
                     "name": "John Doe",
@@ -556,8 +670,8 @@ class DatabaseService:
                     "active": True,
                     "membership_type": "premium",
                     "created_at": datetime.utcnow().isoformat()
-                }
-                data["members"]["member2"] = {
+                })
+                self.store.put_member({
                     "id": "member2",
                     "no_pol": "B5678DEF",
                     "name": "Jane Smith",
@@ -565,14 +679,21 @@ class DatabaseService:
                     "active": True,
                     "membership_type": "regular",
                     "created_at": datetime.utcnow().isoformat()
-                }
-                self._save_json_data(data)
+                })
             
             logger.info("Sample data initialized")
             
         except Exception as e:
             logger.error(f"Failed to initialize sample data: {e}")
     
+    def close(self):
+        """Flush buffered activity logs, stop the plate index refresh and close the local store"""
+        self.activity_sink.stop(flush_timeout=settings.activity_log_flush_interval + 5)
+        self.plate_index_stop.set()
+        self.plate_index_thread.join(5.0)
+        if self.store:
+            self.store.close()
+    
     async def initialize(self):
         """Initialize database (async compatibility)"""
         # Database is already initialized in __init__
@@ -0,0 +1,148 @@
+"""
+Continuous frame grabber - keeps the latest N JPEG frames per camera in a ring buffer
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Any, List, Optional
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+JPEG_SOI = b"\xff\xd8"
+JPEG_EOI = b"\xff\xd9"
+
+
+def frame_sharpness(data: bytes) -> float:
+    """Variance of the Laplacian on a 1/4 size grayscale decode (JPEG size if undecodable)"""
+    gray = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_4)
+    if gray is None:
+        return float(len(data))
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+@dataclass
+class Frame:
+    data: bytes  # JPEG
+    sequence: int
+    timestamp: float = field(default_factory=time.time)
+    _sharpness: Optional[float] = None
+
+    @property
+    def sharpness(self) -> float:
+        if self._sharpness is None:
+            self._sharpness = frame_sharpness(self.data)
+        return self._sharpness
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.timestamp
+
+
+class FakeStream:
+    """Synthetic frame source for testing without cameras"""
+
+    def __init__(self, frames: Optional[List[bytes]] = None, fps: float = 10.0):
+        self.frames = frames
+        self.fps = fps
+        self.index = 0
+
+    def read(self) -> Optional[bytes]:
+        if self.fps:
+            time.sleep(1.0 / self.fps)
+        self.index += 1
+        if self.frames:
+            return self.frames[(self.index - 1) % len(self.frames)]
+        return JPEG_SOI + f"FAKE{self.index:08d}".encode("ascii") + JPEG_EOI
+
+
+class FrameGrabber:
+    """Background reader calling read_frame() in a loop and buffering the results"""
+
+    def __init__(self, name: str, read_frame: Callable[[], Optional[bytes]],
+                 buffer_size: int = 8, max_frame_bytes: int = 2 * 1024 * 1024,
+                 retry_delay: float = 5.0):
+        self.name = name
+        self.read_frame = read_frame
+        self.buffer_size = buffer_size
+        self.max_frame_bytes = max_frame_bytes
+        self.retry_delay = retry_delay
+
+        self.frames: deque = deque(maxlen=buffer_size)
+        self.lock = threading.Lock()
+        self.sequence = 0
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+        self.stats = {"frames_received": 0, "frames_dropped": 0, "errors": 0, "last_error": None}
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._grab_loop, name=f"grabber-{self.name}", daemon=True)
+        self.thread.start()
+        logger.info(f"Frame grabber started for {self.name} (buffer: {self.buffer_size} frames)")
+
+    def stop(self):
+        self.running = False
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=2)
+        logger.info(f"Frame grabber stopped for {self.name}")
+
+    def _grab_loop(self):
+        delay = 0.5
+        while self.running:
+            try:
+                data = self.read_frame()
+                if data is None:
+                    raise IOError("no frame")
+                self.push(data)
+                delay = 0.5
+            except Exception as e:
+                self.stats["errors"] += 1
+                self.stats["last_error"] = str(e)
+                logger.debug(f"Frame grabber {self.name} error (retry in {delay}s): {e}")
+                time.sleep(delay)
+                delay = min(delay * 2, self.retry_delay)
+
+    def push(self, data: bytes):
+        """Append a frame; the oldest one falls out of the ring buffer"""
+        if len(data) > self.max_frame_bytes:
+            self.stats["frames_dropped"] += 1
+            return
+        with self.lock:
+            self.sequence += 1
+            self.frames.append(Frame(data, self.sequence))
+            self.stats["frames_received"] += 1
+
+    def latest(self, max_age: Optional[float] = None) -> Optional[Frame]:
+        with self.lock:
+            frame = self.frames[-1] if self.frames else None
+        if frame is None or (max_age is not None and frame.age > max_age):
+            return None
+        return frame
+
+    def sharpest(self, around: Optional[float] = None, window: float = 0.5) -> Optional[Frame]:
+        """Sharpest buffered frame within +/- window seconds of the trigger time"""
+        around = around or time.time()
+        with self.lock:
+            candidates = [f for f in self.frames if abs(f.timestamp - around) <= window]
+        return max(candidates, key=lambda f: f.sharpness) if candidates else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            frames = list(self.frames)
+        span = frames[-1].timestamp - frames[0].timestamp if len(frames) > 1 else 0
+        return {
+            **self.stats,
+            "running": self.running,
+            "buffer_frames": len(frames),
+            "buffer_bytes": sum(len(f.data) for f in frames),
+            "latest_age": round(frames[-1].age, 3) if frames else None,
+            "fps": round((len(frames) - 1) / span, 2) if span > 0 else 0,
+        }
@@ -0,0 +1,227 @@
+"""
+Local Store for Python Parking System
+Embedded SQLite (WAL) storage used when CouchDB is unavailable: one row per
+document, indexed on plate/status/timestamp, every write a single atomic commit
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    id TEXT PRIMARY KEY,
+    no_pol TEXT,
+    status INTEGER,
+    entry_time TEXT,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_plate ON transactions (no_pol, status, entry_time);
+CREATE INDEX IF NOT EXISTS idx_transactions_status ON transactions (status, entry_time);
+
+CREATE TABLE IF NOT EXISTS members (
+    id TEXT PRIMARY KEY,
+    no_pol TEXT,
+    active INTEGER,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_members_plate ON members (no_pol, active);
+
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    doc TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS activity_logs (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    gate_id TEXT,
+    timestamp TEXT,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_activity_logs_time ON activity_logs (timestamp);
+CREATE INDEX IF NOT EXISTS idx_activity_logs_gate ON activity_logs (gate_id, timestamp);
+"""
+
+
+def _dumps(doc: Dict[str, Any]) -> str:
+    return json.dumps(doc, separators=(",", ":"), default=str)
+
+
+class LocalStore:
+    """SQLite document store with the indexes the gates query by"""
+
+    def __init__(self, path: str = "parking_data.db", log_retention: int = 1000,
+                 prune_every: int = 100):
+        """
+        Args:
+            path: SQLite database file
+            log_retention: Activity log rows kept (oldest pruned)
+            prune_every: Prune activity logs once per this many inserts
+        """
+        self.path = path
+        self.log_retention = log_retention
+        self.prune_every = prune_every
+        self._log_inserts = 0
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")  # WAL: durable at checkpoint, never corrupt
+        self.conn.executescript(SCHEMA)
+
+    def _write(self, sql: str, params: tuple = ()):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute(sql, params)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def _fetch(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    # Transactions
+
+    def put_transaction(self, doc: Dict[str, Any]):
+        """Insert or replace a transaction document"""
+        doc_id = doc.get("_id") or doc["id"]
+        self._write(
+            "INSERT OR REPLACE INTO transactions (id, no_pol, status, entry_time, doc) VALUES (?, ?, ?, ?, ?)",
+            (doc_id, doc.get("no_pol"), doc.get("status"), doc.get("entry_time"), _dumps(doc)))
+
+    def get_transaction(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        docs = self._fetch("SELECT doc FROM transactions WHERE id = ?", (doc_id,))
+        return docs[0] if docs else None
+
+    def find_latest_by_plate(self, plate_number: str, status: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Most recent transaction for a plate (optionally with the given status)"""
+        if status is None:
+            docs = self._fetch(
+                "SELECT doc FROM transactions WHERE no_pol = ? ORDER BY entry_time DESC LIMIT 1",
+                (plate_number,))
+        else:
+            docs = self._fetch(
+                "SELECT doc FROM transactions WHERE no_pol = ? AND status = ? ORDER BY entry_time DESC LIMIT 1",
+                (plate_number, status))
+        return docs[0] if docs else None
+
+    def active_transactions(self) -> List[Dict[str, Any]]:
+        """Every transaction with status 0 (status index)"""
+        return self._fetch("SELECT doc FROM transactions WHERE status = 0")
+
+    # Members
+
+    def put_member(self, doc: Dict[str, Any]):
+        self._write(
+            "INSERT OR REPLACE INTO members (id, no_pol, active, doc) VALUES (?, ?, ?, ?)",
+            (doc.get("_id") or doc["id"], doc.get("no_pol"), 1 if doc.get("active") else 0, _dumps(doc)))
+
+    def is_active_member(self, plate_number: str) -> bool:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM members WHERE no_pol = ? AND active = 1 LIMIT 1", (plate_number,)).fetchone()
+        return row is not None
+
+    # Settings
+
+    def get_setting(self, key: str) -> Optional[Dict[str, Any]]:
+        docs = self._fetch("SELECT doc FROM settings WHERE key = ?", (key,))
+        return docs[0] if docs else None
+
+    def put_setting(self, key: str, doc: Dict[str, Any]):
+        self._write("INSERT OR REPLACE INTO settings (key, doc) VALUES (?, ?)", (key, _dumps(doc)))
+
+    # Activity logs
+
+    def append_log(self, doc: Dict[str, Any]):
+        """Append one activity log"""
+        self.append_logs([doc])
+
+    def append_logs(self, docs: List[Dict[str, Any]]):
+        """Append activity logs in one transaction; keeps the newest `log_retention` rows"""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.executemany(
+                    "INSERT INTO activity_logs (gate_id, timestamp, doc) VALUES (?, ?, ?)",
+                    [(doc.get("gate_id"), doc.get("timestamp"), _dumps(doc)) for doc in docs])
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+        previous = self._log_inserts
+        self._log_inserts += len(docs)
+        if self.log_retention and previous // self.prune_every != self._log_inserts // self.prune_every:
+            self._write(
+                "DELETE FROM activity_logs WHERE seq <= (SELECT MAX(seq) FROM activity_logs) - ?",
+                (self.log_retention,))
+
+    def recent_logs(self, since: str, gate_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Logs with timestamp >= since, newest first"""
+        if gate_id is None:
+            return self._fetch(
+                "SELECT doc FROM activity_logs WHERE timestamp >= ? ORDER BY timestamp DESC", (since,))
+        return self._fetch(
+            "SELECT doc FROM activity_logs WHERE gate_id = ? AND timestamp >= ? ORDER BY timestamp DESC",
+            (gate_id, since))
+
+    # Maintenance
+
+    def counts(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                table: self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("transactions", "members", "activity_logs")
+            }
+
+    def import_json(self, json_file: str) -> bool:
+        """One-time import of the legacy parking_data.json (renamed to *.migrated afterwards)"""
+        if not os.path.exists(json_file):
+            return False
+
+        with open(json_file, "r") as f:
+            data = json.load(f)
+
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO transactions (id, no_pol, status, entry_time, doc) VALUES (?, ?, ?, ?, ?)",
+                    [(doc_id, t.get("no_pol"), t.get("status"), t.get("entry_time"), _dumps(t))
+                     for doc_id, t in data.get("transactions", {}).items()])
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO members (id, no_pol, active, doc) VALUES (?, ?, ?, ?)",
+                    [(doc_id, m.get("no_pol"), 1 if m.get("active") else 0, _dumps(m))
+                     for doc_id, m in data.get("members", {}).items()])
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO settings (key, doc) VALUES (?, ?)",
+                    [(key, _dumps(value)) for key, value in data.get("settings", {}).items()])
+                if data.get("tarif_config"):
+                    self.conn.execute("INSERT OR REPLACE INTO settings (key, doc) VALUES (?, ?)",
+                                      ("tarif_config", _dumps(data["tarif_config"])))
+                self.conn.executemany(
+                    "INSERT INTO activity_logs (gate_id, timestamp, doc) VALUES (?, ?, ?)",
+                    [(log.get("gate_id"), log.get("timestamp"), _dumps(log))
+                     for log in data.get("activity_logs", [])])
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+        os.replace(json_file, json_file + ".migrated")
+        logger.info(f"Imported {json_file} into local store {self.path}")
+        return True
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
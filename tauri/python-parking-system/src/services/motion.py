@@ -0,0 +1,145 @@
+"""
+Motion gate for the manless monitoring loops - a cheap frame-difference check
+on a downscaled grayscale frame decides whether a capture is worth running ALPR on
+"""
+
+import logging
+import threading
+import time
+from typing import Optional, Dict, Any, Tuple, Union
+
+import cv2
+import numpy as np
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Frame = Union[bytes, bytearray, memoryview, np.ndarray]
+
+
+class MotionDetector:
+    """Running-average background subtraction inside a region of interest"""
+
+    def __init__(self, roi: Tuple[float, float, float, float] = (0.0, 0.0, 1.0, 1.0),
+                 width: int = 160, pixel_threshold: int = 25, min_changed_ratio: float = 0.02,
+                 learning_rate: float = 0.05, force_interval: float = 30.0):
+        """
+        Args:
+            roi: Region checked for motion as fractions of the frame (x1, y1, x2, y2)
+            width: Downscaled frame width used for the comparison
+            pixel_threshold: Gray level difference that counts a pixel as changed
+            min_changed_ratio: Fraction of ROI pixels that must change to report motion
+            learning_rate: Background update weight per frame (slow lighting changes fade in)
+            force_interval: Report a change at least this often (seconds) so a vehicle
+                that stopped before the background settled is still read; 0 disables
+        """
+        self.roi = roi
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_ratio = min_changed_ratio
+        self.learning_rate = learning_rate
+        self.force_interval = force_interval
+
+        self.background: Optional[np.ndarray] = None
+        self.last_analyzed = 0.0
+        self.last_changed_ratio = 0.0
+        self.lock = threading.Lock()
+
+        self.stats = {
+            "frames": 0,
+            "analyzed": 0,
+            "skipped": 0,
+            "forced": 0,
+            "decode_failures": 0,
+        }
+
+    def _to_gray(self, frame: Frame) -> Optional[np.ndarray]:
+        """Downscaled grayscale ROI as float32"""
+        if isinstance(frame, np.ndarray):
+            gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        else:
+            # 1/4 size decode: a fraction of the cost of a full decode
+            gray = cv2.imdecode(np.frombuffer(frame, dtype=np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_4)
+            if gray is None:
+                return None
+
+        height, width = gray.shape[:2]
+        x1, y1, x2, y2 = self.roi
+        gray = gray[int(y1 * height):int(y2 * height) or height, int(x1 * width):int(x2 * width) or width]
+        if gray.size == 0:
+            return None
+
+        if gray.shape[1] > self.width:
+            scaled_height = max(1, int(gray.shape[0] * self.width / gray.shape[1]))
+            gray = cv2.resize(gray, (self.width, scaled_height), interpolation=cv2.INTER_AREA)
+        return cv2.GaussianBlur(gray, (5, 5), 0).astype(np.float32)
+
+    def should_analyze(self, frame: Frame) -> bool:
+        """
+        Update the background with a frame
+
+        Returns:
+            True if the ROI changed (or the frame could not be checked), i.e. run ALPR
+        """
+        now = time.time()
+        with self.lock:
+            self.stats["frames"] += 1
+
+            gray = self._to_gray(frame)
+            if gray is None:
+                self.stats["decode_failures"] += 1
+                changed = True  # fail open: never hide a frame from ALPR
+            elif self.background is None or self.background.shape != gray.shape:
+                self.background = gray
+                changed = True
+            else:
+                diff = cv2.absdiff(gray, self.background)
+                self.last_changed_ratio = float(np.count_nonzero(diff > self.pixel_threshold)) / diff.size
+                cv2.accumulateWeighted(gray, self.background, self.learning_rate)
+                changed = self.last_changed_ratio >= self.min_changed_ratio
+
+            if not changed and self.force_interval and now - self.last_analyzed >= self.force_interval:
+                self.stats["forced"] += 1
+                changed = True
+
+            if changed:
+                self.stats["analyzed"] += 1
+                self.last_analyzed = now
+            else:
+                self.stats["skipped"] += 1
+            return changed
+
+    def reset(self):
+        """Forget the background (e.g. after the camera was reconfigured)"""
+        with self.lock:
+            self.background = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            stats = dict(self.stats)
+            stats["last_changed_ratio"] = round(self.last_changed_ratio, 4)
+        stats["skipped_ratio"] = round(stats["skipped"] / stats["frames"], 3) if stats["frames"] else 0.0
+        return stats
+
+
+def create_motion_detector() -> Optional[MotionDetector]:
+    """Motion detector configured from settings, None when motion gating is disabled"""
+    if not settings.motion_gate_enabled:
+        return None
+
+    try:
+        roi = tuple(float(value) for value in settings.motion_roi.split(","))
+        if len(roi) != 4:
+            raise ValueError("expected x1,y1,x2,y2")
+    except ValueError as e:
+        logger.error(f"Invalid motion_roi '{settings.motion_roi}', using full frame: {e}")
+        roi = (0.0, 0.0, 1.0, 1.0)
+
+    return MotionDetector(
+        roi=roi,
+        width=settings.motion_width,
+        pixel_threshold=settings.motion_pixel_threshold,
+        min_changed_ratio=settings.motion_min_changed_ratio,
+        force_interval=settings.motion_force_interval
+    )
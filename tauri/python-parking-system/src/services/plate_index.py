@@ -0,0 +1,215 @@
+"""
+Fuzzy Plate Index for Python Parking System
+Active plates normalized with an OCR confusion map (0/O/D/Q, 1/I/L, 8/B, ...) and
+searched by bounded edit distance through a deletion-neighbourhood index
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Any, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Characters OCR confuses, folded onto one canonical character
+OCR_CONFUSIONS = {
+    "O": "0", "Q": "0", "D": "0",
+    "I": "1", "L": "1",
+    "Z": "2",
+    "S": "5",
+    "G": "6",
+    "B": "8",
+}
+
+
+def normalize_plate(value: Optional[str]) -> str:
+    """Upper case, only letters and digits ("b 1234-xy" -> "B1234XY")"""
+    if not value:
+        return ""
+    return "".join(ch for ch in str(value).upper() if ch.isalnum())
+
+
+def canonical_plate(value: Optional[str]) -> str:
+    """Normalized plate with OCR look-alikes folded ("B1234XY" and "81234XY" match)"""
+    return "".join(OCR_CONFUSIONS.get(ch, ch) for ch in normalize_plate(value))
+
+
+def edit_distance(a: str, b: str, max_distance: Optional[int] = None) -> int:
+    """Levenshtein distance (returns max_distance + 1 as soon as it is exceeded)"""
+    if a == b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    if max_distance is not None and len(a) - len(b) > max_distance:
+        return max_distance + 1
+
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if max_distance is not None and min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+
+def deletion_variants(word: str, depth: int) -> Set[str]:
+    """Every string obtained by deleting up to `depth` characters from word"""
+    variants = {word}
+    frontier = {word}
+    for _ in range(depth):
+        frontier = {item[:i] + item[i + 1:] for item in frontier for i in range(len(item))}
+        variants |= frontier
+    return variants
+
+
+class PlateIndex:
+    """
+    Fuzzy plate -> transaction id index for vehicles still inside
+
+    Two plates within edit distance k always share a string reachable from both
+    by at most k deletions, so a search only looks up the query's deletion
+    variants and verifies the handful of plates found there.
+    """
+
+    def __init__(self, max_distance: int = 2):
+        self.max_distance = max_distance
+        self.variants: Dict[str, Set[str]] = {}  # deletion variant -> canonical plates
+        self.plates: Dict[str, Set[str]] = {}  # canonical plate -> transaction ids
+        self.doc_plates: Dict[str, Tuple[str, str]] = {}  # transaction id -> (plate, canonical)
+        self.built_at: Optional[float] = None
+        self.replay: Optional[List[Dict[str, Any]]] = None  # updates made while a rebuild loads
+        self.lock = threading.RLock()
+        self.rebuild_lock = threading.Lock()  # one rebuild (and replay log) at a time
+        self.stats = {"searches": 0, "exact_hits": 0, "fuzzy_hits": 0, "ambiguous": 0, "misses": 0}
+
+    def _add(self, doc_id: str, plate: str):
+        canonical = canonical_plate(plate)
+        if not canonical:
+            return
+        if canonical not in self.plates:
+            self.plates[canonical] = set()
+            for variant in deletion_variants(canonical, self.max_distance):
+                self.variants.setdefault(variant, set()).add(canonical)
+        self.plates[canonical].add(doc_id)
+        self.doc_plates[doc_id] = (normalize_plate(plate), canonical)
+
+    def _remove(self, doc_id: str):
+        entry = self.doc_plates.pop(doc_id, None)
+        if entry is None:
+            return
+        canonical = entry[1]
+        doc_ids = self.plates.get(canonical, set())
+        doc_ids.discard(doc_id)
+        if doc_ids:
+            return
+        self.plates.pop(canonical, None)
+        for variant in deletion_variants(canonical, self.max_distance):
+            owners = self.variants.get(variant)
+            if owners is not None:
+                owners.discard(canonical)
+                if not owners:
+                    del self.variants[variant]
+
+    def update(self, transaction: Dict[str, Any]):
+        """Index an active transaction, drop a completed one"""
+        doc_id = transaction.get("_id") or transaction.get("id")
+        if not doc_id:
+            return
+        with self.lock:
+            if self.replay is not None:
+                self.replay.append(transaction)
+            self._remove(doc_id)
+            if transaction.get("status") == 0 and transaction.get("no_pol"):
+                self._add(doc_id, transaction["no_pol"])
+
+    def rebuild(self, load_active: Callable[[], Iterable[Dict[str, Any]]]) -> int:
+        """
+        Replace the index with the active transactions returned by load_active
+
+        The new index is built aside and swapped in, so searches never wait for
+        the load; updates made meanwhile are replayed on top of it.
+        """
+        start_time = time.time()
+        with self.rebuild_lock:
+            with self.lock:
+                self.replay = []
+            try:
+                fresh = PlateIndex(self.max_distance)
+                for transaction in load_active():
+                    fresh.update(transaction)
+                with self.lock:
+                    for transaction in self.replay:
+                        fresh.update(transaction)
+                    self.variants, self.plates, self.doc_plates = fresh.variants, fresh.plates, fresh.doc_plates
+                    self.built_at = time.time()
+                    count = len(self.doc_plates)
+            finally:
+                with self.lock:
+                    self.replay = None
+        logger.debug(f"Plate index rebuilt: {count} active plates ({(time.time() - start_time) * 1000:.2f}ms)")
+        return count
+
+    def age(self) -> float:
+        """Seconds since the last rebuild (infinite if never built)"""
+        return time.time() - self.built_at if self.built_at else float("inf")
+
+    def search(self, plate: str, max_distance: Optional[int] = None, limit: int = 5) -> List[Dict[str, Any]]:
+        """
+        Ranked candidates for a (possibly misread) plate
+
+        Returns:
+            dicts with id, plate, distance (after OCR folding) and raw_distance, best first
+        """
+        if max_distance is None or max_distance > self.max_distance:
+            max_distance = self.max_distance
+        query = normalize_plate(plate)
+        canonical = canonical_plate(query)
+        if not canonical:
+            return []
+
+        with self.lock:
+            self.stats["searches"] += 1
+            nearby: Set[str] = set()
+            for variant in deletion_variants(canonical, max_distance):
+                nearby |= self.variants.get(variant, set())
+
+            candidates = []
+            for candidate in nearby:
+                distance = edit_distance(canonical, candidate, max_distance)
+                if distance > max_distance:
+                    continue
+                for doc_id in self.plates[candidate]:
+                    stored = self.doc_plates[doc_id][0]
+                    candidates.append({
+                        "id": doc_id,
+                        "plate": stored,
+                        "distance": distance,
+                        "raw_distance": edit_distance(query, stored),
+                    })
+
+        candidates.sort(key=lambda c: (c["distance"], c["raw_distance"], c["plate"]))
+        return candidates[:limit]
+
+    def resolve(self, plate: str, max_distance: int = 1) -> Optional[Dict[str, Any]]:
+        """Single best candidate; None if nothing is close or two vehicles are equally close"""
+        candidates = self.search(plate, max_distance, limit=2)
+        with self.lock:
+            if not candidates:
+                self.stats["misses"] += 1
+                return None
+            best = candidates[0]
+            if len(candidates) > 1 and (candidates[1]["distance"], candidates[1]["raw_distance"]) == \
+                    (best["distance"], best["raw_distance"]):
+                self.stats["ambiguous"] += 1
+                return None
+            self.stats["exact_hits" if best["raw_distance"] == 0 else "fuzzy_hits"] += 1
+            return best
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            stats = dict(self.stats)
+            stats["active_plates"] = len(self.doc_plates)
+            stats["age_seconds"] = round(self.age(), 1) if self.built_at else None
+        return stats
@@ -0,0 +1,242 @@
+"""
+Plate tracker for the manless lanes - associates ALPR reads of one camera across
+consecutive frames, votes per character and reports each vehicle exactly once
+"""
+
+import logging
+import threading
+import time
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import Optional, Dict, Any, List
+
+from ..core.config import settings
+from ..core.models import ALPRResult
+
+logger = logging.getLogger(__name__)
+
+
+def bbox_iou(a: Optional[Dict[str, float]], b: Optional[Dict[str, float]]) -> float:
+    """Intersection over union of two {x1, y1, x2, y2} boxes (0 if either is missing)"""
+    if not a or not b:
+        return 0.0
+    width = min(a["x2"], b["x2"]) - max(a["x1"], b["x1"])
+    height = min(a["y2"], b["y2"]) - max(a["y1"], b["y1"])
+    if width <= 0 or height <= 0:
+        return 0.0
+    intersection = width * height
+    union = ((a["x2"] - a["x1"]) * (a["y2"] - a["y1"]) +
+             (b["x2"] - b["x1"]) * (b["y2"] - b["y1"]) - intersection)
+    return intersection / union if union > 0 else 0.0
+
+
+def text_similarity(a: str, b: str) -> float:
+    """0..1 similarity of two plate reads (tolerates a dropped / extra character)"""
+    if not a or not b:
+        return 0.0
+    return SequenceMatcher(None, a, b).ratio()
+
+
+class PlateTrack:
+    """One vehicle: its last box and the votes of every read"""
+
+    def __init__(self, track_id: int, result: ALPRResult, now: float):
+        self.track_id = track_id
+        self.bbox = result.bbox
+        self.first_seen = now
+        self.last_seen = now
+        self.hits = 0
+        self.confidence_sum = 0.0
+        self.emitted = False
+        self.length_votes: Counter = Counter()
+        self.char_votes: Dict[int, List[Counter]] = {}  # plate length -> votes per position
+        self.add(result, now)
+
+    def add(self, result: ALPRResult, now: float):
+        plate = result.plate_number.replace(" ", "")
+        self.hits += 1
+        self.confidence_sum += result.confidence
+        self.last_seen = now
+        if result.bbox:
+            self.bbox = result.bbox
+
+        self.length_votes[len(plate)] += result.confidence
+        positions = self.char_votes.setdefault(len(plate), [Counter() for _ in plate])
+        for position, char in zip(positions, plate):
+            position[char] += result.confidence
+
+    @property
+    def consensus(self) -> str:
+        """Most voted length, then the most voted character at each position"""
+        if not self.length_votes:
+            return ""
+        length = self.length_votes.most_common(1)[0][0]
+        return "".join(position.most_common(1)[0][0] for position in self.char_votes[length])
+
+    @property
+    def confidence(self) -> float:
+        return self.confidence_sum / self.hits if self.hits else 0.0
+
+
+class PlateTracker:
+    """Per camera tracker; update() returns a consensus result once per vehicle"""
+
+    def __init__(self, iou_threshold: float = 0.3, min_hits: int = 2, max_age: float = 10.0,
+                 min_similarity: float = 0.75, emit_cooldown: float = 90.0):
+        """
+        Args:
+            iou_threshold: Box overlap needed to attribute a read to an existing track
+            min_hits: Reads that must agree (by box) before the vehicle is reported
+            max_age: Seconds without a read after which the vehicle is considered gone
+            min_similarity: Text similarity a read needs to join a track, box overlap or not
+                (plates of one region share prefixes and digits, so this stays high)
+            emit_cooldown: Seconds a reported plate stays quiet after its last read, even
+                if its track expired in between (a car waiting at the barrier is only read
+                when the motion gate forces a read, further apart than max_age)
+        """
+        self.iou_threshold = iou_threshold
+        self.min_similarity = min_similarity
+        self.min_hits = min_hits
+        self.max_age = max_age
+        self.emit_cooldown = emit_cooldown
+
+        self.tracks: List[PlateTrack] = []
+        self.reported: Dict[str, float] = {}  # reported consensus plate -> last read
+        self.next_track_id = 1
+        self.lock = threading.Lock()
+
+        self.stats = {
+            "reads": 0,
+            "events": 0,
+            "suppressed": 0,
+            "reopened": 0,
+            "tracks_started": 0,
+            "tracks_expired": 0,
+        }
+
+    def _expire(self, now: float):
+        alive = [track for track in self.tracks if now - track.last_seen <= self.max_age]
+        self.stats["tracks_expired"] += len(self.tracks) - len(alive)
+        self.tracks = alive
+        self.reported = {plate: seen for plate, seen in self.reported.items()
+                         if now - seen <= self.emit_cooldown}
+
+    def _match(self, result: ALPRResult) -> Optional[PlateTrack]:
+        """
+        Track with the best box overlap; plate text when the read has no box.
+        A read that overlaps but differs by more than a misread character or
+        two is a new vehicle pulling into the same spot.
+        """
+        best, best_score = None, 0.0
+        for track in self.tracks:
+            similarity = text_similarity(result.plate_number, track.consensus)
+            if similarity < self.min_similarity:
+                continue
+            if result.bbox and track.bbox:
+                score = bbox_iou(result.bbox, track.bbox)
+                matched = score >= self.iou_threshold
+            else:
+                score = similarity
+                matched = True
+            if matched and score > best_score:
+                best, best_score = track, score
+        return best
+
+    def update(self, result: ALPRResult, min_confidence: float = 0.0,
+               now: Optional[float] = None) -> Optional[ALPRResult]:
+        """
+        Add one read
+
+        Returns:
+            Consensus ALPRResult the first time the vehicle's track has min_hits
+            reads with average confidence >= min_confidence, else None
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            self._expire(now)
+            self.stats["reads"] += 1
+
+            track = self._match(result)
+            if track is None:
+                track = PlateTrack(self.next_track_id, result, now)
+                self.next_track_id += 1
+                self.tracks.append(track)
+                self.stats["tracks_started"] += 1
+            else:
+                track.add(result, now)
+
+            if track.emitted:
+                self.reported[track.consensus] = now
+                self.stats["suppressed"] += 1
+                return None
+            if track.hits < self.min_hits or track.confidence < min_confidence:
+                return None
+
+            track.emitted = True
+            consensus = track.consensus
+            if consensus in self.reported:
+                # Same vehicle read again after its track expired (e.g. waiting at the barrier)
+                self.reported[consensus] = now
+                self.stats["suppressed"] += 1
+                return None
+            self.reported[consensus] = now
+            self.stats["events"] += 1
+            if consensus != result.plate_number:
+                logger.info(f"Plate consensus {consensus} over {track.hits} reads (last read {result.plate_number})")
+
+            return ALPRResult(
+                plate_number=consensus,
+                confidence=track.confidence,
+                processing_time=result.processing_time,
+                decode_time=result.decode_time,
+                predict_time=result.predict_time,
+                image_base64=result.image_base64,
+                bbox=track.bbox
+            )
+
+    def has_pending(self, now: Optional[float] = None) -> bool:
+        """A vehicle is being read but has not been reported yet"""
+        now = time.time() if now is None else now
+        with self.lock:
+            self._expire(now)
+            return any(not track.emitted for track in self.tracks)
+
+    def reopen(self, result: ALPRResult) -> bool:
+        """
+        The reported vehicle was not handled (gate busy, no transaction found):
+        report it again on its next read
+
+        Returns:
+            True if the vehicle's track was found
+        """
+        with self.lock:
+            for track in self.tracks:
+                if track.emitted and track.consensus == result.plate_number:
+                    track.emitted = False
+                    self.reported.pop(track.consensus, None)
+                    self.stats["reopened"] += 1
+                    return True
+        return False
+
+    def reset(self):
+        with self.lock:
+            self.tracks = []
+            self.reported = {}
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            stats = dict(self.stats)
+            stats["active_tracks"] = len(self.tracks)
+        return stats
+
+
+def create_plate_tracker() -> PlateTracker:
+    """Plate tracker configured from settings"""
+    return PlateTracker(
+        iou_threshold=settings.plate_tracker_iou_threshold,
+        min_hits=settings.plate_tracker_min_hits,
+        max_age=settings.plate_tracker_max_age,
+        min_similarity=settings.plate_tracker_min_similarity,
+        # Forced reads of a static scene come every motion_force_interval: stay quiet longer than that
+        emit_cooldown=max(settings.plate_tracker_emit_cooldown, 2 * settings.motion_force_interval)
+    )
@@ -0,0 +1,214 @@
+"""
+Tariff Engine for Python Parking System
+Compiles the legacy `tarif` / `tarif_inap` rules (parkir_awal.sql) once per vehicle
+class into a piecewise schedule; quote() is constant time with a quote cache
+"""
+
+import logging
+import threading
+from bisect import bisect_right
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+MINUTES_PER_DAY = 24 * 60
+
+# Category multipliers (kategori) - anything not listed pays the full fee
+DEFAULT_CATEGORY_FACTORS = {"member": 0.8}
+
+# Used until a `tarif_config` document exists: flat hourly rate, minimum 1 hour
+DEFAULT_TARIF_ROWS = [
+    {"id_mobil": "1", "tarif": 2000, "waktu_tarif": 60, "interval": 60, "tarif_interval": 2000},    # Motor
+    {"id_mobil": "2", "tarif": 5000, "waktu_tarif": 60, "interval": 60, "tarif_interval": 5000},    # Mobil
+    {"id_mobil": "3", "tarif": 10000, "waktu_tarif": 60, "interval": 60, "tarif_interval": 10000},  # Truk
+    {"id_mobil": "default", "tarif": 5000, "waktu_tarif": 60, "interval": 60, "tarif_interval": 5000},
+]
+
+
+def _ceil_div(a: int, b: int) -> int:
+    return -(-a // b)
+
+
+def _num(row: Dict[str, Any], column: str, default: Any = 0) -> Any:
+    value = row.get(column)
+    return default if value in (None, "") else value
+
+
+class CompiledTariff:
+    """
+    One vehicle class compiled from a `tarif` row
+
+    Columns used:
+        tarif / waktu_tarif          first block fee and length (minutes)
+        tarif_interval / interval    fee per following block and block length
+        tarif2 / waktu2              block fee from minute waktu2 on (progressive step)
+        tarif3 / waktu3              block fee from minute waktu3 on
+        waktu_gratis                 grace period, no charge up to this many minutes
+        maksimum / max_per_hari      fee cap, per 24h when max_per_hari is set
+        tarif_inap / batas_inap_min  overnight fee (from tarif_inap) per midnight crossed,
+                                     once the stay is at least batas_inap_min minutes
+    """
+
+    def __init__(self, row: Dict[str, Any], inap_row: Optional[Dict[str, Any]] = None):
+        self.vehicle = str(row["id_mobil"])
+        self.grace = int(_num(row, "waktu_gratis"))
+
+        interval = int(_num(row, "interval", 60)) or 60
+        self.first_fee = float(_num(row, "tarif"))
+        self.first_length = int(_num(row, "waktu_tarif", interval)) or interval
+        interval_fee = float(_num(row, "tarif_interval", self.first_fee))
+
+        # Progressive steps: start minute -> (block length, block fee)
+        steps: Dict[int, Tuple[int, float]] = {self.first_length: (interval, interval_fee)}
+        for fee_column, time_column in (("tarif2", "waktu2"), ("tarif3", "waktu3")):
+            if _num(row, fee_column) and _num(row, time_column):
+                start = max(int(row[time_column]), self.first_length)
+                steps[start] = (interval, float(row[fee_column]))
+
+        self.starts = sorted(steps)
+        self.steps = [steps[start] for start in self.starts]
+
+        # Fee already accrued when each step begins
+        self.bases = [self.first_fee]
+        for i in range(1, len(self.starts)):
+            length, fee = self.steps[i - 1]
+            blocks = _ceil_div(self.starts[i] - self.starts[i - 1], length)
+            self.bases.append(self.bases[-1] + blocks * fee)
+
+        self.daily = bool(_num(row, "max_per_hari"))
+        cap = float(_num(row, "maksimum"))
+        if self.daily and not cap:
+            cap = self._schedule(MINUTES_PER_DAY)
+        self.cap = cap or None
+
+        self.overnight_fee = 0.0
+        self.overnight_min = int(_num(row, "batas_inap_min"))
+        if _num(row, "tarif_inap") and inap_row:
+            self.overnight_fee = float(_num(inap_row, "tarif_member"))
+
+    def _schedule(self, minutes: int) -> float:
+        """Uncapped piecewise fee for a stay of `minutes`"""
+        if minutes <= 0:
+            return 0.0
+        if minutes <= self.first_length:
+            return self.first_fee
+
+        i = bisect_right(self.starts, minutes - 1) - 1
+        length, fee = self.steps[i]
+        return self.bases[i] + _ceil_div(minutes - self.starts[i], length) * fee
+
+    def charge(self, minutes: int, nights: int = 0) -> float:
+        """Fee for a stay of `minutes` that crossed `nights` midnights"""
+        if self.grace and minutes <= self.grace:
+            fee = 0.0
+        elif self.daily:
+            days, rest = divmod(max(minutes, 1), MINUTES_PER_DAY)
+            fee = days * self.cap + min(self._schedule(rest), self.cap)
+        else:
+            fee = self._schedule(max(minutes, 1))  # First block is always billed
+            if self.cap:
+                fee = min(fee, self.cap)
+
+        if nights and self.overnight_fee and minutes >= self.overnight_min:
+            fee += nights * self.overnight_fee
+        return fee
+
+
+class TariffEngine:
+    """Compiled tariff rules shared by every gate; quote() is constant time"""
+
+    def __init__(self, tarif_rows: Optional[List[Dict[str, Any]]] = None,
+                 tarif_inap_rows: Optional[List[Dict[str, Any]]] = None,
+                 category_factors: Optional[Dict[str, float]] = None,
+                 cache_size: int = 4096):
+        self.category_factors = dict(DEFAULT_CATEGORY_FACTORS if category_factors is None else category_factors)
+        self.cache_size = cache_size
+        self.tariffs: Dict[str, CompiledTariff] = {}
+        self.default_vehicle: Optional[str] = None
+        self.cache: Dict[Tuple, int] = {}
+        self.lock = threading.Lock()
+        self.stats = {"quotes": 0, "cache_hits": 0}
+
+        if tarif_rows:
+            self.load(tarif_rows, tarif_inap_rows)
+
+    def load(self, tarif_rows: List[Dict[str, Any]],
+             tarif_inap_rows: Optional[List[Dict[str, Any]]] = None) -> int:
+        """Compile rules (replaces previous rules and clears the cache)"""
+        inap = {str(row["id_mobil"]): row for row in (tarif_inap_rows or [])}
+        tariffs = {}
+        for row in tarif_rows:
+            try:
+                tariff = CompiledTariff(row, inap.get(str(row["id_mobil"])))
+                tariffs[tariff.vehicle] = tariff
+            except Exception as e:
+                logger.error(f"Skipping tarif row {row.get('id_mobil')}: {e}")
+
+        with self.lock:
+            self.tariffs = tariffs
+            self.default_vehicle = "default" if "default" in tariffs else (
+                str(tarif_rows[0]["id_mobil"]) if tarif_rows else None)
+            self.cache = {}
+
+        logger.info(f"Tariff engine compiled {len(tariffs)} vehicle classes")
+        return len(tariffs)
+
+    @staticmethod
+    def _to_datetime(value: Union[datetime, str]) -> datetime:
+        """Naive local time, so nights count local midnights (naive input is UTC, as the gates store it)"""
+        if not isinstance(value, datetime):
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.astimezone().replace(tzinfo=None)
+
+    def quote(self, entry: Union[datetime, str], exit: Union[datetime, str, None] = None,
+              vehicle: Any = None, category: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Quote parking fee
+
+        Returns:
+            fee, duration_minutes, nights, vehicle, category
+        """
+        entry_time = self._to_datetime(entry)
+        exit_time = self._to_datetime(exit or datetime.now(timezone.utc))
+
+        minutes = max(0, int((exit_time - entry_time).total_seconds() // 60))
+        nights = max(0, (exit_time.date() - entry_time.date()).days)
+
+        vehicle = str(vehicle) if vehicle is not None else self.default_vehicle
+        key = (vehicle, category, minutes, nights)
+
+        with self.lock:
+            self.stats["quotes"] += 1
+            fee = self.cache.get(key)
+            if fee is not None:
+                self.stats["cache_hits"] += 1
+            else:
+                tariff = self.tariffs.get(vehicle) or self.tariffs.get(self.default_vehicle)
+                if tariff is None:
+                    raise ValueError("No tariff rules loaded")
+                fee = int(round(tariff.charge(minutes, nights) * self.category_factors.get(category, 1.0)))
+                if len(self.cache) >= self.cache_size:
+                    self.cache.clear()
+                self.cache[key] = fee
+
+        return {
+            "fee": fee,
+            "duration_minutes": minutes,
+            "nights": nights,
+            "vehicle": vehicle,
+            "category": category,
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            stats = dict(self.stats)
+            stats["vehicle_classes"] = sorted(self.tariffs)
+            stats["cached_quotes"] = len(self.cache)
+        return stats
+
+
+# Global tariff engine instance
+tariff_engine = TariffEngine(DEFAULT_TARIF_ROWS)
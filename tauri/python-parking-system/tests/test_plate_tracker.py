@@ -0,0 +1,59 @@
+"""
+Plate tracker tests - one report per vehicle while the motion gate only
+forces an ALPR read every motion_force_interval
+"""
+
+import os
+import sys
+
+# Project root on the path for `src`
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.core.models import ALPRResult
+from src.services.plate_tracker import PlateTracker
+
+
+def _read(plate: str, confidence: float = 0.9) -> ALPRResult:
+    return ALPRResult(plate_number=plate, confidence=confidence, processing_time=0.01,
+                      bbox={"x1": 100.0, "y1": 200.0, "x2": 300.0, "y2": 260.0})
+
+
+def _forced_check(tracker: PlateTracker, plate: str, now: float, follow_ups: int = 2):
+    """One _check_for_* pass: the forced read plus its quick follow-up reads"""
+    events = []
+    for attempt in range(follow_ups):
+        vehicle = tracker.update(_read(plate), 0.8, now=now + attempt * 0.5)
+        if vehicle:
+            events.append(vehicle)
+            break
+    return events
+
+
+def test_parked_car_with_forced_reads_is_reported_once():
+    """Forced reads 30 s apart (> max_age) keep the waiting car quiet for 15 minutes"""
+    tracker = PlateTracker(min_hits=2, max_age=10.0, emit_cooldown=60.0)
+
+    events = []
+    for step in range(30):
+        events += _forced_check(tracker, "B1234XY", now=step * 30.0)
+
+    assert [event.plate_number for event in events] == ["B1234XY"]
+    stats = tracker.get_stats()
+    assert stats["events"] == 1
+    assert stats["tracks_expired"] >= 28  # tracks still age out between forced reads
+
+
+def test_plate_reported_again_after_cooldown_or_reopen():
+    tracker = PlateTracker(min_hits=2, max_age=10.0, emit_cooldown=60.0)
+    assert len(_forced_check(tracker, "B1234XY", now=0.0)) == 1
+
+    # A different vehicle in the same spot is reported right away
+    assert len(_forced_check(tracker, "D5678AB", now=30.0)) == 1
+
+    # Same car back after the cooldown: a new visit
+    assert len(_forced_check(tracker, "B1234XY", now=200.0)) == 1
+
+    # Not handled by the gate (no transaction yet): reported on the next forced read
+    vehicle = _forced_check(tracker, "F1111AA", now=300.0)[0]
+    assert tracker.reopen(vehicle)
+    assert len(_forced_check(tracker, "F1111AA", now=330.0)) == 1